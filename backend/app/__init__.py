@@ -6,11 +6,20 @@
 """
 from flask import Flask, send_from_directory
 from flask_migrate import Migrate
+from app.commands import register_commands
 from app.config import Config
 from app.extensions import db, jwt
 from app.routers.student import student_bp, student_auth_bp
 from app.routers.teacher import teacher_bp, teacher_auth_bp
+from app.routers.admin import admin_bp, admin_auth_bp
 from app.routers.access_image_router import upload_bp
+from app.util.ai_feedback import init_ai_feedback
+from app.util.auth import init_auth
+from app.util.change_feed import change_feed
+from app.util.db_metrics import init_pool_metrics
+from app.util.db_routing import init_db_routing
+from app.util.response_cache import response_cache
+from app.util.token_denylist import token_denylist
 
 
 def create_app():
@@ -19,19 +28,30 @@ def create_app():
 
     db.init_app(app)
     jwt.init_app(app)
+    token_denylist.init_app(app)
+    init_auth(app)
     Migrate(app, db)
+    init_db_routing(app)
+    response_cache.init_app(app)
+    change_feed.init_app(app)
+    init_ai_feedback(app)
+    register_commands(app)
     with app.app_context():
         from app.models import (
             Student, Staff, Admin, Course,  # 基础模型
             StudentCourseRelation, StaffCourseRelation,  # 多对多关联表
             Homework, HomeworkSubmission, HomeworkGrading,  # 作业相关模型
+            AIFeedbackJob,  # AI评语任务
             StaffRole, CourseStatus, HomeworkType  # 枚举类可选，不导入也不影响建表
         )
+        init_pool_metrics(db.engine)
 
     app.register_blueprint(student_bp)
     app.register_blueprint(student_auth_bp)
     app.register_blueprint(teacher_bp)
     app.register_blueprint(teacher_auth_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(admin_auth_bp)
     app.register_blueprint(upload_bp)
 
     return app
@@ -0,0 +1,26 @@
+"""
+flask 命令行命令（flask --app run roster import ...）
+"""
+import click
+from app.services.admin_service import import_student_roster
+
+
+def register_commands(app):
+    @app.cli.group('roster')
+    def roster_cli():
+        """学生花名册"""
+
+    @roster_cli.command('import')
+    @click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+    @click.option('--course', 'course_code', default=None,
+                  help='所有学生都选修的课程代码（不指定时使用CSV中的course_code列）')
+    def import_roster(csv_file, course_code):
+        """从CSV导入学生并选课，表头：student_no,name,password[,email,phone,course_code]"""
+        success, result = import_student_roster(csv_file, course_code)
+        if not success:
+            raise click.ClickException(result)
+
+        click.echo(f"新建学生 {result['created']} 人，已存在 {result['existing']} 人；"
+                   f"新增选课 {result['enrolled']} 条，已选过 {result['already_enrolled']} 条")
+        for error in result["errors"]:
+            click.echo(f"第{error['line']}行：{error['error']}", err=True)
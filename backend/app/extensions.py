@@ -8,9 +8,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from app.util.db_routing import RoutingSession
 import pymysql
 pymysql.install_as_MySQLdb()
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})  # 支持读写分离
 jwt = JWTManager()
 cors = CORS()  # 解决前端跨域问题
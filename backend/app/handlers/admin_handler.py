@@ -1,5 +1,6 @@
-from flask import jsonify
-from flask_jwt_extended import create_access_token
+import io
+from flask import current_app, jsonify
+from flask_jwt_extended import create_access_token, create_refresh_token
 from app.services.admin_service import (
     authenticate_admin,
     register_admin,
@@ -10,8 +11,10 @@ from app.services.admin_service import (
     delete_user,
     get_admin_profile,
     update_admin_profile,
-    update_admin_password
+    update_admin_password,
+    import_student_roster
 )
+from app.util.token_denylist import token_denylist
 
 
 def handle_admin_login(data):
@@ -29,9 +32,11 @@ def handle_admin_login(data):
     # 创建JWT令牌（格式："admin:id"）
     identity_str = f"admin:{result['id']}"
     access_token = create_access_token(identity=identity_str)
+    refresh_token = create_refresh_token(identity=identity_str)
 
     return jsonify({
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "admin": {
             "id": result["id"],
             "username": result["username"],
@@ -41,6 +46,19 @@ def handle_admin_login(data):
     }), 200
 
 
+def handle_admin_refresh_token(admin_id):
+    """凭刷新令牌换发访问令牌"""
+    return jsonify({
+        "access_token": create_access_token(identity=f"admin:{admin_id}")
+    }), 200
+
+
+def handle_admin_logout(jwt_payload):
+    """登出：吊销本次登录签发的访问令牌与刷新令牌"""
+    token_denylist.revoke_token(jwt_payload)
+    return jsonify({"message": "已退出登录"}), 200
+
+
 def handle_admin_register(data):
     """处理管理员注册"""
     success, result = register_admin(data)
@@ -52,35 +70,34 @@ def handle_admin_register(data):
     return jsonify({"error": result}), 400
 
 
-def handle_get_all_teachers():
-    """获取所有教师"""
-    success, data = get_all_teachers()
+def handle_get_all_teachers(limit, cursor):
+    """获取教师列表（分页）"""
+    success, data = get_all_teachers(limit, cursor)
     if success:
+        teacher_list, next_cursor = data
         return jsonify({
-            "teacher_list": data,
-            "count": len(data)
+            "teacher_list": teacher_list,
+            "count": len(teacher_list),
+            "next_cursor": next_cursor
         }), 200
     return jsonify({"error": data}), 400
 
 
-def handle_get_all_students():
-    """获取所有学生"""
-    success, data = get_all_students()
+def handle_get_all_students(limit, cursor):
+    """获取学生列表（分页）"""
+    success, data = get_all_students(limit, cursor)
     if success:
+        student_list, next_cursor = data
         return jsonify({
-            "student_list": data,
-            "count": len(data)
+            "student_list": student_list,
+            "count": len(student_list),
+            "next_cursor": next_cursor
         }), 200
     return jsonify({"error": data}), 400
 
 
 def handle_approve_course(course_id, data):
     """处理课程审核"""
-    try:
-        course_id = int(course_id)
-    except ValueError:
-        return jsonify({"error": "课程ID必须为数字"}), 400
-
     approve_status = data.get('approve', True)
     success, result = approve_course(course_id, approve_status)
     if success:
@@ -88,26 +105,25 @@ def handle_approve_course(course_id, data):
     return jsonify({"error": result}), 400
 
 
-def handle_get_all_courses():
-    """获取所有课程"""
-    success, data = get_all_courses()
+def handle_get_all_courses(limit, cursor):
+    """获取课程列表（分页）"""
+    success, data = get_all_courses(limit, cursor)
     if success:
+        course_list, next_cursor = data
         return jsonify({
-            "course_list": data,
-            "count": len(data)
+            "course_list": course_list,
+            "count": len(course_list),
+            "next_cursor": next_cursor
         }), 200
     return jsonify({"error": data}), 400
 
 
 def handle_delete_user(user_type, user_id):
     """处理用户删除"""
-    try:
-        user_id = int(user_id)
-    except ValueError:
-        return jsonify({"error": "用户ID必须为数字"}), 400
-
     success, result = delete_user(user_type, user_id)
     if success:
+        # 被删除用户已签发的令牌立即失效
+        token_denylist.revoke_identity(f"{user_type}:{user_id}")
         return jsonify({"message": result}), 200
     return jsonify({"error": result}), 400
 
@@ -139,5 +155,29 @@ def handle_update_admin_password(admin_id, data):
     success, result = update_admin_password(
         admin_id, old_password, new_password)
     if success:
-        return jsonify({"message": "密码更新成功"}), 200
+        token_denylist.revoke_identity(f"admin:{admin_id}")
+        return jsonify({"message": "密码更新成功，请重新登录"}), 200
+    return jsonify({"error": result}), 400
+
+
+def handle_import_student_roster(file, course_code=None):
+    """处理花名册CSV导入（在请求内同步执行，行数受 ROSTER_IMPORT_MAX_ROWS 限制）"""
+    if file is None or file.filename == '':
+        return jsonify({"error": "未选择文件"}), 400
+    if not file.filename.lower().endswith('.csv'):
+        return jsonify({"error": "仅支持CSV文件"}), 400
+
+    # 按行流式解码，utf-8-sig 兼容 Excel 导出的 BOM
+    lines = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
+    try:
+        success, result = import_student_roster(
+            lines, course_code or None,
+            max_rows=current_app.config['ROSTER_IMPORT_MAX_ROWS'])
+    except UnicodeDecodeError:
+        return jsonify({"error": "CSV文件需为UTF-8编码"}), 400
+    if success:
+        return jsonify({
+            "message": f"导入完成：新建学生{result['created']}人，新增选课{result['enrolled']}条",
+            **result
+        }), 200
     return jsonify({"error": result}), 400
@@ -1,7 +1,5 @@
-import os
-import shutil
-from flask import jsonify
-from flask_jwt_extended import create_access_token
+from flask import current_app, jsonify
+from flask_jwt_extended import create_refresh_token
 from app.services.student_service import (
     authenticate_student,
     register_student,
@@ -9,16 +7,31 @@ from app.services.student_service import (
     get_student_courses,
     enroll_course,
     get_student_course_homeworks,
+    get_student_course_homeworks_version,
     submit_homework,
     update_student_profile,
     update_student_password,
     get_student_homework_submission,
+    get_student_feed_topics,
 )
 from app.util.file_upload import (
-    upload_image,
-    get_upload_dir
+    save_uploaded_files,
+    get_file_url
 )
-from app.models import Homework, StudentCourseRelation
+from app.util.chunked_upload import (
+    create_upload_session,
+    load_upload_session,
+    get_upload_offset,
+    append_upload_chunk,
+    finalize_upload_session,
+    SESSION_GONE
+)
+from app.util.auth import create_member_access_token, is_student_in_course
+from app.util.change_feed import change_feed
+from app.util.conditional import make_etag, not_modified, with_etag
+from app.util.signed_url import signing_window
+from app.util.token_denylist import token_denylist
+from app.models import Homework
 
 # 认证相关处理函数
 
@@ -35,14 +48,13 @@ def handle_student_login(data):
     if not success:
         return jsonify({"error": result}), 401
 
-    # 创建JWT令牌
-    identity_str = f"student:{result['id']}"
-    access_token = create_access_token(
-        identity=identity_str,  # student:1（字符串）
-    )
+    # 创建JWT令牌（identity 为 student:1，附带已选课程声明）
+    access_token = create_member_access_token("student", result['id'])
+    refresh_token = create_refresh_token(identity=f"student:{result['id']}")
 
     return jsonify({
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "student": {
             "id": result["id"],
             "student_no": result["student_no"],
@@ -53,6 +65,19 @@ def handle_student_login(data):
     }), 200
 
 
+def handle_student_refresh_token(student_id):
+    """凭刷新令牌换发访问令牌（重新读取课程声明，不校验密码）"""
+    return jsonify({
+        "access_token": create_member_access_token("student", student_id)
+    }), 200
+
+
+def handle_student_logout(jwt_payload):
+    """登出：吊销本次登录签发的访问令牌与刷新令牌"""
+    token_denylist.revoke_token(jwt_payload)
+    return jsonify({"message": "已退出登录"}), 200
+
+
 def handle_student_register(data):
     """处理学生注册请求"""
     success, result = register_student(data)
@@ -115,6 +140,8 @@ def handle_update_student_password(student_id, password_data):
     )
 
     if success:
+        # 吊销此前签发的全部令牌（包括刷新令牌）
+        token_denylist.revoke_identity(f"student:{student_id}")
         return jsonify({"message": "密码修改成功，请重新登录"}), 200
     return jsonify({"error": error_msg}), 400
 
@@ -139,19 +166,31 @@ def handle_enroll_course(student_id, course_code):
 
     success, message = enroll_course(student_id, course_code)
     if success:
-        return jsonify({"message": message}), 201
+        # 选课后旧令牌的课程声明已失效，换发新令牌
+        return jsonify({
+            "message": message,
+            "access_token": create_member_access_token("student", student_id)
+        }), 201
     return jsonify({"error": message}), 400
 
 
-def handle_get_enrolled_course_homeworks(student_id, course_id):
-    """获取学生已选课程的作业"""
+def handle_get_enrolled_course_homeworks(student_id, course_id, if_none_match=None):
+    """获取学生已选课程的作业（支持 If-None-Match，数据未变化时返回 304）"""
+    version = get_student_course_homeworks_version(student_id, course_id)
+    # 作业图片URL带签名，签名窗口计入 ETag
+    etag = make_etag("student_course_homeworks", version,
+                     signing_window()) if version else None
+    if etag and if_none_match and if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
     success, data = get_student_course_homeworks(
         student_id, course_id)
     if success:
-        return jsonify({
+        response = jsonify({
             "homework_list": data,
             "count": len(data)
         }), 200
+        return with_etag(response, etag) if etag else response
     return jsonify({"error": data}), 400
 
 
@@ -201,45 +240,24 @@ def handle_upload_homework_image(student_id, homework_id, files):
             return jsonify({"error": f"作业ID {homework_id} 不存在"}), 404
         course_id = homework.course_id
 
-        is_enrolled = StudentCourseRelation.query.filter_by(
-            student_id=student_id,
-            course_id=course_id
-        ).first()
-        if not is_enrolled:
+        if not is_student_in_course(student_id, course_id):
             return jsonify({"error": "未选修该课程,无法提交作业"}), 403
 
-        storage_path = get_upload_dir(
+        # 统一校验后并发保存，逐个文件记录成功/失败
+        for filename, relative_path, error_message in save_uploaded_files(
+            files,
             course_id=course_id,
             course_hw_no=homework.course_hw_no,
             resource_type="submit",
             student_id=student_id
-        )
-        # 如果目录已存在则先清空（确保最新提交覆盖旧文件）
-        if os.path.exists(storage_path):
-            shutil.rmtree(storage_path)
-
-        # 创建新目录
-        os.makedirs(storage_path, exist_ok=True)
-
-        for file in files:
-            if file.filename == '':
-                error_messages.append("存在空文件名的文件")
-                continue
-
-            try:
-                # 调用单文件上传工具（假设 upload_image 已适配作业图片路径）
-                image_url = upload_image(
-                    file=file,
-                    course_id=course_id,
-                    course_hw_no=homework.course_hw_no,
-                    resource_type="submit",
-                    student_id=student_id
-                )
-                success_urls.append(image_url)
-            except Exception as e:
-                error_messages.append(f"文件 {file.filename} 上传失败: {str(e)}")
-
-    # 构建响应
+        ):
+            if error_message:
+                error_messages.append(error_message)
+            else:
+                success_urls.append(get_file_url(relative_path))
+
+        # 构建响应；旧提交的图片在提交作业时按 image_urls 清理（submit_homework），
+        # 这里不删除目录中的其他文件，避免误删分片上传完成的图片
         if not success_urls:
             # 全部失败
             return jsonify({
@@ -255,3 +273,106 @@ def handle_upload_homework_image(student_id, homework_id, files):
             }), 201
     except Exception as e:
         return jsonify({"error": f"上传处理失败:{str(e)}"}), 500
+
+
+# NOTE: 分片（断点续传）上传相关处理函数
+
+
+def handle_create_upload_session(student_id, homework_id, data):
+    """创建分片上传会话"""
+    try:
+        homework = Homework.query.get(homework_id)
+        if not homework:
+            return jsonify({"error": f"作业ID {homework_id} 不存在"}), 404
+
+        if not is_student_in_course(student_id, homework.course_id):
+            return jsonify({"error": "未选修该课程,无法提交作业"}), 403
+
+        success, result = create_upload_session(
+            student_id, homework, data.get('filename'), data.get('size'))
+        if not success:
+            return jsonify({"error": result}), 400
+        return jsonify({
+            "upload_id": result,
+            "offset": 0,
+            "size": data.get('size')
+        }), 201
+    except Exception as e:
+        return jsonify({"error": f"创建上传会话失败:{str(e)}"}), 500
+
+
+def handle_get_upload_session(student_id, upload_id):
+    """查询已上传的字节数，用于断线后续传"""
+    meta = load_upload_session(upload_id, student_id)
+    offset = get_upload_offset(upload_id) if meta else None
+    if offset is None:
+        return jsonify({"error": SESSION_GONE}), 404
+    return jsonify({
+        "upload_id": upload_id,
+        "offset": offset,
+        "size": meta["size"]
+    }), 200
+
+
+def handle_upload_chunk(student_id, upload_id, offset, stream):
+    """追加一个分片"""
+    meta = load_upload_session(upload_id, student_id)
+    if not meta:
+        return jsonify({"error": SESSION_GONE}), 404
+
+    success, result = append_upload_chunk(upload_id, meta, offset, stream)
+    if not success:
+        return _upload_error(upload_id, result)
+    return jsonify({
+        "upload_id": upload_id,
+        "offset": result,
+        "size": meta["size"]
+    }), 200
+
+
+def handle_complete_upload(student_id, upload_id):
+    """完成分片上传，返回图片URL"""
+    meta = load_upload_session(upload_id, student_id)
+    if not meta:
+        return jsonify({"error": SESSION_GONE}), 404
+
+    try:
+        success, result = finalize_upload_session(upload_id, meta)
+    except Exception as e:
+        return jsonify({"error": f"文件保存失败: {str(e)}"}), 500
+    if not success:
+        return _upload_error(upload_id, result)
+    return jsonify({"image_url": get_file_url(result)}), 201
+
+
+def _upload_error(upload_id, error):
+    """会话已被删除（完成或过期）时返回 404，否则返回 409 和当前 offset，客户端据此从正确位置续传"""
+    offset = get_upload_offset(upload_id)
+    if offset is None:
+        return jsonify({"error": SESSION_GONE}), 404
+    return jsonify({"error": error, "offset": offset}), 409
+
+
+def handle_student_change_feed_token(jwt_payload):
+    """用访问令牌换取建立变更推送连接的流令牌"""
+    if not change_feed.enabled:
+        return jsonify({"error": "变更推送未开启"}), 503
+    return jsonify({
+        "token": change_feed.create_stream_token(jwt_payload),
+        "expires_in": current_app.config['CHANGE_FEED_TOKEN_EXPIRES']
+    }), 201
+
+
+def handle_student_change_feed(token):
+    """学生的变更推送（SSE）：新作业、作业修改、批改结果"""
+    if not change_feed.enabled:
+        return jsonify({"error": "变更推送未开启"}), 503
+
+    student_id, claims = change_feed.load_stream_token(token, "student")
+    if student_id is None:
+        return jsonify({"error": "流令牌无效、已过期或已使用"}), 401
+
+    success, result = get_student_feed_topics(student_id)
+    if not success:
+        return jsonify({"error": result}), 400
+    return change_feed.response(result, claims)
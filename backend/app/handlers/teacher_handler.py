@@ -1,5 +1,8 @@
-from flask import jsonify
-from flask_jwt_extended import create_access_token
+import csv
+import io
+import json
+from flask import current_app, jsonify, Response, stream_with_context
+from flask_jwt_extended import create_refresh_token
 from app.services.teacher_service import (
     authenticate_teacher,
     register_teacher,
@@ -12,13 +15,20 @@ from app.services.teacher_service import (
     create_homework,
     get_course_homeworks,
     get_student_submissions,
+    get_student_submissions_version,
+    get_course_gradebook,
     grade_submission,
+    grade_submissions_bulk,
     update_homework_service,
     delete_homework_service,
-    get_course_students_service
+    get_course_students_service,
+    get_teacher_feed_topics
 )
-from app.models import StaffCourseRelation
-from app.util.auth import is_staff_in_course
+from app.util.auth import create_member_access_token
+from app.util.change_feed import change_feed
+from app.util.conditional import make_etag, not_modified, with_etag
+from app.util.signed_url import signing_window
+from app.util.token_denylist import token_denylist
 
 
 def handle_teacher_login(data):
@@ -33,12 +43,13 @@ def handle_teacher_login(data):
     if not success:
         return jsonify({"error": result}), 401
 
-    # 创建JWT令牌
-    identity_str = f"teacher:{result['id']}"
-    access_token = create_access_token(identity=identity_str)
+    # 创建JWT令牌（identity 为 teacher:1，附带所属课程声明）
+    access_token = create_member_access_token("teacher", result['id'])
+    refresh_token = create_refresh_token(identity=f"teacher:{result['id']}")
 
     return jsonify({
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "teacher": {
             "id": result["id"],
             "staff_no": result["staff_no"],
@@ -49,6 +60,19 @@ def handle_teacher_login(data):
     }), 200
 
 
+def handle_teacher_refresh_token(teacher_id):
+    """凭刷新令牌换发访问令牌（重新读取课程声明，不校验密码）"""
+    return jsonify({
+        "access_token": create_member_access_token("teacher", teacher_id)
+    }), 200
+
+
+def handle_teacher_logout(jwt_payload):
+    """登出：吊销本次登录签发的访问令牌与刷新令牌"""
+    token_denylist.revoke_token(jwt_payload)
+    return jsonify({"message": "已退出登录"}), 200
+
+
 def handle_teacher_register(data):
     """处理教师注册请求"""
     success, result = register_teacher(data)
@@ -104,6 +128,8 @@ def handle_update_teacher_password(teacher_id, password_data):
     success, error_msg = update_teacher_password(
         teacher_id, old_password, new_password)
     if success:
+        # 吊销此前签发的全部令牌（包括刷新令牌）
+        token_denylist.revoke_identity(f"teacher:{teacher_id}")
         return jsonify({"message": "密码修改成功，请重新登录"}), 200
     return jsonify({"error": error_msg}), 400
 
@@ -123,28 +149,17 @@ def handle_create_course(teacher_id, course_data):
     """处理创建课程"""
     success, result = create_course(teacher_id, course_data)
     if success:
+        # 新课程加入了教师的成员关系，旧令牌的课程声明已失效，换发新令牌
         return jsonify({
             "message": "课程创建成功",
-            "course": result
+            "course": result,
+            "access_token": create_member_access_token("teacher", teacher_id)
         }), 201
     return jsonify({"error": result}), 400
 
 
 def handle_update_course(teacher_id, course_id, update_data):
     """处理更新课程"""
-    try:
-        course_id = int(course_id)
-    except ValueError:
-        return jsonify({"error": "课程ID必须为数字"}), 400
-
-    # 验证教师是否有权限修改该课程
-    relation = StaffCourseRelation.query.filter_by(
-        staff_id=teacher_id,
-        course_id=course_id
-    ).first()
-    if not relation:
-        return jsonify({"error": "无权限修改该课程"}), 403
-
     success, result = update_course(course_id, update_data)
     if success:
         return jsonify({
@@ -156,19 +171,6 @@ def handle_update_course(teacher_id, course_id, update_data):
 
 def handle_create_homework(teacher_id, course_id, homework_data):
     """处理创建作业"""
-    try:
-        course_id = int(course_id)
-    except ValueError:
-        return jsonify({"error": "课程ID必须为数字"}), 400
-
-    # 验证权限
-    relation = StaffCourseRelation.query.filter_by(
-        staff_id=teacher_id,
-        course_id=course_id
-    ).first()
-    if not relation:
-        return jsonify({"error": "无权限为该课程创建作业"}), 403
-
     success, result = create_homework(course_id, teacher_id, homework_data)
     if success:
         return jsonify({
@@ -180,19 +182,6 @@ def handle_create_homework(teacher_id, course_id, homework_data):
 
 def handle_get_course_homeworks(teacher_id, course_id):
     """获取课程作业列表"""
-    try:
-        course_id = int(course_id)
-    except ValueError:
-        return jsonify({"error": "课程ID必须为数字"}), 400
-
-    # 验证权限
-    relation = StaffCourseRelation.query.filter_by(
-        staff_id=teacher_id,
-        course_id=course_id
-    ).first()
-    if not relation:
-        return jsonify({"error": "无权限查看该课程作业"}), 403
-
     success, data = get_course_homeworks(course_id)
     if success:
         return jsonify({
@@ -202,38 +191,79 @@ def handle_get_course_homeworks(teacher_id, course_id):
     return jsonify({"error": data}), 400
 
 
-def handle_get_student_submissions(teacher_id, course_id, homework_id):
-    """获取学生作业提交列表"""
-    try:
-        course_id = int(course_id)
-        homework_id = int(homework_id)
-    except ValueError:
-        return jsonify({"error": "课程ID和作业ID必须为数字"}), 400
-
-    # 验证权限
-    relation = StaffCourseRelation.query.filter_by(
-        staff_id=teacher_id,
-        course_id=course_id
-    ).first()
-    if not relation:
-        return jsonify({"error": "无权限查看该课程提交记录"}), 403
+def handle_get_student_submissions(teacher_id, course_id, homework_id, limit, cursor,
+                                   if_none_match=None):
+    """获取学生作业提交列表（支持 If-None-Match，数据未变化时返回 304）"""
+    # 分页参数不同对应不同的响应，一并计入 ETag
+    version = get_student_submissions_version(course_id, homework_id)
+    # 提交图片URL带签名，签名窗口计入 ETag
+    etag = make_etag("student_submissions", version, limit, cursor,
+                     signing_window()) if version else None
+    if etag and if_none_match and if_none_match.contains_weak(etag):
+        return not_modified(etag)
 
-    success, data = get_student_submissions(course_id, homework_id)
+    success, data = get_student_submissions(
+        course_id, homework_id, limit, cursor)
     if success:
-        return jsonify({
-            "submission_list": data,
-            "count": len(data)
+        submission_list, next_cursor = data
+        response = jsonify({
+            "submission_list": submission_list,
+            "count": len(submission_list),
+            "next_cursor": next_cursor
         }), 200
+        return with_etag(response, etag) if etag else response
     return jsonify({"error": data}), 400
 
 
+def handle_export_course_gradebook(teacher_id, course_id, export_format):
+    """流式导出课程成绩册（csv / ndjson）"""
+    if export_format not in ("csv", "ndjson"):
+        return jsonify({"error": "导出格式仅支持csv或ndjson"}), 400
+
+    success, data = get_course_gradebook(course_id)
+    if not success:
+        return jsonify({"error": data}), 400
+    homework_columns, rows = data
+
+    if export_format == "csv":
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+
+            def flush():
+                chunk = buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+                return chunk
+
+            writer.writerow(["student_id", "student_no", "name"] + [
+                f"hw{hw['course_hw_no']} {hw['title']}" for hw in homework_columns
+            ])
+            # 表头在查询执行前就发出，保证首字节尽早到达客户端
+            yield flush()
+            for row in rows:
+                writer.writerow([row["student_id"], row["student_no"], row["name"]] + [
+                    "" if score is None else score for score in row["scores"]
+                ])
+                yield flush()
+
+        mimetype = "text/csv"
+    else:
+        def generate():
+            yield json.dumps({"homeworks": homework_columns}, ensure_ascii=False) + "\n"
+            for row in rows:
+                yield json.dumps(row, ensure_ascii=False) + "\n"
+
+        mimetype = "application/x-ndjson"
+
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers["Content-Disposition"] = \
+        f"attachment; filename=course_{course_id}_gradebook.{export_format}"
+    return response
+
+
 def handle_grade_submission(teacher_id, submission_id, grade_data):
     """处理作业批改"""
-    try:
-        submission_id = int(submission_id)
-    except ValueError:
-        return jsonify({"error": "提交ID必须为数字"}), 400
-
     score = grade_data.get('score')
     annotation = grade_data.get('annotation_data')
 
@@ -253,14 +283,29 @@ def handle_grade_submission(teacher_id, submission_id, grade_data):
         }), 200
     return jsonify({"error": result}), 400
 
+
+def handle_grade_submissions_bulk(teacher_id, course_id, grade_data):
+    """处理批量批改：课程权限只校验一次，逐条返回结果"""
+    items = grade_data.get('grades') if isinstance(grade_data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "grades必须是非空数组"}), 400
+    max_items = current_app.config['BULK_GRADE_MAX_ITEMS']
+    if len(items) > max_items:
+        return jsonify({"error": f"单次最多批改{max_items}份作业"}), 400
+
+    success, result = grade_submissions_bulk(course_id, teacher_id, items)
+    if success:
+        succeeded = sum(1 for item in result if item["success"])
+        return jsonify({
+            "message": f"批改完成：成功{succeeded}份，失败{len(result) - succeeded}份",
+            "results": result
+        }), 200
+    return jsonify({"error": result}), 400
+
 # 处理作业更新
 
 
 def handle_update_homework(staff_id, course_id, homework_id, homework_data):
-    # 权限验证
-    if not is_staff_in_course(staff_id, course_id):
-        return jsonify({"error": "无此课程权限"}), 403
-
     # 调用服务层
     success, result = update_homework_service(
         homework_id, course_id, homework_data)
@@ -272,10 +317,6 @@ def handle_update_homework(staff_id, course_id, homework_id, homework_data):
 
 
 def handle_delete_homework(staff_id, course_id, homework_id):
-    # 权限验证
-    if not is_staff_in_course(staff_id, course_id):
-        return jsonify({"error": "无此课程权限"}), 403
-
     # 调用服务层
     success, result = delete_homework_service(homework_id, course_id)
     if success:
@@ -285,16 +326,39 @@ def handle_delete_homework(staff_id, course_id, homework_id):
 # 处理选课学生查询
 
 
-def handle_get_course_students(staff_id, course_id):
-    # 权限验证
-    if not is_staff_in_course(staff_id, course_id):
-        return jsonify({"error": "无此课程权限"}), 403
-
+def handle_get_course_students(staff_id, course_id, limit, cursor):
     # 调用服务层
-    success, result = get_course_students_service(course_id)
+    success, result = get_course_students_service(course_id, limit, cursor)
     if success:
+        student_list, next_cursor = result
         return jsonify({
-            "student_list": result,
-            "count": len(result)
+            "student_list": student_list,
+            "count": len(student_list),
+            "next_cursor": next_cursor
         }), 200
     return jsonify({"error": result}), 400
+
+
+def handle_teacher_change_feed_token(jwt_payload):
+    """用访问令牌换取建立变更推送连接的流令牌"""
+    if not change_feed.enabled:
+        return jsonify({"error": "变更推送未开启"}), 503
+    return jsonify({
+        "token": change_feed.create_stream_token(jwt_payload),
+        "expires_in": current_app.config['CHANGE_FEED_TOKEN_EXPIRES']
+    }), 201
+
+
+def handle_teacher_change_feed(token):
+    """教师的变更推送（SSE）：所属课程的学生提交"""
+    if not change_feed.enabled:
+        return jsonify({"error": "变更推送未开启"}), 503
+
+    teacher_id, claims = change_feed.load_stream_token(token, "teacher")
+    if teacher_id is None:
+        return jsonify({"error": "流令牌无效、已过期或已使用"}), 401
+
+    success, result = get_teacher_feed_topics(teacher_id)
+    if not success:
+        return jsonify({"error": result}), 400
+    return change_feed.response(result, claims)
@@ -23,6 +23,13 @@ class HomeworkType(enum.Enum):
     short = 'short'
     long = 'long'
 
+
+class AIFeedbackJobStatus(enum.Enum):
+    pending = 'pending'
+    running = 'running'
+    done = 'done'
+    failed = 'failed'
+
 # 学生表
 
 
@@ -35,6 +42,9 @@ class Student(db.Model):
     phone = db.Column(db.String(20))
     email = db.Column(db.String(100))
     create_time = db.Column(db.DateTime, default=datetime.utcnow)
+    # 选课变化时递增，令牌中的课程声明版本不一致即视为过期
+    membership_version = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0')
 
     # 关联：学生-课程（多对多）
     courses = db.relationship(
@@ -53,6 +63,9 @@ class Staff(db.Model):
     phone = db.Column(db.String(20))
     email = db.Column(db.String(100))
     create_time = db.Column(db.DateTime, default=datetime.utcnow)
+    # 任课关系变化时递增，令牌中的课程声明版本不一致即视为过期
+    membership_version = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0')
 
     # 关联：教职工-课程（多对多）
     courses = db.relationship(
@@ -99,8 +112,13 @@ class StudentCourseRelation(db.Model):
         'course.id', ondelete='CASCADE'), nullable=False)
     enroll_time = db.Column(db.DateTime, default=datetime.utcnow)
 
-    __table_args__ = (db.UniqueConstraint(
-        'student_id', 'course_id', name='unique_student_course'),)
+    __table_args__ = (
+        db.UniqueConstraint(
+            'student_id', 'course_id', name='unique_student_course'),
+        # 按课程查选课学生（按学生id分页）、成绩册导出
+        db.Index('ix_student_course_relation_course_id_student_id',
+                 'course_id', 'student_id'),
+    )
 
 # 教职工-课程关联表（多对多）
 
@@ -113,8 +131,12 @@ class StaffCourseRelation(db.Model):
         'course.id', ondelete='CASCADE'), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # 授课角色（如"主讲教师"）
 
-    __table_args__ = (db.UniqueConstraint(
-        'staff_id', 'course_id', name='unique_staff_course'),)
+    __table_args__ = (
+        db.UniqueConstraint(
+            'staff_id', 'course_id', name='unique_staff_course'),
+        # 按课程查授课教师
+        db.Index('ix_staff_course_relation_course_id', 'course_id'),
+    )
 
 # 作业表
 
@@ -136,6 +158,16 @@ class Homework(db.Model):
     type = db.Column(db.Enum(HomeworkType))
     deadline = db.Column(db.DateTime, nullable=False, index=True)
     create_time = db.Column(db.DateTime, default=datetime.utcnow)
+    # 最后修改时间，用于列表接口的 ETag
+    update_time = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # 冗余计数，由提交/批改服务在同一事务中维护，避免列表页 COUNT
+    submission_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0')
+    graded_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0')
+    late_submission_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0')
 
     # 关联：作业-提交记录（一对多）
     submissions = db.relationship(
@@ -163,8 +195,12 @@ class HomeworkSubmission(db.Model):
     submit_time = db.Column(db.DateTime, default=datetime.utcnow)
     is_graded = db.Column(db.Boolean, default=False)  # 是否批改
 
-    __table_args__ = (db.UniqueConstraint(
-        'student_id', 'homework_id', name='unique_student_homework'),)
+    __table_args__ = (
+        db.UniqueConstraint(
+            'student_id', 'homework_id', name='unique_student_homework'),
+        # 按作业查提交列表（按提交id游标分页）
+        db.Index('ix_homework_submission_homework_id_id', 'homework_id', 'id'),
+    )
 
 # 作业批改表
 
@@ -182,3 +218,28 @@ class HomeworkGrading(db.Model):
 
     __table_args__ = (db.UniqueConstraint(
         'submission_id', name='unique_submission'),)
+
+# AI评语生成任务表（后台 worker 消费，结果写入 HomeworkGrading.ai_feedback）
+
+
+class AIFeedbackJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey(
+        'homework_submission.id', ondelete='CASCADE'), nullable=False, unique=True)
+    status = db.Column(db.Enum(AIFeedbackJobStatus), nullable=False,
+                       default=AIFeedbackJobStatus.pending)
+    attempts = db.Column(
+        db.Integer, nullable=False, default=0, server_default='0')  # 已执行次数
+    last_error = db.Column(db.Text)
+    # 失败重试的退避：早于该时间不领取
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # 被 worker 领取的时间；超时仍未完成视为 worker 已退出，可被重新领取
+    locked_at = db.Column(db.DateTime)
+    # 每次领取生成的随机标识，完成时据此确认任务未被重置或被其他 worker 重新领取
+    claim_token = db.Column(db.String(32))
+    create_time = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # worker 按状态和可执行时间领取任务
+        db.Index('ix_ai_feedback_job_status_run_after', 'status', 'run_after'),
+    )
@@ -1,26 +1,30 @@
-from flask import Blueprint, jsonify, send_from_directory, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import StaffCourseRelation
-from app.util import parse_identity
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
+from app.util.auth import current_principal, is_staff_in_course
+from app.util.file_upload import send_upload
+from app.util.image_variant import ensure_image_variant
+from app.config import IMAGE_VARIANTS
+from app.util.signed_url import verify_upload_signature
 
 upload_bp = Blueprint('uploads', __name__)
 
 
 @upload_bp.route('/uploads/<path:filename>')  # 使用path转换器支持多级目录
-@jwt_required()
+@jwt_required(optional=True)
 def uploaded_file(filename):
     """
     验证图片访问权限：
+    - 带有效签名（expires + sig）的URL：签发时已完成权限校验，直接放行，不访问数据库
     - 老师：仅能访问自己所属课程的post目录和所有学生的submit目录
     - 学生：仅能访问自己的submit目录，无权访问post目录
     """
-    identity_str = get_jwt_identity()
-# NOTE: either student_id or reacher_id is None if we get the jwt identity
-    student_id, student_error_response = parse_identity(
-        identity_str, expected_role="student")
-    teacher_id, teacher_error_response = parse_identity(
-        identity_str, expected_role="teacher")
-    if student_error_response or teacher_error_response:
+    if verify_upload_signature(filename, request.args.get('expires'), request.args.get('sig')):
+        return _send_upload_variant(filename)
+
+    principal = current_principal()
+    if principal is None:
+        return jsonify({"error": "缺少有效的访问凭证"}), 401
+    if principal.role not in ("student", "teacher"):
         return jsonify({"error": "无权访问"}), 403
 
     path_parts = filename.split('/')
@@ -50,32 +54,34 @@ def uploaded_file(filename):
             return jsonify({"error": "学生ID格式无效"}), 400
 
     # 5. 权限校验逻辑
-    # 5.1 访问者是老师（teacher_id存在）
-    if teacher_id is not None:
+    # 5.1 访问者是老师
+    if principal.role == "teacher":
         # 验证老师是否属于当前课程（通过StaffCourseRelation关联）
-        is_course_teacher = StaffCourseRelation.query.filter_by(
-            staff_id=teacher_id,
-            course_id=course_id
-        ).first() is not None
-
-        if not is_course_teacher:
+        if not is_staff_in_course(principal.id, course_id):
             return jsonify({"error": "无权访问非所属课程的资源"}), 403
 
         # 老师可以访问所属课程的post目录和所有学生的submit目录（无需额外校验）
         pass  # 权限通过
 
-    # 5.2 访问者是学生（student_id存在）
-    elif student_id is not None:
+    # 5.2 访问者是学生
+    else:
         # 学生无权访问post目录（老师资源）
         if resource_type == "post":
             return jsonify({"error": "学生无权访问老师发布的资源"}), 403
 
         # 学生访问submit目录：必须是自己提交的（路径中的student_id与自己一致）
-        if resource_type == "submit" and submit_student_id != student_id:
+        if resource_type == "submit" and submit_student_id != principal.id:
             return jsonify({"error": "无权访问其他学生的提交资源"}), 403
 
-    # 5.3 既不是老师也不是学生（身份无效）
-    else:
-        return jsonify({"error": "无效的用户身份"}), 403
+    return _send_upload_variant(filename)
+
 
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+def _send_upload_variant(filename):
+    """按 ?variant= 参数发送缩放图（thumb / grading），未指定时发送原图"""
+    variant = request.args.get('variant')
+    if variant:
+        if variant not in IMAGE_VARIANTS:
+            return jsonify({"error": "不支持的图片尺寸"}), 400
+        # 生成失败（如非图片文件）时退回原图
+        filename = ensure_image_variant(filename, variant) or filename
+    return send_upload(filename)
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt
 from app.handlers.admin_handler import (
     handle_admin_login,
+    handle_admin_refresh_token,
+    handle_admin_logout,
     handle_admin_register,  # 可选：仅超级管理员可用
     handle_get_all_teachers,
     handle_get_all_students,
@@ -10,9 +12,14 @@ from app.handlers.admin_handler import (
     handle_delete_user,
     handle_get_admin_profile,
     handle_update_admin_profile,
-    handle_update_admin_password
+    handle_update_admin_password,
+    handle_import_student_roster
 )
-from app.util.parse_identity import parse_identity
+from app.util.auth import role_required
+from app.util.pagination import parse_page_args
+from app.util.db_metrics import get_pool_metrics
+from app.util.response_cache import response_cache
+from app.extensions import db
 
 # 管理员认证路由
 admin_auth_bp = Blueprint('admin_auth', __name__,
@@ -32,19 +39,27 @@ def login():
         return jsonify({"error": "请求数据不能为空"}), 400
     return handle_admin_login(data)
 
+
+@admin_auth_bp.route('/refresh', methods=['POST'])
+@role_required("admin", refresh=True)
+def refresh(admin_id):
+    """凭刷新令牌换发访问令牌"""
+    return handle_admin_refresh_token(admin_id)
+
+
+@admin_auth_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    """管理员登出：携带访问令牌或刷新令牌均可，同一次登录签发的令牌一并吊销"""
+    return handle_admin_logout(get_jwt())
+
 # 注册接口（谨慎开放，建议仅初始化时使用）
 
 
 @admin_auth_bp.route('/register', methods=['POST'])
-@jwt_required()  # 需管理员身份才能创建新管理员
-def register():
+@role_required("admin")  # 需管理员身份才能创建新管理员
+def register(admin_id):
     """创建新管理员（需现有管理员权限）"""
-    identity_str = get_jwt_identity()
-    admin_id, error_response = parse_identity(
-        identity_str, expected_role="admin")
-    if error_response:
-        return error_response
-
     data = request.get_json()
     if not data:
         return jsonify({"error": "请求数据不能为空"}), 400
@@ -54,40 +69,40 @@ def register():
 
 
 @admin_bp.route('/teachers', methods=['GET'])
-@jwt_required()
-def get_all_teachers():
-    identity_str = get_jwt_identity()
-    admin_id, error_response = parse_identity(
-        identity_str, expected_role="admin")
+@role_required("admin")
+def get_all_teachers(admin_id):
+    page_args, error_response = parse_page_args(request.args)
     if error_response:
         return error_response
-    return handle_get_all_teachers()
+    return handle_get_all_teachers(*page_args)
 
 # 获取所有学生
 
 
 @admin_bp.route('/students', methods=['GET'])
-@jwt_required()
-def get_all_students():
-    identity_str = get_jwt_identity()
-    admin_id, error_response = parse_identity(
-        identity_str, expected_role="admin")
+@role_required("admin")
+def get_all_students(admin_id):
+    page_args, error_response = parse_page_args(request.args)
     if error_response:
         return error_response
-    return handle_get_all_students()
+    return handle_get_all_students(*page_args)
 
-# 课程审核
+# 花名册导入
 
 
-@admin_bp.route('/courses/<course_id>/approve', methods=['POST'])
-@jwt_required()
-def approve_course(course_id):
-    identity_str = get_jwt_identity()
-    admin_id, error_response = parse_identity(
-        identity_str, expected_role="admin")
-    if error_response:
-        return error_response
+@admin_bp.route('/students/import', methods=['POST'])
+@role_required("admin")
+def import_student_roster(admin_id):
+    """上传CSV花名册（form-data: file，可选 course_code）批量创建学生并选课，最多 ROSTER_IMPORT_MAX_ROWS 行"""
+    return handle_import_student_roster(
+        request.files.get('file'), request.form.get('course_code'))
+
+# 课程审核
 
+
+@admin_bp.route('/courses/<int:course_id>/approve', methods=['POST'])
+@role_required("admin")
+def approve_course(course_id, admin_id):
     data = request.get_json()
     return handle_approve_course(course_id, data)
 
@@ -95,27 +110,19 @@ def approve_course(course_id):
 
 
 @admin_bp.route('/courses', methods=['GET'])
-@jwt_required()
-def get_all_courses():
-    identity_str = get_jwt_identity()
-    admin_id, error_response = parse_identity(
-        identity_str, expected_role="admin")
+@role_required("admin")
+def get_all_courses(admin_id):
+    page_args, error_response = parse_page_args(request.args)
     if error_response:
         return error_response
-    return handle_get_all_courses()
+    return handle_get_all_courses(*page_args)
 
 # 删除用户（教师/学生）
 
 
-@admin_bp.route('/users/<user_type>/<user_id>', methods=['DELETE'])
-@jwt_required()
-def delete_user(user_type, user_id):
-    identity_str = get_jwt_identity()
-    admin_id, error_response = parse_identity(
-        identity_str, expected_role="admin")
-    if error_response:
-        return error_response
-
+@admin_bp.route('/users/<user_type>/<int:user_id>', methods=['DELETE'])
+@role_required("admin")
+def delete_user(user_type, user_id, admin_id):
     if user_type not in ['teacher', 'student']:
         return jsonify({"error": "用户类型必须为teacher或student"}), 400
     return handle_delete_user(user_type, user_id)
@@ -124,27 +131,16 @@ def delete_user(user_type, user_id):
 
 
 @admin_bp.route('/profile', methods=['GET'])
-@jwt_required()
-def get_admin_profile():
-    identity_str = get_jwt_identity()
-    admin_id, error_response = parse_identity(
-        identity_str, expected_role="admin")
-    if error_response:
-        return error_response
+@role_required("admin")
+def get_admin_profile(admin_id):
     return handle_get_admin_profile(admin_id)
 
 # 更新管理员资料
 
 
 @admin_bp.route('/profile', methods=['PATCH'])
-@jwt_required()
-def update_admin_profile():
-    identity_str = get_jwt_identity()
-    admin_id, error_response = parse_identity(
-        identity_str, expected_role="admin")
-    if error_response:
-        return error_response
-
+@role_required("admin")
+def update_admin_profile(admin_id):
     data = request.get_json()
     return handle_update_admin_profile(admin_id, data)
 
@@ -152,13 +148,23 @@ def update_admin_profile():
 
 
 @admin_bp.route('/password', methods=['PATCH'])
-@jwt_required()
-def update_admin_password():
-    identity_str = get_jwt_identity()
-    admin_id, error_response = parse_identity(
-        identity_str, expected_role="admin")
-    if error_response:
-        return error_response
-
+@role_required("admin")
+def update_admin_password(admin_id):
     data = request.get_json()
     return handle_update_admin_password(admin_id, data)
+
+# 数据库连接池监控
+
+
+@admin_bp.route('/metrics/db-pool', methods=['GET'])
+@role_required("admin")
+def get_db_pool_metrics(admin_id):
+    return jsonify(get_pool_metrics(db.engine)), 200
+
+# 列表缓存命中率与耗时
+
+
+@admin_bp.route('/metrics/response-cache', methods=['GET'])
+@role_required("admin")
+def get_response_cache_metrics(admin_id):
+    return jsonify(response_cache.get_stats()), 200
@@ -5,9 +5,11 @@
 - service: 服务层,实际的处理业务层,handler只负责调用对应的服务
 """
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt
 from app.handlers.student_handler import (
     handle_student_login,
+    handle_student_refresh_token,
+    handle_student_logout,
     handle_student_register,
     handle_get_student_profile,
     handle_get_student_courses,
@@ -18,10 +20,14 @@ from app.handlers.student_handler import (
     handle_update_student_profile,
     handle_update_student_password,
     handle_get_student_submission,
+    handle_create_upload_session,
+    handle_get_upload_session,
+    handle_upload_chunk,
+    handle_complete_upload,
+    handle_student_change_feed,
+    handle_student_change_feed_token,
 )
-from app.util.parse_identity import (
-    parse_identity
-)
+from app.util.auth import role_required
 
 # 认证相关路由蓝图
 student_auth_bp = Blueprint('student_auth', __name__, url_prefix='/api/auth/students')
@@ -49,31 +55,34 @@ def register():
         return jsonify({"error": "请求数据不能为空"}), 400
     return handle_student_register(data)
 
+
+@student_auth_bp.route('/refresh', methods=['POST'])
+@role_required("student", refresh=True)
+def refresh(student_id):
+    """凭刷新令牌换发访问令牌"""
+    return handle_student_refresh_token(student_id)
+
+
+@student_auth_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    """学生登出：携带访问令牌或刷新令牌均可，同一次登录签发的令牌一并吊销"""
+    return handle_student_logout(get_jwt())
+
 # 学生个人信息接口
 
 
 @student_bp.route('/me', methods=['GET'])
-@jwt_required()
-def get_student_profile():
+@role_required("student")
+def get_student_profile(student_id):
     """获取当前登录学生的个人资料"""
-    identity_str = get_jwt_identity()
-    student_id, error_response = parse_identity(
-        identity_str, expected_role="student")
-    if error_response:
-        return error_response
     return handle_get_student_profile(student_id)
 
 
 @student_bp.route('/me', methods=['PATCH'])
-@jwt_required()
-def update_student_profile_route():
+@role_required("student")
+def update_student_profile_route(student_id):
     """修改当前登录学生的个人资料"""
-    identity_str = get_jwt_identity()
-    student_id, error_response = parse_identity(
-        identity_str, expected_role="student")
-    if error_response:
-        return error_response
-
     update_data = request.get_json()
     if not update_data:
         return jsonify({"error": "请求数据不能为空"}), 400
@@ -82,16 +91,9 @@ def update_student_profile_route():
 
 
 @student_bp.route('/me/password', methods=['PATCH'])
-@jwt_required()
-def update_password():
+@role_required("student")
+def update_password(student_id):
     """修改当前登录学生的密码"""
-    identity_str = get_jwt_identity()
-    student_id, error_response = parse_identity(
-        identity_str, expected_role="student"
-    )
-    if error_response:
-        return error_response
-
     password_data = request.get_json()
     if not password_data:
         return jsonify({"error": "请求数据不能为空"}), 400
@@ -101,76 +103,38 @@ def update_password():
 
 
 @student_bp.route('/me/courses', methods=['GET'])
-@jwt_required()
-def get_enrolled_courses():
+@role_required("student")
+def get_enrolled_courses(student_id):
     """获取当前学生已选课程"""
-    identity_str = get_jwt_identity()
-    student_id, error_response = parse_identity(
-        identity_str, expected_role="student")
-    if error_response:
-        return error_response
-
     return handle_get_student_courses(student_id)
 
 
 @student_bp.route('/me/courses', methods=['POST'])
-@jwt_required()
-def enroll_course():
+@role_required("student")
+def enroll_course(student_id):
     """学生选课(准确的说是加入班级)"""
-    identity_str = get_jwt_identity()
-    student_id, error_response = parse_identity(
-        identity_str, expected_role="student")
-    if error_response:
-        return error_response
-
     data = request.get_json()
     return handle_enroll_course(student_id, data.get('course_code'))
 
 
-@student_bp.route('/me/courses/<course_id>/homeworks', methods=['GET'])
-@jwt_required()
-def get_enrolled_course_homeworks(course_id):
+@student_bp.route('/me/courses/<int:course_id>/homeworks', methods=['GET'])
+@role_required("student", course_arg="course_id")
+def get_enrolled_course_homeworks(course_id, student_id):
     """获取某门课程的所有作业"""
-    identity_str = get_jwt_identity()
-    student_id, error_response = parse_identity(
-        identity_str, expected_role="student")
-    if error_response:
-        return error_response
+    return handle_get_enrolled_course_homeworks(
+        student_id, course_id, request.if_none_match)
 
-    return handle_get_enrolled_course_homeworks(student_id, course_id)
 
-
-@student_bp.route('/me/courses/<course_id>/homeworks/<homework_id>/submission', methods=['GET'])
-@jwt_required()
-def get_homework_submission(course_id, homework_id):
+@student_bp.route('/me/courses/<int:course_id>/homeworks/<int:homework_id>/submission', methods=['GET'])
+@role_required("student", course_arg="course_id")
+def get_homework_submission(course_id, homework_id, student_id):
     """查看当前学生在某课程中某作业的提交内容"""
-    # 解析身份信息
-    identity_str = get_jwt_identity()
-    student_id, error_response = parse_identity(
-        identity_str, expected_role="student"
-    )
-    if error_response:
-        return error_response
-
-    # 参数校验（确保ID为数字）
-    try:
-        course_id = int(course_id)
-        homework_id = int(homework_id)
-    except ValueError:
-        return jsonify({"error": "课程ID和作业ID必须为数字"}), 400
-
     return handle_get_student_submission(student_id, course_id, homework_id)
 
 
-@student_bp.route('/me/homeworks/<homework_id>/upload-image', methods=['POST'])
-@jwt_required()
-def upload_homework_image(homework_id):
-    identity_str = get_jwt_identity()
-    student_id, error_response = parse_identity(
-        identity_str, expected_role="student")
-    if error_response:
-        return error_response
-
+@student_bp.route('/me/homeworks/<int:homework_id>/upload-image', methods=['POST'])
+@role_required("student")
+def upload_homework_image(homework_id, student_id):
     if 'file' not in request.files:
         return jsonify({"error": "未找到文件"}), 400
     files = request.files.getlist('file')
@@ -180,16 +144,64 @@ def upload_homework_image(homework_id):
     return handle_upload_homework_image(student_id, homework_id, files)
 
 
-@student_bp.route('/me/homeworks/<homework_id>/submission', methods=['POST'])
-@jwt_required()
-def submit_homework(homework_id):
-    identity_str = get_jwt_identity()
-    student_id, error_response = parse_identity(
-        identity_str, expected_role="student")
-    if error_response:
-        return error_response
+# 分片（断点续传）上传：创建会话 -> 按offset逐片PUT -> 完成
+
+
+@student_bp.route('/me/homeworks/<int:homework_id>/uploads', methods=['POST'])
+@role_required("student")
+def create_upload_session(homework_id, student_id):
+    """创建分片上传会话（请求体：filename, size）"""
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "请求数据不能为空"}), 400
+
+    return handle_create_upload_session(student_id, homework_id, data)
+
+
+@student_bp.route('/me/uploads/<upload_id>', methods=['GET'])
+@role_required("student")
+def get_upload_session(upload_id, student_id):
+    """查询上传进度（已上传字节数）"""
+    return handle_get_upload_session(student_id, upload_id)
+
+
+@student_bp.route('/me/uploads/<upload_id>', methods=['PUT'])
+@role_required("student")
+def upload_chunk(upload_id, student_id):
+    """上传一个分片（?offset=已上传字节数，请求体为原始字节）"""
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({"error": "offset必须为数字"}), 400
+
+    return handle_upload_chunk(student_id, upload_id, offset, request.stream)
+
+
+@student_bp.route('/me/uploads/<upload_id>/complete', methods=['POST'])
+@role_required("student")
+def complete_upload(upload_id, student_id):
+    """完成分片上传"""
+    return handle_complete_upload(student_id, upload_id)
+
+
+@student_bp.route('/me/homeworks/<int:homework_id>/submission', methods=['POST'])
+@role_required("student")
+def submit_homework(homework_id, student_id):
     homework_data = request.get_json()
     if not homework_data:
         return jsonify({"error": "提交数据不能为空"}), 400
 
     return handle_submit_homework(student_id=student_id, homework_id=homework_id, homework_data=homework_data)
+
+
+@student_bp.route('/me/events/token', methods=['POST'])
+@role_required("student")
+def change_feed_token(student_id):
+    """换取流令牌：EventSource 无法设置请求头，流令牌放在 URL 中，因此短期有效且只能使用一次"""
+    return handle_student_change_feed_token(get_jwt())
+
+
+@student_bp.route('/me/events', methods=['GET'])
+def change_feed():
+    """变更推送（text/event-stream），替代轮询作业列表与提交结果（?token= 为 /me/events/token 换取的流令牌）"""
+    return handle_student_change_feed(request.args.get('token'))
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt
 from app.handlers.teacher_handler import (
     handle_teacher_login,
+    handle_teacher_refresh_token,
+    handle_teacher_logout,
     handle_teacher_register,
     handle_get_teacher_profile,
     handle_get_teacher_courses,
@@ -10,14 +12,19 @@ from app.handlers.teacher_handler import (
     handle_create_homework,
     handle_get_course_homeworks,
     handle_get_student_submissions,
+    handle_export_course_gradebook,
     handle_grade_submission,
+    handle_grade_submissions_bulk,
     handle_update_teacher_profile,
     handle_update_teacher_password,
     handle_update_homework,
     handle_delete_homework,
     handle_get_course_students,
+    handle_teacher_change_feed,
+    handle_teacher_change_feed_token,
 )
-from app.util.parse_identity import parse_identity
+from app.util.auth import role_required
+from app.util.pagination import parse_page_args
 
 # 认证相关路由蓝图
 teacher_auth_bp = Blueprint('teacher_auth', __name__, url_prefix='/api/auth/teachers')
@@ -45,31 +52,34 @@ def register():
         return jsonify({"error": "请求数据不能为空"}), 400
     return handle_teacher_register(data)
 
+
+@teacher_auth_bp.route('/refresh', methods=['POST'])
+@role_required("teacher", refresh=True)
+def refresh(teacher_id):
+    """凭刷新令牌换发访问令牌"""
+    return handle_teacher_refresh_token(teacher_id)
+
+
+@teacher_auth_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    """教师登出：携带访问令牌或刷新令牌均可，同一次登录签发的令牌一并吊销"""
+    return handle_teacher_logout(get_jwt())
+
 # 教师个人信息接口
 
 
 @teacher_bp.route('/me', methods=['GET'])
-@jwt_required()
-def get_teacher_profile():
+@role_required("teacher")
+def get_teacher_profile(teacher_id):
     """获取当前登录教师的个人资料"""
-    identity_str = get_jwt_identity()
-    teacher_id, error_response = parse_identity(
-        identity_str, expected_role="teacher")
-    if error_response:
-        return error_response
     return handle_get_teacher_profile(teacher_id)
 
 
 @teacher_bp.route('/me', methods=['PATCH'])
-@jwt_required()
-def update_teacher_profile():
+@role_required("teacher")
+def update_teacher_profile(teacher_id):
     """修改当前登录教师的个人资料"""
-    identity_str = get_jwt_identity()
-    teacher_id, error_response = parse_identity(
-        identity_str, expected_role="teacher")
-    if error_response:
-        return error_response
-
     update_data = request.get_json()
     if not update_data:
         return jsonify({"error": "请求数据不能为空"}), 400
@@ -78,15 +88,9 @@ def update_teacher_profile():
 
 
 @teacher_bp.route('/me/password', methods=['PATCH'])
-@jwt_required()
-def update_password():
+@role_required("teacher")
+def update_password(teacher_id):
     """修改当前登录教师的密码"""
-    identity_str = get_jwt_identity()
-    teacher_id, error_response = parse_identity(
-        identity_str, expected_role="teacher")
-    if error_response:
-        return error_response
-
     password_data = request.get_json()
     if not password_data:
         return jsonify({"error": "请求数据不能为空"}), 400
@@ -97,28 +101,16 @@ def update_password():
 
 
 @teacher_bp.route('/me/courses', methods=['GET'])
-@jwt_required()
-def get_teacher_courses():
+@role_required("teacher")
+def get_teacher_courses(teacher_id):
     """获取当前教师教授的课程"""
-    identity_str = get_jwt_identity()
-    teacher_id, error_response = parse_identity(
-        identity_str, expected_role="teacher")
-    if error_response:
-        return error_response
-
     return handle_get_teacher_courses(teacher_id)
 
 
 @teacher_bp.route('/me/courses', methods=['POST'])
-@jwt_required()
-def create_course():
+@role_required("teacher")
+def create_course(teacher_id):
     """创建新课程"""
-    identity_str = get_jwt_identity()
-    teacher_id, error_response = parse_identity(
-        identity_str, expected_role="teacher")
-    if error_response:
-        return error_response
-
     course_data = request.get_json()
     if not course_data:
         return jsonify({"error": "课程数据不能为空"}), 400
@@ -126,16 +118,10 @@ def create_course():
     return handle_create_course(teacher_id, course_data)
 
 
-@teacher_bp.route('/me/courses/<course_id>', methods=['PATCH'])
-@jwt_required()
-def update_course(course_id):
+@teacher_bp.route('/me/courses/<int:course_id>', methods=['PATCH'])
+@role_required("teacher", course_arg="course_id")
+def update_course(course_id, teacher_id):
     """更新课程信息"""
-    identity_str = get_jwt_identity()
-    teacher_id, error_response = parse_identity(
-        identity_str, expected_role="teacher")
-    if error_response:
-        return error_response
-
     update_data = request.get_json()
     if not update_data:
         return jsonify({"error": "更新数据不能为空"}), 400
@@ -145,29 +131,17 @@ def update_course(course_id):
 # 作业相关接口
 
 
-@teacher_bp.route('/me/courses/<course_id>/homeworks', methods=['GET'])
-@jwt_required()
-def get_course_homeworks(course_id):
+@teacher_bp.route('/me/courses/<int:course_id>/homeworks', methods=['GET'])
+@role_required("teacher", course_arg="course_id")
+def get_course_homeworks(course_id, teacher_id):
     """获取课程下的所有作业"""
-    identity_str = get_jwt_identity()
-    teacher_id, error_response = parse_identity(
-        identity_str, expected_role="teacher")
-    if error_response:
-        return error_response
-
     return handle_get_course_homeworks(teacher_id, course_id)
 
 
-@teacher_bp.route('/me/courses/<course_id>/homeworks', methods=['POST'])
-@jwt_required()
-def create_homework(course_id):
+@teacher_bp.route('/me/courses/<int:course_id>/homeworks', methods=['POST'])
+@role_required("teacher", course_arg="course_id")
+def create_homework(course_id, teacher_id):
     """创建课程作业"""
-    identity_str = get_jwt_identity()
-    teacher_id, error_response = parse_identity(
-        identity_str, expected_role="teacher")
-    if error_response:
-        return error_response
-
     homework_data = request.get_json()
     if not homework_data:
         return jsonify({"error": "作业数据不能为空"}), 400
@@ -177,77 +151,86 @@ def create_homework(course_id):
 # 批改相关接口
 
 
-@teacher_bp.route('/me/courses/<course_id>/homeworks/<homework_id>/submissions', methods=['GET'])
-@jwt_required()
-def get_student_submissions(course_id, homework_id):
+@teacher_bp.route('/me/courses/<int:course_id>/homeworks/<int:homework_id>/submissions', methods=['GET'])
+@role_required("teacher", course_arg="course_id")
+def get_student_submissions(course_id, homework_id, teacher_id):
     """获取学生作业提交列表"""
-    identity_str = get_jwt_identity()
-    teacher_id, error_response = parse_identity(
-        identity_str, expected_role="teacher")
+    page_args, error_response = parse_page_args(request.args)
     if error_response:
         return error_response
+    return handle_get_student_submissions(
+        teacher_id, course_id, homework_id, *page_args, request.if_none_match)
 
-    return handle_get_student_submissions(teacher_id, course_id, homework_id)
 
+@teacher_bp.route('/me/courses/<int:course_id>/gradebook', methods=['GET'])
+@role_required("teacher", course_arg="course_id")
+def export_course_gradebook(course_id, teacher_id):
+    """流式导出课程成绩册（?format=csv|ndjson，默认csv）"""
+    export_format = request.args.get('format', 'csv')
+    return handle_export_course_gradebook(teacher_id, course_id, export_format)
 
-@teacher_bp.route('/me/submissions/<submission_id>/grade', methods=['POST'])
-@jwt_required()
-def grade_submission(submission_id):
-    """批改学生作业"""
-    identity_str = get_jwt_identity()
-    teacher_id, error_response = parse_identity(
-        identity_str, expected_role="teacher")
-    if error_response:
-        return error_response
 
+@teacher_bp.route('/me/submissions/<int:submission_id>/grade', methods=['POST'])
+@role_required("teacher")
+def grade_submission(submission_id, teacher_id):
+    """批改学生作业"""
     grade_data = request.get_json()
     if not grade_data:
         return jsonify({"error": "评分数据不能为空"}), 400
 
     return handle_grade_submission(teacher_id, submission_id, grade_data)
 
-# 编辑作业
 
+@teacher_bp.route('/me/courses/<int:course_id>/grades', methods=['POST'])
+@role_required("teacher", course_arg="course_id")
+def grade_submissions_bulk(course_id, teacher_id):
+    """批量批改：{"grades": [{"submission_id", "score", "annotation_data"}, ...]}"""
+    grade_data = request.get_json()
+    if not grade_data:
+        return jsonify({"error": "评分数据不能为空"}), 400
+
+    return handle_grade_submissions_bulk(teacher_id, course_id, grade_data)
+
+# 编辑作业
 
-@teacher_bp.route('/courses/<course_id>/homeworks/<homework_id>', methods=['PUT'])
-@jwt_required()
-def update_homework(course_id, homework_id):
-    identity_str = get_jwt_identity()
-    staff_id, error_response = parse_identity(
-        identity_str, expected_role="staff")
-    if error_response:
-        return error_response
 
+@teacher_bp.route('/courses/<int:course_id>/homeworks/<int:homework_id>', methods=['PUT'])
+@role_required("teacher", course_arg="course_id")
+def update_homework(course_id, homework_id, teacher_id):
     homework_data = request.get_json()
     if not homework_data:
         return jsonify({"error": "请求数据不能为空"}), 400
 
-    return handle_update_homework(staff_id, course_id, homework_id, homework_data)
+    return handle_update_homework(teacher_id, course_id, homework_id, homework_data)
 
 # 删除作业
 
 
-@teacher_bp.route('/courses/<course_id>/homeworks/<homework_id>', methods=['DELETE'])
-@jwt_required()
-def delete_homework(course_id, homework_id):
-    identity_str = get_jwt_identity()
-    staff_id, error_response = parse_identity(
-        identity_str, expected_role="staff")
-    if error_response:
-        return error_response
-
-    return handle_delete_homework(staff_id, course_id, homework_id)
+@teacher_bp.route('/courses/<int:course_id>/homeworks/<int:homework_id>', methods=['DELETE'])
+@role_required("teacher", course_arg="course_id")
+def delete_homework(course_id, homework_id, teacher_id):
+    return handle_delete_homework(teacher_id, course_id, homework_id)
 
 # 查看选课学生列表
 
 
-@teacher_bp.route('/courses/<course_id>/students', methods=['GET'])
-@jwt_required()
-def get_course_students(course_id):
-    identity_str = get_jwt_identity()
-    staff_id, error_response = parse_identity(
-        identity_str, expected_role="staff")
+@teacher_bp.route('/courses/<int:course_id>/students', methods=['GET'])
+@role_required("teacher", course_arg="course_id")
+def get_course_students(course_id, teacher_id):
+    page_args, error_response = parse_page_args(request.args)
     if error_response:
         return error_response
+    return handle_get_course_students(teacher_id, course_id, *page_args)
+
+
+@teacher_bp.route('/me/events/token', methods=['POST'])
+@role_required("teacher")
+def change_feed_token(teacher_id):
+    """换取流令牌：EventSource 无法设置请求头，流令牌放在 URL 中，因此短期有效且只能使用一次"""
+    return handle_teacher_change_feed_token(get_jwt())
+
 
-    return handle_get_course_students(staff_id, course_id)
+@teacher_bp.route('/me/events', methods=['GET'])
+def change_feed():
+    """变更推送（text/event-stream），替代轮询提交列表（?token= 为 /me/events/token 换取的流令牌）"""
+    return handle_teacher_change_feed(request.args.get('token'))
@@ -1,3 +1,8 @@
+import csv
+import itertools
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert
 from app.extensions import db
 from app.models import (
     Admin,
@@ -7,9 +12,21 @@ from app.models import (
     CourseStatus,
     StaffRole,
     StudentCourseRelation,
-    StaffCourseRelation
+    StaffCourseRelation,
+    Homework,
+    HomeworkSubmission
 )
-from werkzeug.security import check_password_hash, generate_password_hash
+from app.util.auth import bump_membership_version, invalidate_staff_membership
+from app.util.events import publish, course_updated
+from app.util.homework_counter import adjust_homework_counters
+from app.util.password import (
+    hash_password,
+    hash_passwords,
+    upgrade_password_hash,
+    verify_password
+)
+from app.util.db_routing import use_read_replica
+from app.util.pagination import DEFAULT_PAGE_LIMIT, keyset_paginate
 
 
 def authenticate_admin(username, password):
@@ -19,9 +36,12 @@ def authenticate_admin(username, password):
         if not admin:
             return False, "用户名或密码错误"
 
-        if not check_password_hash(admin.password, password):
+        if not verify_password(admin.password, password):
             return False, "用户名或密码错误"
 
+        # 参数过时的哈希在登录成功时升级
+        upgrade_password_hash(admin, password)
+
         admin_data = {
             "id": admin.id,
             "username": admin.username,
@@ -57,7 +77,7 @@ def register_admin(admin_data):
         if len(password) < 8:
             return False, "密码长度不能少于8位"
 
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
         new_admin = Admin(
             username=username,
             name=name,
@@ -79,10 +99,14 @@ def register_admin(admin_data):
         return False, f"创建失败：{str(e)}"
 
 
-def get_all_teachers():
-    """获取所有教师列表"""
+@use_read_replica
+def get_all_teachers(limit=DEFAULT_PAGE_LIMIT, cursor=None):
+    """获取教师列表（按id游标分页），返回 (teacher_list, next_cursor)"""
     try:
-        teachers = Staff.query.filter_by(role=StaffRole.teacher).all()
+        teachers, next_cursor = keyset_paginate(
+            Staff.query.filter_by(role=StaffRole.teacher),
+            Staff.id, limit, cursor
+        )
         teacher_list = []
         for teacher in teachers:
             teacher_list.append({
@@ -93,16 +117,19 @@ def get_all_teachers():
                 "phone": teacher.phone,
                 "create_time": teacher.create_time.isoformat()
             })
-        return True, teacher_list
+        return True, (teacher_list, next_cursor)
     except Exception as e:
         db.session.rollback()
         return False, f"获取教师失败：{str(e)}"
 
 
-def get_all_students():
-    """获取所有学生列表"""
+@use_read_replica
+def get_all_students(limit=DEFAULT_PAGE_LIMIT, cursor=None):
+    """获取学生列表（按id游标分页），返回 (student_list, next_cursor)"""
     try:
-        students = Student.query.all()
+        students, next_cursor = keyset_paginate(
+            Student.query, Student.id, limit, cursor
+        )
         student_list = []
         for student in students:
             student_list.append({
@@ -113,7 +140,7 @@ def get_all_students():
                 "phone": student.phone,
                 "create_time": student.create_time.isoformat()
             })
-        return True, student_list
+        return True, (student_list, next_cursor)
     except Exception as e:
         db.session.rollback()
         return False, f"获取学生失败：{str(e)}"
@@ -131,16 +158,21 @@ def approve_course(course_id, approve_status):
 
         course.status = CourseStatus.approved if approve_status else CourseStatus.rejected
         db.session.commit()
-        return True, f"课程已{'通过' if approve_status else '驳回'}审核"
     except Exception as e:
         db.session.rollback()
         return False, f"审核失败：{str(e)}"
 
+    publish(course_updated, course_id=course_id)
+    return True, f"课程已{'通过' if approve_status else '驳回'}审核"
 
-def get_all_courses():
-    """获取所有课程（含待审核）"""
+
+@use_read_replica
+def get_all_courses(limit=DEFAULT_PAGE_LIMIT, cursor=None):
+    """获取课程列表（含待审核，按id游标分页），返回 (course_list, next_cursor)"""
     try:
-        courses = Course.query.all()
+        courses, next_cursor = keyset_paginate(
+            Course.query, Course.id, limit, cursor
+        )
         course_list = []
         for course in courses:
             course_list.append({
@@ -152,7 +184,7 @@ def get_all_courses():
                 "status": course.status.value,
                 "create_time": course.create_time.isoformat()
             })
-        return True, course_list
+        return True, (course_list, next_cursor)
     except Exception as e:
         db.session.rollback()
         return False, f"获取课程失败：{str(e)}"
@@ -165,23 +197,56 @@ def delete_user(user_type, user_id):
             # 仅删除教师角色用户
             user = Staff.query.filter_by(
                 id=user_id, role=StaffRole.teacher).first()
-            # 级联删除教师与课程的关联
-            StaffCourseRelation.query.filter_by(staff_id=user_id).delete()
+            relation, user_column = StaffCourseRelation, StaffCourseRelation.staff_id
         else:
             user = Student.query.get(user_id)
-            # 级联删除学生选课记录
-            StudentCourseRelation.query.filter_by(student_id=user_id).delete()
+            relation, user_column = StudentCourseRelation, StudentCourseRelation.student_id
+        # 删除关联前记下受影响的课程，提交后逐个发布 course_updated（授课教师、作业计数随之变化）
+        course_ids = [row.course_id for row in db.session.query(
+            relation.course_id).filter(user_column == user_id)]
+        # 级联删除教师与课程的关联 / 学生选课记录
+        relation.query.filter(user_column == user_id).delete()
 
         if not user:
             return False, f"{'教师' if user_type == 'teacher' else '学生'}不存在"
 
+        # 已签发令牌中的课程声明随之失效（用户删除后读不到版本号，这里同时清除本请求内的成员校验结果）
+        bump_membership_version(user_type, [user_id])
+
+        if user_type != 'teacher':
+            # 学生的提交记录会被数据库级联删除，先扣减对应作业的冗余计数
+            submissions = db.session.query(
+                HomeworkSubmission.homework_id,
+                HomeworkSubmission.is_graded,
+                HomeworkSubmission.submit_time,
+                Homework.deadline
+            ).join(
+                Homework,
+                Homework.id == HomeworkSubmission.homework_id
+            ).filter(
+                HomeworkSubmission.student_id == user_id
+            ).all()
+            for sub in submissions:
+                is_late = bool(sub.submit_time) and sub.submit_time > sub.deadline
+                adjust_homework_counters(
+                    sub.homework_id,
+                    submissions=-1,
+                    graded=-1 if sub.is_graded else 0,
+                    late=-1 if is_late else 0
+                )
+
         db.session.delete(user)
         db.session.commit()
-        return True, f"{'教师' if user_type == 'teacher' else '学生'}已删除"
     except Exception as e:
         db.session.rollback()
         return False, f"删除失败：{str(e)}"
 
+    if user_type == 'teacher':
+        invalidate_staff_membership(user_id)
+    for course_id in course_ids:
+        publish(course_updated, course_id=course_id)
+    return True, f"{'教师' if user_type == 'teacher' else '学生'}已删除"
+
 
 def get_admin_profile(admin_id):
     """获取管理员个人资料"""
@@ -242,12 +307,160 @@ def update_admin_password(admin_id, old_password, new_password):
         if not admin:
             return False, "管理员不存在"
 
-        if not check_password_hash(admin.password, old_password):
+        if not verify_password(admin.password, old_password):
             return False, "原密码验证失败"
 
-        admin.password = generate_password_hash(new_password)
+        admin.password = hash_password(new_password)
         db.session.commit()
         return True, ""
     except Exception as e:
         db.session.rollback()
         return False, f"密码更新失败：{str(e)}"
+
+
+ROSTER_FIELDS = ["student_no", "name", "password", "email", "phone", "course_code"]
+
+
+def import_student_roster(lines, course_code=None, max_rows=None):
+    """
+    从CSV花名册批量导入学生并选课（管理员接口与 flask roster import 命令共用）
+    CSV 表头：student_no,name,password[,email,phone,course_code]
+    - 逐块读取（ROSTER_IMPORT_CHUNK_SIZE 行），不把整个文件读入内存
+    - 每块一次 IN 查询已存在的学号与选课记录，已存在的学生不重复创建，只补充选课
+    - 新学生的密码在密码哈希进程池中并行计算，学生与选课记录按块批量插入，每块提交一次
+    :param lines: CSV 文本行的可迭代对象（如文本模式打开的文件）
+    :param course_code: 所有学生都选修的课程代码；为空时使用每行的 course_code 列（可为空）
+    :param max_rows: 最大数据行数（不含表头），超过时不导入任何行；为空时不限制
+    :return: (success, summary/error_msg)
+             summary: {"created", "existing", "enrolled", "already_enrolled", "errors": [{"line", "error"}]}
+    """
+    reader = csv.DictReader(lines)
+    missing = {"student_no", "name", "password"} - set(reader.fieldnames or [])
+    if missing:
+        return False, f"CSV缺少列：{', '.join(sorted(missing))}"
+
+    config = current_app.config
+    summary = {"created": 0, "existing": 0, "enrolled": 0,
+               "already_enrolled": 0, "errors": []}
+    seen = set()  # 文件内已出现的 (学号, 课程代码)
+    courses = {}  # course_code -> course_id（None 表示不存在或未审核通过）
+
+    # 行号从2开始（第1行为表头）
+    rows = enumerate(reader, start=2)
+    if max_rows is not None:
+        # 先读入至多 max_rows + 1 行再开始导入，超出时整个文件拒绝，不留下导入了一半的结果
+        head = list(itertools.islice(rows, max_rows + 1))
+        if len(head) > max_rows:
+            return False, f"花名册超过{max_rows}行，请拆分文件或使用 flask roster import 命令导入"
+        rows = iter(head)
+    while True:
+        chunk = list(itertools.islice(rows, config['ROSTER_IMPORT_CHUNK_SIZE']))
+        if not chunk:
+            break
+        valid = []
+        for line, row in chunk:
+            row = {field: (row.get(field) or "").strip() for field in ROSTER_FIELDS}
+            row["course_code"] = course_code or row["course_code"]
+            if not (row["student_no"] and row["name"] and row["password"]):
+                summary["errors"].append(
+                    {"line": line, "error": "学号、姓名、密码不能为空"})
+            elif (row["student_no"], row["course_code"]) in seen:
+                summary["errors"].append(
+                    {"line": line, "error": "与前面的行重复"})
+            else:
+                seen.add((row["student_no"], row["course_code"]))
+                valid.append((line, row))
+        if valid:
+            _import_roster_chunk(valid, courses, summary)
+
+    return True, summary
+
+
+def _import_roster_chunk(chunk, courses, summary):
+    """导入一块花名册：固定数量的查询 + 批量插入，整块一次提交，失败时整块记为错误"""
+    try:
+        # 1. 课程代码 -> 课程ID（整个导入过程中缓存）
+        unknown_codes = {row["course_code"] for _, row in chunk
+                         if row["course_code"] and row["course_code"] not in courses}
+        if unknown_codes:
+            found = {course.course_code: course.id for course in db.session.query(
+                Course.id, Course.course_code
+            ).filter(
+                Course.course_code.in_(unknown_codes),
+                Course.status == CourseStatus.approved
+            )}
+            for code in unknown_codes:
+                courses[code] = found.get(code)
+
+        rows = []
+        for line, row in chunk:
+            if row["course_code"] and courses[row["course_code"]] is None:
+                summary["errors"].append(
+                    {"line": line, "error": f"课程{row['course_code']}不存在或未审核通过"})
+            else:
+                rows.append(row)
+        if not rows:
+            return
+
+        # 2. 已存在的学号（一次 IN 查询），只为新学生哈希密码并插入
+        #    同一学生可以在多行中选修不同课程，以第一次出现的行为准
+        student_nos = {row["student_no"] for row in rows}
+        student_ids = {student.student_no: student.id for student in db.session.query(
+            Student.id, Student.student_no
+        ).filter(
+            Student.student_no.in_(student_nos)
+        )}
+        existing_count = len(student_ids)
+        new_rows = list({row["student_no"]: row for row in reversed(rows)
+                         if row["student_no"] not in student_ids}.values())
+        if new_rows:
+            hashes = hash_passwords([row["password"] for row in new_rows])
+            now = datetime.utcnow()
+            db.session.execute(insert(Student), [{
+                "student_no": row["student_no"],
+                "name": row["name"],
+                "password": hashed,
+                "email": row["email"],
+                "phone": row["phone"],
+                "create_time": now
+            } for row, hashed in zip(new_rows, hashes)])
+            # MySQL 不支持 RETURNING，插入后按学号再查一次ID
+            student_ids.update({student.student_no: student.id for student in db.session.query(
+                Student.id, Student.student_no
+            ).filter(
+                Student.student_no.in_([row["student_no"] for row in new_rows])
+            )})
+
+        # 3. 选课：一次查询已有的选课记录，其余批量插入
+        pairs = {(student_ids[row["student_no"]], courses[row["course_code"]])
+                 for row in rows if row["course_code"]}
+        existing_pairs = set()
+        if pairs:
+            existing_pairs = set(db.session.query(
+                StudentCourseRelation.student_id, StudentCourseRelation.course_id
+            ).filter(
+                StudentCourseRelation.student_id.in_({p[0] for p in pairs}),
+                StudentCourseRelation.course_id.in_({p[1] for p in pairs})
+            ).all())
+            new_pairs = pairs - existing_pairs
+            if new_pairs:
+                now = datetime.utcnow()
+                db.session.execute(insert(StudentCourseRelation), [{
+                    "student_id": student_id,
+                    "course_id": course_id,
+                    "enroll_time": now
+                } for student_id, course_id in new_pairs])
+                bump_membership_version(
+                    "student", {student_id for student_id, _ in new_pairs})
+
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        summary["errors"].extend(
+            {"line": line, "error": f"导入失败：{str(e)}"} for line, _ in chunk)
+        return
+
+    summary["created"] += len(new_rows)
+    summary["existing"] += existing_count
+    summary["enrolled"] += len(pairs) - len(pairs & existing_pairs)
+    summary["already_enrolled"] += len(pairs & existing_pairs)
@@ -1,4 +1,7 @@
+import os
 from datetime import datetime
+from flask import current_app
+from sqlalchemy import case, func
 from app.extensions import db
 from app.models import (
     Homework,
@@ -8,11 +11,16 @@ from app.models import (
     Course,
     CourseStatus
 )
-from werkzeug.security import (
-    check_password_hash,
-    generate_password_hash,
-)
 import json
+from app.util.auth import bump_membership_version, is_student_in_course
+from app.util.change_feed import course_topic, student_topic
+from app.util.db_routing import use_read_replica
+from app.util.events import publish, submission_created
+from app.util.file_upload import get_upload_dir, prune_upload_dir
+from app.util.homework_counter import adjust_homework_counters
+from app.util.password import hash_password, upgrade_password_hash, verify_password
+from app.util.response_cache import response_cache, student_course_homeworks_key
+from app.util.signed_url import sign_upload_url, sign_upload_urls
 
 
 def authenticate_student(student_no, password):
@@ -27,9 +35,12 @@ def authenticate_student(student_no, password):
         if not student:
             return False, "学号或密码错误"  # 不暴露"学生不存在"，防止信息泄露
 
-        if not check_password_hash(student.password, password):
+        if not verify_password(student.password, password):
             return False, "学号或密码错误"  # 统一错误提示
 
+        # 参数过时的哈希在登录成功时升级
+        upgrade_password_hash(student, password)
+
         # 3. 验证成功，返回学生信息（不含敏感字段）
         student_data = {
             "id": student.id,
@@ -69,7 +80,7 @@ def register_student(student_data):
         if existing_student:
             return False, "该学号已注册"
 
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
 
         new_student = Student(
             student_no=student_no,
@@ -182,10 +193,10 @@ def update_student_password(student_id, old_password, new_password):
             return False, "学生不存在"
 
         # 验证原密码（注意：实际项目中数据库存储的是哈希值）
-        if not check_password_hash(student.password, old_password):
+        if not verify_password(student.password, old_password):
             return False, "原密码验证失败"
 
-        student.password = generate_password_hash(new_password)
+        student.password = hash_password(new_password)
         db.session.commit()
         return True, ""
 
@@ -194,6 +205,7 @@ def update_student_password(student_id, old_password, new_password):
         return False, f"密码更新失败：{str(e)}"
 
 
+@use_read_replica
 def get_student_courses(student_id):
     """
     获取学生已选课程列表（从数据库查询）
@@ -265,6 +277,7 @@ def enroll_course(student_id, course_code):
             enroll_time=datetime.utcnow()
         )
         db.session.add(new_enrollment)
+        bump_membership_version("student", [student_id])
         db.session.commit()
 
         return True, f"成功选修课程: {course.course_name}"
@@ -274,6 +287,26 @@ def enroll_course(student_id, course_code):
         return False, f"选课失败：{str(e)}"
 
 
+@use_read_replica
+def get_student_feed_topics(student_id):
+    """
+    学生变更推送订阅的主题：本人 + 已选课程
+    :return: (success, topics/error_msg)
+    """
+    try:
+        course_ids = [row.course_id for row in db.session.query(
+            StudentCourseRelation.course_id
+        ).filter(
+            StudentCourseRelation.student_id == student_id
+        )]
+    except Exception as e:
+        db.session.rollback()
+        return False, f"获取选课信息失败：{str(e)}"
+
+    return True, [student_topic(student_id)] + [course_topic(i) for i in course_ids]
+
+
+@use_read_replica
 def get_student_course_homeworks(student_id, course_id):
     """
     获取学生已选课程的所有作业
@@ -282,21 +315,77 @@ def get_student_course_homeworks(student_id, course_id):
     :return: (success, data/error_msg) 成功时返回作业列表，失败时返回错误信息
     """
     try:
-        student = Student.query.get(student_id)
-        if not student:
-            return False, "学生不存在"
-
-        course = Course.query.get(course_id)
-        if not course:
-            return False, "课程不存在"
+        course_id = int(course_id)
+    except (TypeError, ValueError):
+        return False, "课程ID必须为数字"
 
-        enrollment = StudentCourseRelation.query.filter_by(
-            student_id=student_id,
-            course_id=course_id
-        ).first()
-        if not enrollment:
+    try:
+        # 令牌声明了该课程时无需查询；否则再区分具体原因
+        if not is_student_in_course(student_id, course_id):
+            if not Student.query.get(student_id):
+                return False, "学生不存在"
+            if not Course.query.get(course_id):
+                return False, "课程不存在"
             return False, "未在该班级课程中,无法查看作业"
 
+        # 作业列表同一课程所有学生共享缓存；是否逾期与当前时间有关、图片URL签名会过期，
+        # 缓存中只保存未签名的URL，每次请求重新计算
+        success, homeworks = response_cache.get_or_set(
+            student_course_homeworks_key(course_id),
+            lambda: _query_student_course_homeworks(course_id)
+        )
+        if not success:
+            return False, homeworks
+
+        now = datetime.utcnow()
+        homework_list = [dict(
+            hw,
+            image_urls=json.dumps(sign_upload_urls(json.loads(
+                hw["image_urls"]))) if hw["image_urls"] else hw["image_urls"],
+            is_overdue=now > datetime.fromisoformat(
+                hw["deadline"]) if hw["deadline"] else False
+        ) for hw in homeworks]
+
+        return True, homework_list
+
+    except Exception as e:
+        db.session.rollback()
+        return False, f"获取作业失败:{str(e)}"
+
+
+@use_read_replica
+def get_student_course_homeworks_version(student_id, course_id):
+    """
+    学生端课程作业列表的数据版本（作业数 + 最后修改时间 + 已逾期作业数），用于生成 ETag
+    选课校验（令牌声明了该课程时无需查询）+ 一条聚合查询，不取出作业内容
+    :return: 版本字符串；课程ID无效、未选课或查询失败时返回 None（由 get_student_course_homeworks 给出具体错误）
+    """
+    try:
+        course_id = int(course_id)
+    except (TypeError, ValueError):
+        return None
+
+    try:
+        if not is_student_in_course(student_id, course_id):
+            return None
+
+        # 是否逾期随时间变化，逾期作业数也计入版本
+        count, last_update, overdue = db.session.query(
+            func.count(Homework.id),
+            func.max(Homework.update_time),
+            func.count(case((Homework.deadline < datetime.utcnow(), 1)))
+        ).filter(
+            Homework.course_id == course_id
+        ).one()
+        return f"{course_id}:{count}:{last_update.isoformat() if last_update else ''}:{overdue}"
+
+    except Exception:
+        db.session.rollback()
+        return None
+
+
+def _query_student_course_homeworks(course_id):
+    try:
         homeworks = Homework.query.filter_by(
             course_id=course_id
         ).order_by(
@@ -306,18 +395,17 @@ def get_student_course_homeworks(student_id, course_id):
 
         homework_list = []
         for hw in homeworks:
-            is_overdue = datetime.utcnow() > hw.deadline if hw.deadline else False
-
             homework_list.append({
                 "id": hw.id,
                 "course_hw_no": hw.course_hw_no,
                 "title": hw.title,
                 "content": hw.content,
-                "image_urls": hw.image_urls,  # NOTE: frontend should parse the json str into array
+                # NOTE: frontend should parse the json str into array
+                # 未签名，由 get_student_course_homeworks 在读取缓存后签名
+                "image_urls": hw.image_urls,
                 "type": hw.type.value if hw.type else None,
                 "deadline": hw.deadline.isoformat() if hw.deadline else None,
                 "create_time": hw.create_time.isoformat() if hw.create_time else None,
-                "is_overdue": is_overdue,
             })
 
         return True, homework_list
@@ -336,11 +424,7 @@ def get_student_homework_submission(student_id, course_id, homework_id):
     :return: (success, data/error_msg) 成功返回提交内容，失败返回错误信息
     """
     try:
-        is_enrolled = StudentCourseRelation.query.filter_by(
-            student_id=student_id,
-            course_id=course_id
-        ).first()
-        if not is_enrolled:
+        if not is_student_in_course(student_id, course_id):
             return False, "未选修该课程，无权限查看"
 
         # 2. 校验作业是否属于该课程
@@ -368,7 +452,7 @@ def get_student_homework_submission(student_id, course_id, homework_id):
             relative_paths = json.loads(submission.image_urls)
             for path in relative_paths:
                 image_urls.append({
-                    "image_url": path
+                    "image_url": sign_upload_url(path)
                 })
 
         # 5. 构造返回数据
@@ -399,25 +483,32 @@ def submit_homework(student_id, homework_id, text_content, image_urls):
         return False, "作业不存在"
 
     course_id = homework.course_id
-    has_enrolled = StudentCourseRelation.query.filter_by(
-        student_id=student_id,
-        course_id=course_id
-    ).first()
-    if not has_enrolled:
+    if not is_student_in_course(student_id, course_id):
         return False, "未在该班级课程中,无权提交作业"
 
+    # 锁定已有提交：与并发的批改（条件更新 is_graded）串行，按锁定后的状态调整计数
     existing_submission = HomeworkSubmission.query.filter_by(
         student_id=student_id,
         homework_id=homework_id
-    ).first()
+    ).with_for_update().first()
 
     image_urls_json = json.dumps(image_urls) if image_urls else None
+    submit_time = datetime.utcnow()
+    is_late = submit_time > homework.deadline
 
     try:
         if existing_submission:
+            # 重新提交：已批改的提交回到未批改状态，迟交状态按新的提交时间重新计算
+            was_late = bool(existing_submission.submit_time) and \
+                existing_submission.submit_time > homework.deadline
+            adjust_homework_counters(
+                homework.id,
+                graded=-1 if existing_submission.is_graded else 0,
+                late=int(is_late) - int(was_late)
+            )
             existing_submission.text_content = text_content
             existing_submission.image_urls = image_urls_json
-            existing_submission.submit_time = datetime.utcnow()
+            existing_submission.submit_time = submit_time
             existing_submission.is_graded = False
             message = "作业重新提交成功"
         else:
@@ -426,14 +517,47 @@ def submit_homework(student_id, homework_id, text_content, image_urls):
                 student_id=student_id,
                 text_content=text_content,
                 image_urls=image_urls_json,
-                submit_time=datetime.utcnow(),
+                submit_time=submit_time,
                 is_graded=False
             )
             db.session.add(new_submission)
+            adjust_homework_counters(
+                homework.id, submissions=1, late=int(is_late))
             message = "作业提交成功"
 
         db.session.commit()
-        return True, message
+        submission_id = (existing_submission or new_submission).id
     except Exception as e:
         db.session.rollback()
         return False, f"提交失败:{str(e)}"
+
+    publish(
+        submission_created,
+        course_id=course_id,
+        homework_id=homework_id,
+        submission_id=submission_id,
+        student_id=student_id,
+        resubmitted=existing_submission is not None
+    )
+    _prune_submission_files(homework, student_id, image_urls)
+    return True, message
+
+
+def _prune_submission_files(homework, student_id, image_urls):
+    """
+    提交记录中的 image_urls 即这份提交的文件集合：普通上传和分片上传写入同一目录，
+    提交成功后删除目录中未被引用的文件（旧提交的图片、上传后未提交的图片）
+    """
+    keep = {os.path.basename(url.split('?', 1)[0])
+            for url in image_urls or [] if isinstance(url, str)}
+    storage_dir = get_upload_dir(
+        course_id=homework.course_id,
+        course_hw_no=homework.course_hw_no,
+        resource_type="submit",
+        student_id=student_id
+    )
+    try:
+        prune_upload_dir(storage_dir, keep)
+    except OSError:
+        # 清理失败不影响提交结果，未清理的文件在下次提交时再处理
+        current_app.logger.exception("清理作业提交目录失败")
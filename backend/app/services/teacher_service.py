@@ -1,5 +1,6 @@
 from datetime import datetime
 import json
+from sqlalchemy import and_, func, insert, update
 from app.extensions import db
 from app.models import (
     Staff,
@@ -14,7 +15,28 @@ from app.models import (
     HomeworkType,
     StaffRole
 )
-from werkzeug.security import check_password_hash, generate_password_hash
+from app.util.ai_feedback import enqueue_ai_feedback, enqueue_ai_feedback_bulk
+from app.util.auth import bump_membership_version, invalidate_staff_membership
+from app.util.change_feed import course_staff_topic
+from app.util.homework_counter import adjust_homework_counters
+from app.util.password import hash_password, upgrade_password_hash, verify_password
+from app.util.db_routing import use_read_replica
+from app.util.events import (
+    publish,
+    course_created,
+    course_updated,
+    homework_created,
+    homework_updated,
+    homework_deleted,
+    grade_recorded
+)
+from app.util.pagination import DEFAULT_PAGE_LIMIT, keyset_paginate
+from app.util.response_cache import (
+    response_cache,
+    course_homeworks_key,
+    teacher_courses_key
+)
+from app.util.signed_url import sign_upload_urls
 
 
 def authenticate_teacher(staff_no, password):
@@ -28,9 +50,12 @@ def authenticate_teacher(staff_no, password):
         if not teacher:
             return False, "工号或密码错误"
 
-        if not check_password_hash(teacher.password, password):
+        if not verify_password(teacher.password, password):
             return False, "工号或密码错误"
 
+        # 参数过时的哈希在登录成功时升级
+        upgrade_password_hash(teacher, password)
+
         teacher_data = {
             "id": teacher.id,
             "staff_no": teacher.staff_no,
@@ -63,7 +88,7 @@ def register_teacher(teacher_data):
         if existing_teacher:
             return False, "该工号已注册"
 
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
         new_teacher = Staff(
             staff_no=staff_no,
             name=name,
@@ -165,10 +190,10 @@ def update_teacher_password(teacher_id, old_password, new_password):
         if not teacher:
             return False, "教师不存在"
 
-        if not check_password_hash(teacher.password, old_password):
+        if not verify_password(teacher.password, old_password):
             return False, "原密码验证失败"
 
-        teacher.password = generate_password_hash(new_password)
+        teacher.password = hash_password(new_password)
         db.session.commit()
         return True, ""
 
@@ -177,8 +202,35 @@ def update_teacher_password(teacher_id, old_password, new_password):
         return False, f"密码更新失败：{str(e)}"
 
 
+@use_read_replica
 def get_teacher_courses(teacher_id):
-    """获取教师教授的课程"""
+    """获取教师教授的课程（结果缓存，课程创建/修改时失效）"""
+    return response_cache.get_or_set(
+        teacher_courses_key(teacher_id),
+        lambda: _query_teacher_courses(teacher_id)
+    )
+
+
+@use_read_replica
+def get_teacher_feed_topics(teacher_id):
+    """
+    教师变更推送订阅的主题：所属课程的教师主题
+    :return: (success, topics/error_msg)
+    """
+    try:
+        course_ids = [row.course_id for row in db.session.query(
+            StaffCourseRelation.course_id
+        ).filter(
+            StaffCourseRelation.staff_id == teacher_id
+        )]
+    except Exception as e:
+        db.session.rollback()
+        return False, f"获取课程信息失败：{str(e)}"
+
+    return True, [course_staff_topic(i) for i in course_ids]
+
+
+def _query_teacher_courses(teacher_id):
     try:
         teacher = Staff.query.filter_by(
             id=teacher_id,
@@ -250,9 +302,9 @@ def create_course(teacher_id, course_data):
             role=course_data.get("role", "主讲教师")
         )
         db.session.add(relation)
+        bump_membership_version("teacher", [teacher_id])
         db.session.commit()
-
-        return True, {
+        result = {
             "id": new_course.id,
             "course_code": new_course.course_code,
             "course_name": new_course.course_name,
@@ -265,6 +317,10 @@ def create_course(teacher_id, course_data):
         db.session.rollback()
         return False, f"创建课程失败：{str(e)}"
 
+    invalidate_staff_membership(teacher_id, result["id"])
+    publish(course_created, course_id=result["id"], teacher_id=teacher_id)
+    return True, result
+
 
 def update_course(course_id, update_data):
     """更新课程信息"""
@@ -290,8 +346,7 @@ def update_course(course_id, update_data):
             setattr(course, field, value)
 
         db.session.commit()
-
-        return True, {
+        result = {
             "id": course.id,
             "course_code": course.course_code,
             "course_name": course.course_name,
@@ -304,6 +359,9 @@ def update_course(course_id, update_data):
         db.session.rollback()
         return False, f"更新课程失败：{str(e)}"
 
+    publish(course_updated, course_id=course_id)
+    return True, result
+
 
 def create_homework(course_id, teacher_id, homework_data):
     """创建作业"""
@@ -357,14 +415,13 @@ def create_homework(course_id, teacher_id, homework_data):
         )
         db.session.add(new_homework)
         db.session.commit()
-
-        return True, {
+        result = {
             "id": new_homework.id,
             "course_id": new_homework.course_id,
             "course_hw_no": new_homework.course_hw_no,
             "title": new_homework.title,
             "content": new_homework.content,
-            "image_urls": json.loads(new_homework.image_urls) if new_homework.image_urls else [],
+            "image_urls": sign_upload_urls(json.loads(new_homework.image_urls)) if new_homework.image_urls else [],
             "type": new_homework.type.value if new_homework.type else None,
             "deadline": new_homework.deadline.isoformat(),
             "create_time": new_homework.create_time.isoformat()
@@ -374,9 +431,25 @@ def create_homework(course_id, teacher_id, homework_data):
         db.session.rollback()
         return False, f"创建作业失败：{str(e)}"
 
+    publish(homework_created, course_id=course_id, homework_id=result["id"])
+    return True, result
+
 
+@use_read_replica
 def get_course_homeworks(course_id):
-    """获取课程作业列表"""
+    """获取课程作业列表（结果缓存，作业增删改、提交和批改时失效）"""
+    success, homeworks = response_cache.get_or_set(
+        course_homeworks_key(course_id),
+        lambda: _query_course_homeworks(course_id)
+    )
+    if not success:
+        return False, homeworks
+    # 签名会过期，缓存中只保存未签名的URL，每次请求重新签名
+    return True, [dict(hw, image_urls=sign_upload_urls(hw["image_urls"]))
+                  for hw in homeworks]
+
+
+def _query_course_homeworks(course_id):
     try:
         course = Course.query.get(course_id)
         if not course:
@@ -397,7 +470,10 @@ def get_course_homeworks(course_id):
                 "image_urls": json.loads(hw.image_urls) if hw.image_urls else [],
                 "type": hw.type.value if hw.type else None,
                 "deadline": hw.deadline.isoformat(),
-                "create_time": hw.create_time.isoformat()
+                "create_time": hw.create_time.isoformat(),
+                "submission_count": hw.submission_count,
+                "graded_count": hw.graded_count,
+                "late_submission_count": hw.late_submission_count
             })
 
         return True, homework_list
@@ -407,8 +483,9 @@ def get_course_homeworks(course_id):
         return False, f"获取作业失败：{str(e)}"
 
 
-def get_student_submissions(course_id, homework_id):
-    """获取学生作业提交列表"""
+@use_read_replica
+def get_student_submissions(course_id, homework_id, limit=DEFAULT_PAGE_LIMIT, cursor=None):
+    """获取学生作业提交列表（按提交id游标分页），返回 (submission_list, next_cursor)"""
     try:
         # 验证作业是否属于该课程
         homework = Homework.query.filter_by(
@@ -418,43 +495,169 @@ def get_student_submissions(course_id, homework_id):
         if not homework:
             return False, "该课程下无此作业"
 
-        # 查询该作业的所有提交
-        submissions = HomeworkSubmission.query.filter_by(
-            homework_id=homework_id
-        ).join(
-            HomeworkSubmission.student
-        ).all()
+        submissions, next_cursor = keyset_paginate(
+            submissions_query(homework_id), HomeworkSubmission.id, limit, cursor,
+            key_getter=lambda row: row[0].id
+        )
 
         submission_list = []
-        for sub in submissions:
-            # 获取评分信息
-            grading = HomeworkGrading.query.filter_by(
-                submission_id=sub.id
-            ).first()
-
+        for sub, student, grading in submissions:
             submission_list.append({
                 "id": sub.id,
                 "student_id": sub.student_id,
-                "student_name": sub.student.name,
-                "student_no": sub.student.student_no,
+                "student_name": student.name,
+                "student_no": student.student_no,
                 "text_content": sub.text_content,
-                "image_urls": json.loads(sub.image_urls) if sub.image_urls else [],
+                "image_urls": sign_upload_urls(json.loads(sub.image_urls)) if sub.image_urls else [],
                 "submit_time": sub.submit_time.isoformat(),
                 "is_graded": sub.is_graded,
                 "grading": {
                     "score": grading.score if grading else None,
                     "annotation_data": json.loads(grading.annotation_data) if (grading and grading.annotation_data) else None,
-                    "grade_time": grading.grade_time.isoformat() if grading else None
+                    "grade_time": grading.grade_time.isoformat() if grading else None,
+                    "ai_feedback": grading.ai_feedback if grading else None
                 } if sub.is_graded else None
             })
 
-        return True, submission_list
+        return True, (submission_list, next_cursor)
 
     except Exception as e:
         db.session.rollback()
         return False, f"获取提交记录失败：{str(e)}"
 
 
+def submissions_query(homework_id):
+    """作业的全部提交（一次联表查询同时取出学生信息与评分，避免逐条查询评分），按提交id分页"""
+    return db.session.query(
+        HomeworkSubmission, Student, HomeworkGrading
+    ).join(
+        Student,
+        Student.id == HomeworkSubmission.student_id
+    ).outerjoin(
+        HomeworkGrading,
+        HomeworkGrading.submission_id == HomeworkSubmission.id
+    ).filter(
+        HomeworkSubmission.homework_id == homework_id
+    )
+
+
+@use_read_replica
+def get_student_submissions_version(course_id, homework_id):
+    """
+    作业提交列表的数据版本（提交数 + 最后提交时间 + 批改数 + 最后批改时间 + 已生成AI评语数），用于生成 ETag
+    一条聚合查询，不取出提交内容；作业不属于该课程或查询失败时返回 None
+    """
+    try:
+        row = db.session.query(
+            func.count(HomeworkSubmission.id),
+            func.max(HomeworkSubmission.submit_time),
+            func.count(HomeworkGrading.id),
+            func.max(HomeworkGrading.grade_time),
+            func.count(HomeworkGrading.ai_feedback)  # AI评语在批改之后异步写入
+        ).select_from(Homework).outerjoin(
+            HomeworkSubmission,
+            HomeworkSubmission.homework_id == Homework.id
+        ).outerjoin(
+            HomeworkGrading,
+            HomeworkGrading.submission_id == HomeworkSubmission.id
+        ).filter(
+            Homework.id == homework_id,
+            Homework.course_id == course_id
+        ).group_by(Homework.id).first()
+    except Exception:
+        db.session.rollback()
+        return None
+
+    if row is None:
+        return None
+    return ":".join(
+        value.isoformat() if isinstance(value, datetime) else str(value)
+        for value in (homework_id, *row)
+    )
+
+
+def get_course_gradebook(course_id):
+    """
+    获取课程成绩册（学生 × 作业 的分数矩阵），用于流式导出
+    :return: (success, data/error_msg) 成功时 data 为 (homework_columns, row_iter)
+             row_iter 逐个产出 {"student_id", "student_no", "name", "scores": [...]}，
+             scores 与 homework_columns 顺序一致，未提交或未批改为 None
+    """
+    try:
+        course = Course.query.get(course_id)
+        if not course:
+            return False, "课程不存在"
+
+        homeworks = db.session.query(
+            Homework.id, Homework.course_hw_no, Homework.title
+        ).filter(
+            Homework.course_id == course_id
+        ).order_by(Homework.course_hw_no).all()
+    except Exception as e:
+        db.session.rollback()
+        return False, f"获取成绩册失败：{str(e)}"
+
+    homework_columns = [{
+        "id": hw.id,
+        "course_hw_no": hw.course_hw_no,
+        "title": hw.title
+    } for hw in homeworks]
+    column_index = {hw.id: i for i, hw in enumerate(homeworks)}
+
+    query = gradebook_query(course_id, list(column_index)).execution_options(
+        stream_results=True, yield_per=500)
+
+    def iter_rows():
+        current = None
+        for row in query:
+            if current is None or current["student_id"] != row.id:
+                if current is not None:
+                    yield current
+                current = {
+                    "student_id": row.id,
+                    "student_no": row.student_no,
+                    "name": row.name,
+                    "scores": [None] * len(column_index)
+                }
+            if row.homework_id is not None:
+                current["scores"][column_index[row.homework_id]] = row.score
+        if current is not None:
+            yield current
+
+    return True, (homework_columns, iter_rows())
+
+
+def gradebook_query(course_id, homework_ids):
+    """
+    成绩册的单条服务端游标查询：选课学生 左联 提交 左联 评分，按学生id排序，
+    调用方边读边按学生聚合成一行，内存只保留当前学生
+    """
+    return db.session.query(
+        Student.id,
+        Student.student_no,
+        Student.name,
+        HomeworkSubmission.homework_id,
+        HomeworkGrading.score
+    ).join(
+        StudentCourseRelation,
+        Student.id == StudentCourseRelation.student_id
+    ).outerjoin(
+        HomeworkSubmission,
+        and_(
+            HomeworkSubmission.student_id == Student.id,
+            HomeworkSubmission.homework_id.in_(homework_ids)
+        )
+    ).outerjoin(
+        HomeworkGrading,
+        HomeworkGrading.submission_id == HomeworkSubmission.id
+    ).filter(
+        StudentCourseRelation.course_id == course_id
+    ).order_by(
+        # 与 Student.id 相等；按关联表列排序可直接沿 (course_id, student_id) 索引读取，无需额外排序
+        StudentCourseRelation.student_id
+    )
+
+
 def grade_submission(submission_id, grader_id, score, annotation_data=None):
     """批改作业"""
     try:
@@ -478,6 +681,7 @@ def grade_submission(submission_id, grader_id, score, annotation_data=None):
             existing_grading.annotation_data = json.dumps(
                 annotation_data) if annotation_data else None
             existing_grading.grade_time = datetime.utcnow()
+            existing_grading.ai_feedback = None  # 旧评语作废，等待重新生成
             grading = existing_grading
         else:
             # 创建新评分记录
@@ -490,11 +694,14 @@ def grade_submission(submission_id, grader_id, score, annotation_data=None):
             )
             db.session.add(grading)
 
-        # 更新提交状态
-        submission.is_graded = True
+        # 更新提交状态（首次批改时计入作业的已批改数）；条件更新保证并发批改同一提交时只计一次
+        if mark_submissions_graded([submission_id]):
+            adjust_homework_counters(submission.homework_id, graded=1)
+        # AI评语由后台 worker 生成，这里只在同一事务中登记任务
+        enqueue_ai_feedback(submission_id)
+        homework_id, student_id = submission.homework_id, submission.student_id
         db.session.commit()
-
-        return True, {
+        result = {
             "submission_id": submission_id,
             "score": grading.score,
             "annotation_data": json.loads(grading.annotation_data) if grading.annotation_data else None,
@@ -506,6 +713,131 @@ def grade_submission(submission_id, grader_id, score, annotation_data=None):
         db.session.rollback()
         return False, f"批改失败：{str(e)}"
 
+    publish(
+        grade_recorded,
+        course_id=lambda: submission.homework.course_id,
+        homework_id=homework_id,
+        submission_id=submission_id,
+        student_id=student_id,
+        grader_id=grader_id,
+        score=score
+    )
+    return True, result
+
+
+def mark_submissions_graded(submission_ids):
+    """
+    把尚未批改的提交标记为已批改（UPDATE ... WHERE is_graded 不为真），返回实际变化的条数
+    并发批改同一提交时，只有先执行的事务计入已批改数，后执行的在行锁释放后看到已批改，返回 0
+    """
+    return HomeworkSubmission.query.filter(
+        HomeworkSubmission.id.in_(submission_ids),
+        HomeworkSubmission.is_graded.is_not(True)
+    ).update({HomeworkSubmission.is_graded: True}, synchronize_session=False)
+
+
+def grade_submissions_bulk(course_id, grader_id, items):
+    """
+    批量批改同一课程下的作业（调用方已校验课程权限）
+    提交记录与已有评分各一次查询，评分批量插入/更新，整批一次提交
+    :param items: [{"submission_id", "score", "annotation_data"}]
+    :return: (success, results/error_msg) results 与 items 一一对应：
+             {"submission_id", "success", "grade_time"} 或 {"submission_id", "success", "error"}
+    """
+    results = [None] * len(items)
+    valid = {}  # submission_id -> (下标, score, annotation_data)
+    for index, item in enumerate(items):
+        submission_id = item.get('submission_id') if isinstance(item, dict) else None
+        score = item.get('score') if isinstance(item, dict) else None
+        if not isinstance(submission_id, int):
+            error = "提交ID必须为数字"
+        elif not isinstance(score, int) or score < 0 or score > 100:
+            error = "分数必须是0-100之间的整数"
+        elif submission_id in valid:
+            error = "同一提交记录重复出现"
+        else:
+            valid[submission_id] = (index, score, item.get('annotation_data'))
+            continue
+        results[index] = {"submission_id": submission_id,
+                          "success": False, "error": error}
+
+    if not valid:
+        return True, results
+
+    try:
+        # 只取属于该课程的提交，其他课程的提交视为不存在
+        submissions = {sub.id: sub for sub in HomeworkSubmission.query.join(
+            Homework,
+            Homework.id == HomeworkSubmission.homework_id
+        ).filter(
+            HomeworkSubmission.id.in_(valid),
+            Homework.course_id == course_id
+        )}
+        grading_ids = {sub_id: grading_id for grading_id, sub_id in db.session.query(
+            HomeworkGrading.id, HomeworkGrading.submission_id
+        ).filter(
+            HomeworkGrading.submission_id.in_(list(submissions))
+        )} if submissions else {}
+
+        now = datetime.utcnow()
+        new_gradings, updated_gradings = [], []
+        graded = {}  # submission_id -> (homework_id, student_id, score)，提交后发布事件用
+        for submission_id, (index, score, annotation_data) in valid.items():
+            submission = submissions.get(submission_id)
+            if submission is None:
+                results[index] = {"submission_id": submission_id,
+                                  "success": False, "error": "提交记录不存在"}
+                continue
+
+            values = {
+                "score": score,
+                "annotation_data": json.dumps(annotation_data) if annotation_data else None,
+                "grade_time": now
+            }
+            if submission_id in grading_ids:
+                # 与单条批改一致：保留原批改人，旧AI评语作废
+                updated_gradings.append(
+                    dict(values, id=grading_ids[submission_id], ai_feedback=None))
+            else:
+                new_gradings.append(
+                    dict(values, submission_id=submission_id, grader_id=grader_id))
+            graded[submission_id] = (
+                submission.homework_id, submission.student_id, score)
+            results[index] = {"submission_id": submission_id,
+                              "success": True, "grade_time": now.isoformat()}
+
+        if graded:
+            if new_gradings:
+                db.session.execute(insert(HomeworkGrading), new_gradings)
+            if updated_gradings:
+                db.session.execute(update(HomeworkGrading), updated_gradings)
+            # 按作业分组条件更新，实际由未批改变为已批改的条数即各作业新增的已批改数
+            by_homework = {}
+            for submission_id, (homework_id, _, _) in graded.items():
+                by_homework.setdefault(homework_id, []).append(submission_id)
+            for homework_id, submission_ids in by_homework.items():
+                adjust_homework_counters(
+                    homework_id, graded=mark_submissions_graded(submission_ids))
+            enqueue_ai_feedback_bulk(list(graded))
+            db.session.commit()
+
+    except Exception as e:
+        db.session.rollback()
+        return False, f"批量批改失败：{str(e)}"
+
+    for submission_id, (homework_id, student_id, score) in graded.items():
+        publish(
+            grade_recorded,
+            course_id=course_id,
+            homework_id=homework_id,
+            submission_id=submission_id,
+            student_id=student_id,
+            grader_id=grader_id,
+            score=score
+        )
+
+    return True, results
+
 # 作业更新服务
 
 
@@ -527,13 +859,20 @@ def update_homework_service(homework_id, course_id, homework_data):
         if 'deadline' in homework_data:
             homework.deadline = datetime.fromisoformat(
                 homework_data['deadline'])
+            # 截止时间变化后迟交数需要按新截止时间重新统计（仅此处需要COUNT）
+            homework.late_submission_count = HomeworkSubmission.query.filter(
+                HomeworkSubmission.homework_id == homework.id,
+                HomeworkSubmission.submit_time > homework.deadline
+            ).count()
 
         db.session.commit()
-        return True, None
     except Exception as e:
         db.session.rollback()
         return False, f"更新失败: {str(e)}"
 
+    publish(homework_updated, course_id=int(course_id), homework_id=int(homework_id))
+    return True, None
+
 # 作业删除服务
 
 
@@ -546,32 +885,25 @@ def delete_homework_service(homework_id, course_id):
             return False, "作业不存在"
 
         # 删除作业
+        deleted_id = homework.id
         db.session.delete(homework)
         db.session.commit()
-        return True, None
     except Exception as e:
         db.session.rollback()
         return False, f"删除失败: {str(e)}"
 
+    publish(homework_deleted, course_id=int(course_id), homework_id=deleted_id)
+    return True, None
+
 # 选课学生查询服务
 
 
-def get_course_students_service(course_id):
+@use_read_replica
+def get_course_students_service(course_id, limit=DEFAULT_PAGE_LIMIT, cursor=None):
     try:
-        # 查询选课学生
-        students = db.session.query(
-            Student.id,
-            Student.student_no,
-            Student.name,
-            Student.email,
-            Student.phone,
-            StudentCourseRelation.enroll_time
-        ).join(
-            StudentCourseRelation,
-            Student.id == StudentCourseRelation.student_id
-        ).filter(
-            StudentCourseRelation.course_id == course_id
-        ).all()
+        students, next_cursor = keyset_paginate(
+            course_students_query(course_id), StudentCourseRelation.student_id, limit, cursor
+        )
 
         # 格式化结果
         student_list = [{
@@ -583,6 +915,23 @@ def get_course_students_service(course_id):
             "enroll_time": s.enroll_time.isoformat()
         } for s in students]
 
-        return True, student_list
+        return True, (student_list, next_cursor)
     except Exception as e:
         return False, f"查询失败: {str(e)}"
+
+
+def course_students_query(course_id):
+    """课程的选课学生（按学生id游标分页）"""
+    return db.session.query(
+        Student.id,
+        Student.student_no,
+        Student.name,
+        Student.email,
+        Student.phone,
+        StudentCourseRelation.enroll_time
+    ).join(
+        StudentCourseRelation,
+        Student.id == StudentCourseRelation.student_id
+    ).filter(
+        StudentCourseRelation.course_id == course_id
+    )
@@ -0,0 +1,316 @@
+"""
+AI评语异步生成（结果写入 HomeworkGrading.ai_feedback）：
+- 批改时在同一事务中写入 AIFeedbackJob（enqueue_ai_feedback），不在请求中调用模型，批改接口耗时不受影响
+- 后台 worker 线程池按批领取任务（SELECT ... FOR UPDATE SKIP LOCKED），一批提交一次模型调用
+- 失败按指数退避重试，超过 AI_FEEDBACK_MAX_ATTEMPTS 次标记为 failed；领取后超时未完成的任务可被重新领取
+- 并发上限即 worker 线程数；多个进程同时运行 worker 时靠行锁避免重复领取
+- 模型后端可插拔：AI_FEEDBACK_BACKEND = none（关闭）/ stub（确定性的本地实现，用于开发测试）/
+  "包.模块:类名"（类以 app.config 初始化，实现 generate(items) -> [str]）
+
+运行方式：
+- 独立进程：flask ai-feedback worker --workers 4
+- 应用进程内：AI_FEEDBACK_IN_PROCESS_WORKERS > 0 时，在收到第一个请求后启动
+"""
+import hashlib
+import importlib
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from sqlalchemy import and_, insert, or_, update
+from app.extensions import db
+from app.models import (
+    AIFeedbackJob,
+    AIFeedbackJobStatus,
+    Homework,
+    HomeworkGrading,
+    HomeworkSubmission
+)
+
+
+class StubFeedbackBackend:
+    """确定性的本地实现：不访问外部服务，相同输入总是得到相同评语"""
+
+    def __init__(self, config=None):
+        pass
+
+    def generate(self, items):
+        return [self._feedback(item) for item in items]
+
+    @staticmethod
+    def _feedback(item):
+        score = item["score"]
+        if score is None:
+            level = "未评分"
+        elif score >= 90:
+            level = "优秀"
+        elif score >= 75:
+            level = "良好"
+        elif score >= 60:
+            level = "及格"
+        else:
+            level = "需改进"
+        text = item["text_content"] or ""
+        digest = hashlib.sha1(text.encode()).hexdigest()[:8]
+        return (f"《{item['homework_title']}》得分 {score}（{level}）。"
+                f"文字作答 {len(text)} 字，图片 {item['image_count']} 张。[stub:{digest}]")
+
+
+def load_backend(name, config):
+    """按 AI_FEEDBACK_BACKEND 创建模型后端，none 时返回 None"""
+    if name == 'none':
+        return None
+    if name == 'stub':
+        return StubFeedbackBackend(config)
+    module_name, _, class_name = name.partition(':')
+    if not class_name:
+        raise ValueError(f"AI_FEEDBACK_BACKEND 格式应为 '包.模块:类名'：{name}")
+    return getattr(importlib.import_module(module_name), class_name)(config)
+
+
+def enqueue_ai_feedback(submission_id):
+    """
+    为提交创建（或重置）评语生成任务；只加入当前事务，由调用方统一 commit
+    重新批改时重置任务，正在执行的旧任务完成时会因领取标识不一致而被丢弃
+    """
+    enqueue_ai_feedback_bulk([submission_id])
+
+
+def enqueue_ai_feedback_bulk(submission_ids):
+    """批量版本：一次查询已有任务，已有的批量重置，其余批量插入"""
+    if current_app.config['AI_FEEDBACK_BACKEND'] == 'none' or not submission_ids:
+        return
+
+    existing = {row.submission_id: row.id for row in db.session.query(
+        AIFeedbackJob.id, AIFeedbackJob.submission_id
+    ).filter(
+        AIFeedbackJob.submission_id.in_(submission_ids)
+    )}
+    now = datetime.utcnow()
+    if existing:
+        db.session.execute(update(AIFeedbackJob), [{
+            "id": job_id,
+            "status": AIFeedbackJobStatus.pending,
+            "attempts": 0,
+            "last_error": None,
+            "run_after": now,
+            "locked_at": None,
+            "claim_token": None
+        } for job_id in existing.values()])
+    new_ids = [i for i in dict.fromkeys(submission_ids) if i not in existing]
+    if new_ids:
+        db.session.execute(insert(AIFeedbackJob), [{
+            "submission_id": submission_id,
+            "status": AIFeedbackJobStatus.pending,
+            "run_after": now,
+            "create_time": now
+        } for submission_id in new_ids])
+
+
+def claim_jobs(limit):
+    """
+    领取最多 limit 个可执行的任务并标记为 running
+    :return: (领取标识, [job_id])；领取标识用于完成时确认任务未被重置或重新领取
+    """
+    now = datetime.utcnow()
+    claim_token = uuid.uuid4().hex
+    stale = now - timedelta(seconds=current_app.config['AI_FEEDBACK_JOB_TIMEOUT'])
+    jobs = AIFeedbackJob.query.filter(or_(
+        and_(AIFeedbackJob.status == AIFeedbackJobStatus.pending,
+             AIFeedbackJob.run_after <= now),
+        and_(AIFeedbackJob.status == AIFeedbackJobStatus.running,
+             AIFeedbackJob.locked_at < stale)
+    )).order_by(
+        AIFeedbackJob.id
+    ).limit(limit).with_for_update(skip_locked=True).all()
+
+    job_ids = []
+    for job in jobs:
+        if job.status == AIFeedbackJobStatus.running and \
+                job.attempts >= current_app.config['AI_FEEDBACK_MAX_ATTEMPTS']:
+            # 超时的任务视为一次失败，次数已用完时不再重新领取
+            job.status = AIFeedbackJobStatus.failed
+            job.locked_at = None
+            job.last_error = "执行超时"
+            continue
+        job.status = AIFeedbackJobStatus.running
+        job.locked_at = now
+        job.claim_token = claim_token
+        job.attempts += 1
+        job_ids.append(job.id)
+    db.session.commit()
+    return claim_token, job_ids
+
+
+def process_batch(backend, batch_size):
+    """
+    领取一批任务，调用一次模型后端并写回结果
+    :return: 本批处理的任务数（0 表示当前没有可执行的任务）
+    """
+    claim_token, job_ids = claim_jobs(batch_size)
+    if not job_ids:
+        return 0
+
+    # 一次联表查询取出生成评语所需的全部数据
+    rows = db.session.query(
+        AIFeedbackJob.id, HomeworkSubmission, Homework, HomeworkGrading
+    ).join(
+        HomeworkSubmission,
+        HomeworkSubmission.id == AIFeedbackJob.submission_id
+    ).join(
+        Homework,
+        Homework.id == HomeworkSubmission.homework_id
+    ).outerjoin(
+        HomeworkGrading,
+        HomeworkGrading.submission_id == HomeworkSubmission.id
+    ).filter(
+        AIFeedbackJob.id.in_(job_ids)
+    ).all()
+
+    items = [{
+        "submission_id": submission.id,
+        "homework_title": homework.title,
+        "homework_content": homework.content,
+        "text_content": submission.text_content,
+        "image_count": len(json.loads(submission.image_urls)) if submission.image_urls else 0,
+        "score": grading.score if grading else None,
+        "annotation_data": grading.annotation_data if grading else None
+    } for _, submission, homework, grading in rows]
+
+    try:
+        feedbacks = backend.generate(items)
+        if len(feedbacks) != len(items):
+            raise ValueError(f"模型后端返回 {len(feedbacks)} 条结果，期望 {len(items)} 条")
+    except Exception as e:
+        current_app.logger.warning(f"AI评语生成失败（{len(items)} 个任务）：{e}")
+        db.session.rollback()
+        _fail_jobs(job_ids, claim_token, str(e))
+        return len(job_ids)
+
+    for (job_id, _, _, grading), feedback in zip(rows, feedbacks):
+        # 仅当任务仍是本次领取的状态时写回，避免覆盖重新批改后排队的新任务
+        finished = _finish_job(job_id, claim_token, {
+            AIFeedbackJob.status: AIFeedbackJobStatus.done,
+            AIFeedbackJob.last_error: None,
+            AIFeedbackJob.locked_at: None
+        })
+        if finished and grading is not None:
+            grading.ai_feedback = feedback
+    db.session.commit()
+    return len(job_ids)
+
+
+def _finish_job(job_id, claim_token, values):
+    return AIFeedbackJob.query.filter(
+        AIFeedbackJob.id == job_id,
+        AIFeedbackJob.status == AIFeedbackJobStatus.running,
+        AIFeedbackJob.claim_token == claim_token
+    ).update(values, synchronize_session=False) == 1
+
+
+def _fail_jobs(job_ids, claim_token, error):
+    """失败的任务按指数退避重新排队，达到最大次数后标记为 failed"""
+    config = current_app.config
+    now = datetime.utcnow()
+    for job in AIFeedbackJob.query.filter(AIFeedbackJob.id.in_(job_ids)):
+        if job.attempts >= config['AI_FEEDBACK_MAX_ATTEMPTS']:
+            values = {AIFeedbackJob.status: AIFeedbackJobStatus.failed}
+        else:
+            delay = config['AI_FEEDBACK_RETRY_BACKOFF'] * 2 ** (job.attempts - 1)
+            values = {
+                AIFeedbackJob.status: AIFeedbackJobStatus.pending,
+                AIFeedbackJob.run_after: now + timedelta(seconds=delay)
+            }
+        values[AIFeedbackJob.last_error] = error[:2000]
+        values[AIFeedbackJob.locked_at] = None
+        _finish_job(job.id, claim_token, values)
+    db.session.commit()
+
+
+class AIFeedbackWorkerPool:
+    """本地 worker 线程池；每个线程同一时刻只发起一次模型调用，线程数即并发上限"""
+
+    def __init__(self, app, workers):
+        self.app = app
+        self.workers = workers
+        self.backend = load_backend(
+            app.config['AI_FEEDBACK_BACKEND'], app.config)
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self.backend is None:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, name=f"ai-feedback-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def wait(self):
+        """阻塞当前线程直到 Ctrl+C，然后停止所有 worker"""
+        try:
+            while not self._stop.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        self.stop()
+
+    def _run(self):
+        batch_size = self.app.config['AI_FEEDBACK_BATCH_SIZE']
+        poll_interval = self.app.config['AI_FEEDBACK_POLL_INTERVAL']
+        while not self._stop.is_set():
+            # 每批使用新的应用上下文，结束时归还数据库连接
+            with self.app.app_context():
+                try:
+                    processed = process_batch(self.backend, batch_size)
+                except Exception:
+                    current_app.logger.exception("AI评语任务处理失败")
+                    db.session.rollback()
+                    processed = 0
+            if not processed:
+                self._stop.wait(poll_interval)
+
+
+def init_ai_feedback(app):
+    """注册 flask ai-feedback 命令，并按配置在应用进程内启动 worker"""
+    @app.cli.group('ai-feedback')
+    def ai_feedback_cli():
+        """AI评语生成任务"""
+
+    @ai_feedback_cli.command('worker')
+    @click.option('--workers', type=int, default=None,
+                  help='并发的 worker 线程数（默认 AI_FEEDBACK_WORKERS）')
+    def run_worker(workers):
+        """在当前进程中运行 worker，直到 Ctrl+C"""
+        pool = AIFeedbackWorkerPool(
+            app, workers or app.config['AI_FEEDBACK_WORKERS'])
+        if pool.backend is None:
+            raise click.ClickException("AI_FEEDBACK_BACKEND 为 none，未启用AI评语")
+        pool.start()
+        click.echo(f"AI评语 worker 已启动（{pool.workers} 个线程）")
+        pool.wait()
+
+    workers = app.config['AI_FEEDBACK_IN_PROCESS_WORKERS']
+    if workers <= 0:
+        return
+    lock = threading.Lock()
+    pools = []
+
+    # 在第一个请求时才启动，避免 flask db upgrade 等命令也拉起 worker
+    @app.before_request
+    def start_in_process_workers():
+        if pools:
+            return
+        with lock:
+            if not pools:
+                pool = AIFeedbackWorkerPool(app, workers)
+                pool.start()
+                pools.append(pool)
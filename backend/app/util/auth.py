@@ -1,10 +1,225 @@
-from app.models import StaffCourseRelation
+"""
+身份与课程成员权限校验：
+- role_required 装饰路由：验证令牌、解析身份（每个请求解析一次，缓存在 g.principal）、校验角色，
+  指定 course_arg 时再校验课程成员关系，当前用户ID以 "<角色>_id" 关键字参数传给视图
+- 同一请求内对同一课程的成员校验只执行一次（结果缓存在 g 上，成员关系变化时清除）
+- 登录时把用户所属课程与成员版本号写入令牌（membership_claims），令牌由 JWT 密钥签名，客户端无法篡改
+- 校验时先看当前请求的令牌：声明中包含该课程且版本号与用户当前版本一致，直接放行，不查询关联表
+- 令牌未声明该课程（如登录后新选的课）时回退到数据库查询；成员关系变化时递增版本号，旧令牌的声明随之失效
+- 当前版本号每个请求从主库按主键读取一次（不做进程内缓存），任一 worker 递增版本号后所有 worker 立即生效；
+  用户被删除时读不到版本号，令牌声明同样失效
+"""
+import functools
+from collections import namedtuple
+from flask import g, has_request_context, jsonify
+from flask_jwt_extended import (
+    create_access_token,
+    get_jwt,
+    get_jwt_identity,
+    jwt_required
+)
+from app.extensions import db
+from app.models import Staff, StaffCourseRelation, Student, StudentCourseRelation
+from app.config import MEMBERSHIP_CACHE_SIZE, MEMBERSHIP_CACHE_TTL
+from app.util.cache import TTLCache
+from app.util.db_routing import read_from_primary
+
+Principal = namedtuple("Principal", ["role", "id"])
+
+COURSES_CLAIM = "courses"
+MEMBERSHIP_VERSION_CLAIM = "mv"
+
+# 角色 -> (用户模型, 关联表, 关联表中的用户ID列)
+_MEMBERSHIP_MODELS = {
+    "student": (Student, StudentCourseRelation, StudentCourseRelation.student_id),
+    "teacher": (Staff, StaffCourseRelation, StaffCourseRelation.staff_id),
+}
+
+# (staff_id, course_id) -> True，只缓存"是成员"：刚加入课程的教师不会被缓存的否定结果挡住
+_membership_cache = TTLCache(
+    maxsize=MEMBERSHIP_CACHE_SIZE, ttl=MEMBERSHIP_CACHE_TTL)
+
+
+def current_principal():
+    """当前请求的身份（"role:id" 只解析一次并缓存在 g 上）；未携带令牌或格式无效时返回 None"""
+    if "principal" not in g:
+        g.principal = parse_principal(get_jwt_identity())
+    return g.principal
+
+
+def parse_principal(identity_str):
+    """解析 "role:id"；格式无效时返回 None"""
+    try:
+        role, id_str = identity_str.split(':', 1)
+        return Principal(role, int(id_str))
+    except (AttributeError, ValueError):
+        return None
+
+
+def role_required(*roles, course_arg=None, **jwt_options):
+    """
+    路由装饰器：验证令牌、校验角色，按需校验课程成员关系，通过后以 "<角色>_id" 关键字参数调用视图
+    :param roles: 允许访问的角色（student / teacher / admin）
+    :param course_arg: URL 中课程ID参数名（路由应使用 <int:...> 转换器），指定时校验当前用户属于该课程
+    :param jwt_options: 透传给 jwt_required（如 refresh、locations）
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        @jwt_required(**jwt_options)
+        def wrapper(*args, **kwargs):
+            principal = current_principal()
+            if principal is None:
+                return jsonify({"error": "无效的身份信息"}), 401
+            if principal.role not in roles:
+                return jsonify({"error": f"仅{'/'.join(roles)}可访问"}), 403
+            if course_arg is not None and not is_course_member(
+                    principal, kwargs[course_arg]):
+                return jsonify({"error": "无此课程权限"}), 403
+            kwargs[f"{principal.role}_id"] = principal.id
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def is_course_member(principal, course_id):
+    """按角色校验课程成员关系（学生：已选课；教师：任课）"""
+    if principal.role == "student":
+        return is_student_in_course(principal.id, course_id)
+    if principal.role == "teacher":
+        return is_staff_in_course(principal.id, course_id)
+    return False
+
+
+def _memoize_in_request(key, compute):
+    """同一请求内相同的成员校验只计算一次"""
+    if not has_request_context():
+        return compute()
+    memo = g.setdefault("_course_membership", {})
+    if key not in memo:
+        memo[key] = compute()
+    return memo[key]
+
+
+def _clear_request_memo():
+    if has_request_context():
+        g.pop("_course_membership", None)
+
+
+def membership_claims(role, user_id):
+    """登录时写入令牌的附加声明：所属课程ID列表与成员版本号"""
+    model, relation, user_column = _MEMBERSHIP_MODELS[role]
+    version = db.session.query(model.membership_version).filter(
+        model.id == user_id).scalar()
+    course_ids = [row.course_id for row in db.session.query(
+        relation.course_id
+    ).filter(user_column == user_id)]
+    return {COURSES_CLAIM: course_ids, MEMBERSHIP_VERSION_CLAIM: version}
+
+
+def create_member_access_token(role, user_id):
+    """签发带课程成员声明的访问令牌（学生/教师登录，以及成员关系变化后换发）"""
+    return create_access_token(
+        identity=f"{role}:{user_id}",
+        additional_claims=membership_claims(role, user_id)
+    )
+
+
+def _get_membership_version(role, user_id):
+    """用户当前的成员版本号（用户不存在时为 -1）；从主库读取，只读副本可能尚未同步最新的递增"""
+    def load():
+        model = _MEMBERSHIP_MODELS[role][0]
+        with read_from_primary():
+            version = db.session.query(model.membership_version).filter(
+                model.id == user_id).scalar()
+        return -1 if version is None else version
+    return _memoize_in_request(("version", role, user_id), load)
+
+
+def token_grants_course(role, user_id, course_id):
+    """当前请求的令牌是否声明了该用户属于该课程，且声明未因成员关系变化而过期"""
+    if not has_request_context():
+        return False
+    try:
+        claims = get_jwt()
+    except RuntimeError:  # 当前请求未经过 jwt_required
+        return False
+    if current_principal() != (role, user_id):
+        return False
+    if course_id not in claims.get(COURSES_CLAIM, ()):
+        return False
+    return claims.get(MEMBERSHIP_VERSION_CLAIM) == _get_membership_version(role, user_id)
+
+
+def bump_membership_version(role, user_ids):
+    """成员关系变化时递增版本号（加入当前事务，由调用方 commit），已签发令牌中的课程声明随之失效"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    model = _MEMBERSHIP_MODELS[role][0]
+    model.query.filter(model.id.in_(user_ids)).update(
+        {model.membership_version: model.membership_version + 1},
+        synchronize_session=False
+    )
+    _clear_request_memo()
 
 
 def is_staff_in_course(staff_id, course_id):
-    """验证教师是否属于该课程"""
+    """验证教师是否属于该课程（先看令牌声明，再查带TTL缓存的数据库结果）"""
+    try:
+        key = (int(staff_id), int(course_id))
+    except (ValueError, TypeError):
+        return False
+    return _memoize_in_request(("teacher",) + key, lambda: _check_staff(key))
+
+
+def _check_staff(key):
+    if token_grants_course("teacher", *key):
+        return True
+
+    if _membership_cache.get(key):
+        return True
+
     relation = StaffCourseRelation.query.filter_by(
-        staff_id=staff_id,
-        course_id=course_id
+        staff_id=key[0],
+        course_id=key[1]
     ).first()
-    return bool(relation)
+    if relation is None:
+        return False
+    _membership_cache.set(key, True)
+    return True
+
+
+def is_student_in_course(student_id, course_id):
+    """验证学生是否选修了该课程（先看令牌声明，再查询 StudentCourseRelation）"""
+    try:
+        student_id, course_id = int(student_id), int(course_id)
+    except (ValueError, TypeError):
+        return False
+    return _memoize_in_request(
+        ("student", student_id, course_id),
+        lambda: _check_student(student_id, course_id))
+
+
+def _check_student(student_id, course_id):
+    if token_grants_course("student", student_id, course_id):
+        return True
+
+    return StudentCourseRelation.query.filter_by(
+        student_id=student_id,
+        course_id=course_id
+    ).first() is not None
+
+
+def init_auth(app):
+    """创建应用时清空进程内的成员缓存，避免同一进程中先后创建的应用（如测试）共用旧的条目"""
+    _membership_cache.clear()
+
+
+def invalidate_staff_membership(staff_id, course_id=None):
+    """教职工-课程关联变化后清除缓存；不指定 course_id 时清除该教职工的全部条目"""
+    staff_id = int(staff_id)
+    _clear_request_memo()
+    if course_id is None:
+        _membership_cache.delete_where(lambda key: key[0] == staff_id)
+    else:
+        _membership_cache.delete((staff_id, int(course_id)))
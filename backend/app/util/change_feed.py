@@ -0,0 +1,284 @@
+"""
+变更推送（Server-Sent Events），替代前端轮询作业/提交列表：
+- 订阅 app.util.events 中的领域事件，按主题投递给在线的 SSE 连接
+  - course:{id}：作业发布/修改/删除，推送给选课学生
+  - course:{id}:staff：学生提交作业，推送给课程教师
+  - student:{id}：作业被批改，推送给提交的学生
+- 后端可选：local（进程内，单进程部署）或兼容 Redis 协议的 pub/sub（多 worker 部署时事件可跨进程送达）；
+  默认仅在配置了 CHANGE_FEED_REDIS_URL 时开启（redis），多 worker 下使用 local 会在启动时记录警告
+- 鉴权：EventSource 无法设置请求头，客户端先用访问令牌换取流令牌（短期、只能使用一次，出现在访问日志中也无法重放），
+  再以 ?token= 建立连接；连接期间每次心跳和推送前重新检查对应登录是否已吊销、访问令牌是否已过期，是则关闭连接
+- 推送只是"有变化"的通知，客户端收到后再请求对应的列表接口（配合 ETag 通常只需一次 304）；
+  断线重连期间的事件不补发，重连后客户端应主动刷新一次
+- 每个连接在整个生命周期内占用一个 worker 线程/协程，部署时需使用 gevent 等异步 worker
+"""
+import json
+import queue
+import threading
+import time
+import uuid
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from app.util import events
+from app.util.auth import parse_principal
+from app.util.token_denylist import SESSION_CLAIM, token_denylist
+
+
+class _LocalSubscription:
+    def __init__(self, backend, topics, maxsize):
+        self._backend = backend
+        self.topics = topics
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._backend.unsubscribe(self)
+
+
+class LocalFeedBackend:
+    """进程内发布订阅，只能送达同一进程中的连接"""
+
+    def __init__(self, queue_size):
+        self._queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = {}  # topic -> {subscription}
+
+    def subscribe(self, topics):
+        subscription = _LocalSubscription(self, topics, self._queue_size)
+        with self._lock:
+            for topic in topics:
+                self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def publish(self, topic, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                pass  # 客户端消费过慢时丢弃，重连后会重新拉取列表
+
+
+class _RedisSubscription:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    def get(self, timeout):
+        message = self._pubsub.get_message(
+            ignore_subscribe_messages=True, timeout=timeout)
+        return None if message is None else json.loads(message["data"])
+
+    def close(self):
+        self._pubsub.close()
+
+
+class RedisFeedBackend:
+    """
+    兼容 Redis 协议的 pub/sub 后端，client 需提供 publish / pubsub
+    （redis.Redis 及其兼容实现）
+    """
+
+    def __init__(self, client, prefix="taskly:feed:"):
+        self._client = client
+        self._prefix = prefix
+
+    def subscribe(self, topics):
+        pubsub = self._client.pubsub()
+        if topics:
+            pubsub.subscribe(*[self._prefix + topic for topic in topics])
+        return _RedisSubscription(pubsub)
+
+    def publish(self, topic, message):
+        self._client.publish(self._prefix + topic,
+                             json.dumps(message, ensure_ascii=False))
+
+
+class ChangeFeed:
+    def __init__(self):
+        self.backend = None
+        self.heartbeat = 15
+
+    def init_app(self, app):
+        self.heartbeat = app.config['CHANGE_FEED_HEARTBEAT']
+        backend = app.config['CHANGE_FEED_BACKEND']
+        if backend == 'local' and app.config['WEB_WORKERS'] > 1:
+            app.logger.warning(
+                f"CHANGE_FEED_BACKEND=local 且 WEB_WORKERS={app.config['WEB_WORKERS']}："
+                f"事件只能送达同一 worker 上的连接，多 worker 部署请使用 redis")
+        if backend == 'redis':
+            import redis  # 仅在启用 Redis 后端时需要安装
+            self.backend = RedisFeedBackend(
+                redis.Redis.from_url(app.config['CHANGE_FEED_REDIS_URL']))
+        elif backend == 'local':
+            self.backend = LocalFeedBackend(
+                queue_size=app.config['CHANGE_FEED_QUEUE_SIZE'])
+        else:
+            self.backend = None  # none：关闭推送
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def publish(self, topic, event, data):
+        if self.backend is not None:
+            self.backend.publish(topic, {"event": event, "data": data})
+
+    def create_stream_token(self, jwt_payload):
+        """用本次请求的访问令牌换取流令牌，其中保存访问令牌的身份、jti、签发/过期时间与会话标识"""
+        claims = {key: jwt_payload.get(key) for key in _stream_claims()}
+        claims["nonce"] = uuid.uuid4().hex
+        return _stream_serializer().dumps(claims)
+
+    def load_stream_token(self, token, role):
+        """
+        校验流令牌：签名有效、未超过 CHANGE_FEED_TOKEN_EXPIRES、未使用过、角色一致，且访问令牌未过期或被吊销
+        :return: (用户ID, 访问令牌声明)；无效时返回 (None, None)
+        """
+        max_age = current_app.config['CHANGE_FEED_TOKEN_EXPIRES']
+        try:
+            claims = _stream_serializer().loads(token or '', max_age=max_age)
+        except BadSignature:  # 包括已过期
+            return None, None
+        if not token_denylist.use_once(f"stream:{claims.pop('nonce')}", max_age + 1):
+            return None, None
+        principal = parse_principal(claims.get(current_app.config['JWT_IDENTITY_CLAIM']))
+        if principal is None or principal.role != role or not _token_valid(claims):
+            return None, None
+        return principal.id, claims
+
+    def stream(self, topics, app=None, claims=None):
+        """
+        SSE 响应体生成器（不依赖应用上下文，吊销检查时临时推入 app 的上下文）
+        claims 为建立连接的访问令牌声明，令牌过期或被吊销时发送 unauthorized 事件并结束
+        客户端断开时生成器被关闭，在 finally 中退订
+        """
+        def authorized():
+            if claims is None:
+                return True
+            with app.app_context():
+                return _token_valid(claims)
+
+        subscription = self.backend.subscribe(topics)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                message = subscription.get(timeout=self.heartbeat)
+                if not authorized():
+                    yield "event: unauthorized\ndata: {}\n\n"
+                    return
+                if message is None:
+                    # 心跳，防止代理因空闲断开连接，同时及时发现已断开的客户端
+                    yield ": keepalive\n\n"
+                    continue
+                data = json.dumps(message["data"], ensure_ascii=False)
+                yield f"event: {message['event']}\ndata: {data}\n\n"
+        finally:
+            subscription.close()
+
+    def response(self, topics, claims=None):
+        """
+        SSE 响应；生成器不使用 stream_with_context，应用上下文（及其数据库连接）
+        在响应开始发送时即被释放，长连接不会占用连接池
+        """
+        app = current_app._get_current_object()
+        response = current_app.response_class(
+            self.stream(topics, app, claims), mimetype="text/event-stream")
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'  # 关闭 nginx 的响应缓冲
+        return response
+
+
+def _stream_claims():
+    return (current_app.config['JWT_IDENTITY_CLAIM'], "jti", "iat", "exp", SESSION_CLAIM)
+
+
+def _stream_serializer():
+    # 独立的 salt：流令牌不能当作访问令牌或签名URL使用，反之亦然
+    return URLSafeTimedSerializer(
+        current_app.config['JWT_SECRET_KEY'], salt="change-feed-stream")
+
+
+def _token_valid(claims):
+    return claims["exp"] > time.time() and not token_denylist.is_revoked(claims)
+
+
+change_feed = ChangeFeed()
+
+
+# 主题
+
+
+def course_topic(course_id):
+    """选修该课程的学生"""
+    return f"course:{course_id}"
+
+
+def course_staff_topic(course_id):
+    """该课程的教师"""
+    return f"course:{course_id}:staff"
+
+
+def student_topic(student_id):
+    """学生本人"""
+    return f"student:{student_id}"
+
+
+# 领域事件 -> 推送
+
+
+def _make_homework_receiver(event):
+    def receiver(sender, course_id, homework_id, **payload):
+        change_feed.publish(course_topic(course_id), event, {
+            "course_id": course_id,
+            "homework_id": homework_id
+        })
+    return receiver
+
+
+def _push_submission_received(sender, course_id, homework_id, submission_id,
+                              student_id, resubmitted, **payload):
+    change_feed.publish(course_staff_topic(course_id), "submission_received", {
+        "course_id": course_id,
+        "homework_id": homework_id,
+        "submission_id": submission_id,
+        "student_id": student_id,
+        "resubmitted": resubmitted
+    })
+
+
+def _push_submission_graded(sender, course_id, homework_id, submission_id,
+                            student_id, score, **payload):
+    change_feed.publish(student_topic(student_id), "submission_graded", {
+        "course_id": course_id,
+        "homework_id": homework_id,
+        "submission_id": submission_id,
+        "score": score
+    })
+
+
+_push_homework_created = _make_homework_receiver("homework_created")
+_push_homework_updated = _make_homework_receiver("homework_updated")
+_push_homework_deleted = _make_homework_receiver("homework_deleted")
+
+# blinker 默认弱引用，接收函数需在模块级保持引用
+events.homework_created.connect(_push_homework_created)
+events.homework_updated.connect(_push_homework_updated)
+events.homework_deleted.connect(_push_homework_deleted)
+events.submission_created.connect(_push_submission_received)
+events.grade_recorded.connect(_push_submission_graded)
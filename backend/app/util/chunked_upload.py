@@ -0,0 +1,165 @@
+"""
+可断点续传的分片上传：
+1. 创建上传会话，记录作业、学生、文件名和总大小
+2. 按 offset 逐片 PUT，分片直接追加写入磁盘；断线后先查询已写入的 offset 再续传
+3. 完成上传，把拼好的文件交给 blob 存储，并链接到 get_upload_dir 规定的目录
+
+会话保存在 UPLOAD_FOLDER/tmp/{upload_id}/ 下（meta.json + data.part），多个 worker 进程共享
+"""
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from flask import current_app
+from app.util.file_upload import (
+    allowed_file,
+    get_upload_dir,
+    link_blob,
+    store_blob_from_path
+)
+
+_UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+SESSION_GONE = "上传会话不存在或已过期"
+
+
+def _session_dir(upload_id):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], "tmp", upload_id)
+
+
+def _data_path(upload_id):
+    return os.path.join(_session_dir(upload_id), "data.part")
+
+
+def create_upload_session(student_id, homework, filename, size):
+    """
+    创建上传会话
+    :return: (success, upload_id/error_msg)
+    """
+    if not filename or not allowed_file(filename):
+        return False, "不支持的文件类型"
+    if not isinstance(size, int) or size <= 0:
+        return False, "文件大小必须是正整数"
+    if size > current_app.config['CHUNKED_UPLOAD_MAX_SIZE']:
+        return False, "文件过大"
+
+    cleanup_expired_sessions()
+
+    upload_id = uuid.uuid4().hex
+    session_dir = _session_dir(upload_id)
+    os.makedirs(session_dir)
+    meta = {
+        "student_id": student_id,
+        "homework_id": homework.id,
+        "course_id": homework.course_id,
+        "course_hw_no": homework.course_hw_no,
+        "file_ext": filename.rsplit('.', 1)[1].lower(),
+        "size": size,
+        "create_time": time.time()
+    }
+    with open(os.path.join(session_dir, "meta.json"), 'w') as f:
+        json.dump(meta, f)
+    open(_data_path(upload_id), 'wb').close()
+    return True, upload_id
+
+
+def load_upload_session(upload_id, student_id):
+    """读取会话信息（仅会话创建者可访问），不存在时返回 None"""
+    if not _UPLOAD_ID_PATTERN.match(upload_id or ''):
+        return None
+    try:
+        with open(os.path.join(_session_dir(upload_id), "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta["student_id"] != student_id:
+        return None
+    return meta
+
+
+def get_upload_offset(upload_id):
+    """已写入的字节数，即下一片应从哪里开始；会话已完成或已过期被删除时返回 None"""
+    try:
+        return os.path.getsize(_data_path(upload_id))
+    except FileNotFoundError:
+        return None
+
+
+def append_upload_chunk(upload_id, meta, offset, stream, chunk_size=64 * 1024):
+    """
+    把请求体按块追加写入磁盘，不在内存中缓存整片
+    :return: (success, new_offset/error_msg)
+    """
+    current_offset = get_upload_offset(upload_id)
+    if current_offset is None:
+        return False, SESSION_GONE
+    if offset != current_offset:
+        return False, f"offset不匹配，当前已上传 {current_offset} 字节"
+
+    written = current_offset
+    try:
+        # 'r+b' 不会在会话目录被删除后重新创建文件
+        with open(_data_path(upload_id), 'r+b') as f:
+            f.seek(current_offset)
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                written += len(chunk)
+                if written > meta["size"]:
+                    # 回滚本片已写入的部分，保持 offset 与上一片一致
+                    f.truncate(current_offset)
+                    return False, "上传内容超过声明的文件大小"
+                f.write(chunk)
+    except FileNotFoundError:
+        return False, SESSION_GONE
+    return True, written
+
+
+def finalize_upload_session(upload_id, meta):
+    """
+    完成上传：校验大小后存入blob，并链接到作业提交目录
+    :return: (success, relative_path/error_msg)
+    """
+    data_path = _data_path(upload_id)
+    offset = get_upload_offset(upload_id)
+    if offset is None:
+        return False, SESSION_GONE
+    if offset != meta["size"]:
+        return False, "文件尚未上传完整"
+
+    storage_dir = get_upload_dir(
+        course_id=meta["course_id"],
+        course_hw_no=meta["course_hw_no"],
+        resource_type="submit",
+        student_id=meta["student_id"]
+    )
+    os.makedirs(storage_dir, exist_ok=True)
+    try:
+        blob_path, digest = store_blob_from_path(data_path, meta["file_ext"])
+    except FileNotFoundError:
+        # 并发的另一次完成请求已经取走了文件
+        return False, SESSION_GONE
+    filepath = os.path.join(storage_dir, f"{digest}.{meta['file_ext']}")
+    link_blob(blob_path, filepath)
+    discard_upload_session(upload_id)
+
+    return True, os.path.relpath(filepath, current_app.config['UPLOAD_FOLDER'])
+
+
+def discard_upload_session(upload_id):
+    shutil.rmtree(_session_dir(upload_id), ignore_errors=True)
+
+
+def cleanup_expired_sessions():
+    """删除超过 CHUNKED_UPLOAD_EXPIRES 秒仍未完成的会话"""
+    tmp_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], "tmp")
+    if not os.path.isdir(tmp_dir):
+        return
+    deadline = time.time() - current_app.config['CHUNKED_UPLOAD_EXPIRES']
+    for upload_id in os.listdir(tmp_dir):
+        session_dir = os.path.join(tmp_dir, upload_id)
+        try:
+            # 以最后一次写入分片的时间为准
+            if os.path.getmtime(os.path.join(session_dir, "data.part")) < deadline:
+                shutil.rmtree(session_dir, ignore_errors=True)
+        except OSError:
+            continue
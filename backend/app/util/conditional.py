@@ -0,0 +1,38 @@
+"""
+HTTP 条件请求（ETag / If-None-Match / 304）：
+列表接口先用一条聚合查询得到数据版本（行数 + 最大修改时间），与请求参数一起生成强 ETag；
+客户端带回的 If-None-Match 与之相同时直接返回 304，不再查询和序列化整个列表
+"""
+import hashlib
+from flask import current_app
+
+
+def make_etag(*parts):
+    """
+    由数据版本和请求参数生成强 ETag
+    响应体中含签名图片URL时，调用方需把 signing_window() 一并传入，
+    窗口切换后 ETag 随之变化，客户端不会凭 304 继续使用已过期的链接
+    """
+    raw = "|".join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def not_modified(etag):
+    """304 响应（无响应体）"""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def with_etag(response, etag):
+    """
+    给 (response, status) 形式的返回值加上 ETag
+    no-cache：浏览器可以缓存，但每次使用前都要带 If-None-Match 回源校验
+    """
+    response, status = response
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response, status
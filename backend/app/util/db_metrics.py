@@ -0,0 +1,50 @@
+import threading
+from sqlalchemy import event
+
+_lock = threading.Lock()
+_counters = {
+    "connects": 0,         # 新建的物理连接数
+    "checkouts": 0,        # 从连接池借出的次数
+    "invalidations": 0,    # 被判定失效（如 pre_ping 发现连接已断开）的连接数
+    "max_checked_out": 0,  # 同时借出连接数的峰值
+}
+
+
+def _incr(name):
+    with _lock:
+        _counters[name] += 1
+
+
+def init_pool_metrics(engine):
+    """在 engine 的连接池上注册事件，统计连接的借出/新建/失效情况"""
+    pool = engine.pool
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        _incr("connects")
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        _incr("checkouts")
+        checked_out = getattr(pool, "checkedout", lambda: 0)()
+        with _lock:
+            _counters["max_checked_out"] = max(
+                _counters["max_checked_out"], checked_out)
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        _incr("invalidations")
+
+
+def get_pool_metrics(engine):
+    """当前连接池状态 + 累计计数"""
+    pool = engine.pool
+    metrics = {"pool_class": type(pool).__name__}
+    # QueuePool 才有这些方法，其他连接池（如测试用的 SQLite）跳过
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            metrics[name] = method()
+    with _lock:
+        metrics.update(_counters)
+    return metrics
@@ -0,0 +1,131 @@
+"""
+读写分离路由：
+- 用 @use_read_replica 标记的只读服务函数，在配置了 SQLALCHEMY_BINDS['replica'] 时走只读副本
+- 写操作（flush / INSERT / UPDATE / DELETE）始终走主库
+- 读己之写：本次请求已写过主库，或同一用户在 REPLICA_READ_AFTER_WRITE_WINDOW 秒内写过，则读也走主库，
+  避免读到尚未同步的旧数据。"写过"按两种方式记录，任一命中即走主库：
+  - 按登录身份（role_required 解析出的用户）记在令牌吊销的共享存储中，多 worker、多设备、
+    不保存 cookie 的客户端都生效
+  - 响应 cookie：覆盖未登录的写请求（如注册）；只对同一浏览器生效
+"""
+import contextlib
+import functools
+import time
+import sqlalchemy as sa
+from flask import current_app, g, has_app_context, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND_KEY = 'replica'
+READ_PRIMARY_COOKIE = 'read_primary_until'
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing \
+                and not isinstance(clause, sa.sql.dml.UpdateBase) \
+                and _should_read_replica():
+            engine = self._db.engines.get(REPLICA_BIND_KEY)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _should_read_replica():
+    if not has_app_context() or not g.get('_db_use_replica'):
+        return False
+    if g.get('_db_wrote'):
+        return False
+    if has_request_context():
+        try:
+            read_primary_until = float(
+                request.cookies.get(READ_PRIMARY_COOKIE, 0))
+        except ValueError:
+            read_primary_until = 0
+        if read_primary_until > time.time():
+            return False
+        if _principal_read_primary_until() > time.time():
+            return False
+    return True
+
+
+def _principal_key():
+    """当前请求的登录身份对应的标记 key；未经 role_required 解析身份时返回 None"""
+    principal = g.get('principal')
+    return f"read-primary:{principal.role}:{principal.id}" if principal else None
+
+
+def _principal_read_primary_until():
+    """当前用户的读主库截止时间（每个请求只查一次共享存储）"""
+    key = _principal_key()
+    if key is None:
+        return 0
+    if '_db_read_primary_until' not in g:
+        # app.extensions 导入本模块，token_denylist 又依赖 app.extensions，只能在使用时导入
+        from app.util.token_denylist import token_denylist
+        g._db_read_primary_until = token_denylist.marked_until(key)
+    return g._db_read_primary_until
+
+
+def use_read_replica(func):
+    """标记只读服务函数：函数内的查询在条件允许时走只读副本"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not has_app_context():
+            return func(*args, **kwargs)
+        previous = g.get('_db_use_replica', False)
+        g._db_use_replica = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            g._db_use_replica = previous
+    return wrapper
+
+
+@contextlib.contextmanager
+def read_from_primary():
+    """在 @use_read_replica 函数内临时让查询走主库（如必须读到最新值的版本号）"""
+    if not has_app_context():
+        yield
+        return
+    previous = g.get('_db_use_replica', False)
+    g._db_use_replica = False
+    try:
+        yield
+    finally:
+        g._db_use_replica = previous
+
+
+@sa.event.listens_for(RoutingSession, 'after_flush')
+def _mark_flush_write(session, flush_context):
+    if has_app_context():
+        g._db_wrote = True
+
+
+@sa.event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_bulk_write(orm_execute_state):
+    # query.update() / query.delete() 之类的批量语句不经过 flush
+    if has_app_context() and (orm_execute_state.is_update or orm_execute_state.is_delete
+                              or orm_execute_state.is_insert):
+        g._db_wrote = True
+
+
+def init_db_routing(app):
+    """注册读己之写标记（按登录身份记入共享存储，同时设置 cookie）"""
+    from app.util.token_denylist import token_denylist
+
+    @app.after_request
+    def mark_read_primary(response):
+        if g.get('_db_wrote') and REPLICA_BIND_KEY in app.config.get('SQLALCHEMY_BINDS', {}):
+            window = current_app.config['REPLICA_READ_AFTER_WRITE_WINDOW']
+            until = time.time() + window
+            key = _principal_key()
+            if key is not None:
+                token_denylist.mark(key, until)
+            response.set_cookie(
+                READ_PRIMARY_COOKIE,
+                str(until),
+                max_age=window,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
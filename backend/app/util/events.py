@@ -0,0 +1,48 @@
+"""
+领域事件（基于 Flask 自带依赖 blinker 的信号）：
+服务层在事务提交成功后调用 publish()，缓存、计数、推送等模块通过 signal.connect() 订阅
+没有订阅者时 publish() 直接返回，不构造事件数据，也不产生任何额外开销
+
+订阅示例：
+    from app.util.events import grade_recorded
+
+    @grade_recorded.connect
+    def on_grade_recorded(sender, **payload):
+        ...
+"""
+from blinker import Namespace
+from flask import current_app
+
+_signals = Namespace()
+
+# 作业发布/修改/删除：course_id, homework_id
+homework_created = _signals.signal('homework-created')
+homework_updated = _signals.signal('homework-updated')
+homework_deleted = _signals.signal('homework-deleted')
+# 课程创建：course_id, teacher_id；课程信息或审核状态修改：course_id
+course_created = _signals.signal('course-created')
+course_updated = _signals.signal('course-updated')
+# 学生提交（含重新提交）：course_id, homework_id, submission_id, student_id, resubmitted
+submission_created = _signals.signal('submission-created')
+# 批改完成：course_id, homework_id, submission_id, student_id, grader_id, score
+grade_recorded = _signals.signal('grade-recorded')
+
+
+def publish(signal, **payload):
+    """
+    发布事件；事件数据求值失败或订阅者抛出的异常只记录日志，不影响已提交的业务操作
+    payload 中需要额外查询才能得到的值可以传无参函数，仅在存在订阅者时才求值
+    服务层应在 try/except 之外（事务提交之后）调用，发布结果不改变服务的返回值
+    """
+    if not signal.receivers:
+        return
+    try:
+        payload = {k: v() if callable(v) else v for k, v in payload.items()}
+    except Exception:
+        current_app.logger.exception(f"事件 {signal.name} 的数据求值失败")
+        return
+    for receiver in signal.receivers_for(None):
+        try:
+            receiver(None, **payload)
+        except Exception:
+            current_app.logger.exception(f"事件 {signal.name} 的订阅者处理失败")
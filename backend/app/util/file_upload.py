@@ -1,7 +1,17 @@
+import hashlib
+import mimetypes
 import os
+import shutil
 import uuid
-from flask import current_app, jsonify
-from app.config import ALLOWED_EXTENSIONS
+from concurrent.futures import ThreadPoolExecutor
+from flask import abort, current_app, jsonify, send_from_directory
+from werkzeug.security import safe_join
+from app.config import ALLOWED_EXTENSIONS, UPLOAD_SAVE_WORKERS
+
+# 批量上传写盘的线程池（每个 worker 进程一个，所有请求共用）：同时写盘的线程总数不超过 UPLOAD_SAVE_WORKERS，
+# 也省去每个请求创建、销毁线程的开销；线程在首次提交任务时才创建，gunicorn preload 后 fork 的子进程不受影响
+_save_executor = ThreadPoolExecutor(
+    max_workers=UPLOAD_SAVE_WORKERS, thread_name_prefix="upload-save")
 
 
 def get_upload_dir(
@@ -64,27 +74,183 @@ def save_uploaded_file(
         student_id=student_id
     )
     os.makedirs(storage_dir, exist_ok=True)  # 确保目录存在
-    # 生成唯一文件名（避免冲突）
-    file_ext = file.filename.rsplit('.', 1)[1].lower()
-    filename = f"{uuid.uuid4()}.{file_ext}"
-    filepath = os.path.join(storage_dir, filename)
 
-    # 保存文件
     try:
-        file.save(filepath)
-        # 返回相对路径（用于存储到数据库）
-        relative_path = os.path.relpath(
-            filepath, current_app.config['UPLOAD_FOLDER'])
-        return relative_path, None, None
+        return _save_to_dir(file, storage_dir), None, None
     except Exception as e:
         return None, jsonify({"error": f"文件保存失败: {str(e)}"}), 500
 
 
+def save_uploaded_files(
+    files,
+    course_id,
+    course_hw_no,
+    resource_type: str,  # NOTE: post / submit
+    student_id: int = None  # 仅在resource_type为submit的时候需要
+):
+    """
+    批量保存上传文件：先统一校验，再用进程内共用的有界线程池并发写盘，总耗时取决于最大的文件而非文件总数
+    :return: 与 files 顺序一致的 [(原文件名, 相对路径或None, 错误信息或None), ...]
+    """
+    results = [None] * len(files)
+    pending = []
+    for i, file in enumerate(files):
+        if file.filename == '':
+            results[i] = (file.filename, None, "存在空文件名的文件")
+        elif not allowed_file(file.filename):
+            results[i] = (file.filename, None, f"文件 {file.filename} 上传失败: 不支持的文件类型")
+        else:
+            pending.append(i)
+
+    if not pending:
+        return results
+
+    storage_dir = get_upload_dir(
+        course_id=course_id,
+        course_hw_no=course_hw_no,
+        resource_type=resource_type,
+        student_id=student_id
+    )
+    os.makedirs(storage_dir, exist_ok=True)  # 只需创建一次目录
+
+    app = current_app._get_current_object()
+
+    def save(i):
+        # 线程池中没有应用上下文，需手动推入
+        with app.app_context():
+            file = files[i]
+            try:
+                return file.filename, _save_to_dir(file, storage_dir), None
+            except Exception as e:
+                return file.filename, None, f"文件 {file.filename} 上传失败: {str(e)}"
+
+    for i, result in zip(pending, _save_executor.map(save, pending)):
+        results[i] = result
+    return results
+
+
+def _save_to_dir(file, storage_dir):
+    """保存文件：内容存入按SHA-256寻址的blob，用户目录下只放指向blob的硬链接，返回相对路径"""
+    file_ext = file.filename.rsplit('.', 1)[1].lower()
+    blob_path, digest = store_blob(file, file_ext)
+    filepath = os.path.join(storage_dir, f"{digest}.{file_ext}")
+    link_blob(blob_path, filepath)
+    # 返回相对路径（用于存储到数据库）
+    return os.path.relpath(filepath, current_app.config['UPLOAD_FOLDER'])
+
+
+def get_blob_path(digest, file_ext):
+    """blob存储路径：blobs/{digest前2位}/{digest}.{ext}"""
+    return os.path.join(
+        current_app.config['UPLOAD_FOLDER'],
+        "blobs",
+        digest[:2],
+        f"{digest}.{file_ext}"
+    )
+
+
+def store_blob(file, file_ext, chunk_size=64 * 1024):
+    """
+    按内容哈希保存上传文件，相同内容只落盘一次
+    :return: (blob_path, sha256十六进制摘要)
+    """
+    digest = hash_stream(file.stream, chunk_size)
+    file.stream.seek(0)
+
+    blob_path = get_blob_path(digest, file_ext)
+    if not os.path.exists(blob_path):
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        # 先写临时文件再原子替换，并发上传相同内容时不会互相覆盖出半个文件
+        tmp_path = f"{blob_path}.{uuid.uuid4().hex}.tmp"
+        file.save(tmp_path)
+        os.replace(tmp_path, blob_path)
+    return blob_path, digest
+
+
+def store_blob_from_path(path, file_ext):
+    """
+    将已落盘的文件（如分片上传拼好的临时文件）移入blob存储，内容已存在时直接删除临时文件
+    :return: (blob_path, sha256十六进制摘要)
+    """
+    with open(path, 'rb') as f:
+        digest = hash_stream(f)
+
+    blob_path = get_blob_path(digest, file_ext)
+    if os.path.exists(blob_path):
+        os.remove(path)
+    else:
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(path, blob_path)
+    return blob_path, digest
+
+
+def hash_stream(stream, chunk_size=64 * 1024):
+    """分块计算流的SHA-256，不把整个文件读入内存"""
+    sha256 = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def link_blob(blob_path, filepath):
+    """在用户目录下创建指向blob的引用（硬链接，不支持时退化为复制）"""
+    if os.path.exists(filepath):
+        return  # 同名即同内容，无需重复写入
+    try:
+        os.link(blob_path, filepath)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copyfile(blob_path, filepath)
+
+
+def prune_upload_dir(storage_dir, keep_filenames):
+    """
+    删除目录中不在 keep_filenames 内的引用文件及其缩放图（blob本身不受影响）
+    缩放图命名为 {原文件名去扩展名}.{variant}.jpg，按第一个点之前的部分匹配
+    """
+    keep_stems = {name.split('.', 1)[0] for name in keep_filenames}
+    if not os.path.isdir(storage_dir):
+        return
+    for name in os.listdir(storage_dir):
+        if name.split('.', 1)[0] not in keep_stems:
+            os.remove(os.path.join(storage_dir, name))
+
+
 def get_file_url(relative_path):
     """生成文件访问URL"""
     return f"/uploads/{relative_path}"
 
 
+def send_upload(filename):
+    """
+    发送 UPLOAD_FOLDER 下的文件（调用前需已完成权限校验）
+    - UPLOAD_SERVE_MODE = "x-accel"：返回空响应 + X-Accel-Redirect，由 nginx 的 internal location 直接 sendfile
+    - UPLOAD_SERVE_MODE = "x-sendfile"：由 Flask 的 USE_X_SENDFILE 返回 X-Sendfile 头（Apache/lighttpd）
+    - 其他：Flask worker 自己读取并发送文件（默认）
+    上传文件按内容哈希命名，同一路径内容不变：允许浏览器私有缓存一个签名时间窗口，
+    过期后凭 ETag / Last-Modified 条件请求（send_from_directory 与 nginx 都会处理）
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    if current_app.config.get('UPLOAD_SERVE_MODE') != "x-accel":
+        response = send_from_directory(upload_folder, filename)
+    else:
+        filepath = safe_join(upload_folder, filename)
+        if filepath is None or not os.path.isfile(filepath):
+            abort(404)
+
+        response = current_app.response_class()
+        response.headers['X-Accel-Redirect'] = \
+            current_app.config['UPLOAD_ACCEL_PREFIX'].rstrip('/') + '/' + filename
+        response.headers['Content-Type'] = \
+            mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    # 需要权限校验的资源，只允许浏览器缓存，不允许共享代理缓存
+    response.cache_control.private = True
+    response.cache_control.max_age = current_app.config['UPLOAD_URL_EXPIRES']
+    return response
+
+
 def upload_image(
         file,
         course_id: int,
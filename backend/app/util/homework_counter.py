@@ -0,0 +1,24 @@
+from app.extensions import db
+from app.models import Homework
+
+
+def adjust_homework_counters(homework_id, submissions=0, graded=0, late=0):
+    """
+    在当前事务中原子地增减作业的提交/批改/迟交计数（UPDATE ... SET x = x + n），
+    由调用方统一 commit，保证计数与提交、批改记录同时生效或同时回滚
+    """
+    values = {}
+    if submissions:
+        values[Homework.submission_count] = Homework.submission_count + submissions
+    if graded:
+        values[Homework.graded_count] = Homework.graded_count + graded
+    if late:
+        values[Homework.late_submission_count] = Homework.late_submission_count + late
+    if not values:
+        return
+    # 计数变化不算作业内容修改，保持 update_time 不变（学生端列表的 ETag 依赖它）
+    values[Homework.update_time] = Homework.update_time
+
+    db.session.query(Homework).filter(
+        Homework.id == homework_id
+    ).update(values, synchronize_session=False)
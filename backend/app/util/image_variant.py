@@ -0,0 +1,54 @@
+import os
+import uuid
+from flask import current_app
+from werkzeug.security import safe_join
+from app.config import IMAGE_VARIANTS
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # 未安装 Pillow 时退化为直接返回原图
+    Image = None
+
+
+def get_variant_filename(filename, variant):
+    """原图相对路径 -> 缩略图相对路径（与原图同目录：{name}.{variant}.jpg）"""
+    return f"{filename.rsplit('.', 1)[0]}.{variant}.jpg"
+
+
+def ensure_image_variant(filename, variant):
+    """
+    获取图片的缩放版本，首次请求时生成并缓存到原图旁边
+    :param filename: 原图相对 UPLOAD_FOLDER 的路径
+    :param variant: IMAGE_VARIANTS 中的名称（如 thumb / grading）
+    :return: 缩放图的相对路径；原图不存在或无法生成时返回 None
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    source_path = safe_join(upload_folder, filename)
+    if source_path is None or not os.path.isfile(source_path):
+        return None
+
+    variant_filename = get_variant_filename(filename, variant)
+    variant_path = os.path.join(upload_folder, variant_filename)
+    if os.path.isfile(variant_path):
+        return variant_filename
+
+    if Image is None:
+        return None
+
+    max_size, quality = IMAGE_VARIANTS[variant]
+    # 先写临时文件再原子替换，避免并发请求读到写了一半的文件
+    tmp_path = f"{variant_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with Image.open(source_path) as image:
+            image = ImageOps.exif_transpose(image)  # 按手机拍照的EXIF方向摆正
+            image.thumbnail((max_size, max_size))
+            image.convert("RGB").save(
+                tmp_path, "JPEG", quality=quality, optimize=True)
+        os.replace(tmp_path, variant_path)
+    except Exception as e:
+        current_app.logger.warning(f"生成缩略图失败 {filename} ({variant}): {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+    return variant_filename
@@ -0,0 +1,61 @@
+from flask import jsonify
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+
+def parse_page_args(args):
+    """
+    解析列表接口的分页查询参数（?limit=50&cursor=123）
+
+    参数：
+        args: request.args
+
+    返回：
+        成功：((limit, cursor), None) 元组，cursor 为 None 表示从头开始
+        失败：(None, error_response) 元组
+    """
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_LIMIT))
+        cursor = args.get('cursor')
+        cursor = int(cursor) if cursor not in (None, '') else None
+    except (ValueError, TypeError):
+        return None, (jsonify({"error": "limit和cursor必须为数字"}), 400)
+
+    if limit < 1 or limit > MAX_PAGE_LIMIT:
+        return None, (jsonify({"error": f"limit必须在1-{MAX_PAGE_LIMIT}之间"}), 400)
+
+    return (limit, cursor), None
+
+
+def keyset_paginate(query, key_column, limit, cursor=None, key_getter=None):
+    """
+    基于游标（keyset）的分页：按 key_column 升序，只取 key_column > cursor 的 limit 条
+    无论翻到第几页，每页的查询代价都只与 limit 有关
+
+    参数：
+        query: 尚未排序/截断的查询
+        key_column: 作为游标的单调列（通常是主键 id）
+        limit: 每页条数
+        cursor: 上一页返回的 next_cursor，None 表示第一页
+        key_getter: 从结果行中取出游标值的函数，默认取 row.id
+
+    返回：
+        (rows, next_cursor)，已到最后一页时 next_cursor 为 None
+    """
+    key_getter = key_getter or (lambda row: row.id)
+
+    rows = keyset_query(query, key_column, limit, cursor).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = key_getter(rows[-1])
+
+    return rows, next_cursor
+
+
+def keyset_query(query, key_column, limit, cursor=None):
+    """keyset_paginate 实际执行的查询（多取一条用来判断是否还有下一页）"""
+    if cursor is not None:
+        query = query.filter(key_column > cursor)
+    return query.order_by(key_column.asc()).limit(limit + 1)
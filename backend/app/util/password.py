@@ -0,0 +1,169 @@
+"""
+密码哈希策略：
+- 算法与强度由 PASSWORD_HASH_METHOD / PASSWORD_SALT_LENGTH 配置（werkzeug 的 method 格式，
+  如 scrypt:32768:8:1、pbkdf2:sha256:1000000）
+- 哈希与校验在进程池中执行（PASSWORD_POOL_WORKERS 个进程），请求线程只等待结果、不占用 GIL，
+  同时进行中的任务数受 PASSWORD_POOL_MAX_PENDING 限制，高峰时排队而不是无限堆积；
+  批量哈希（花名册导入）同时在途的任务不超过进程数，不会挤占登录
+- 子进程异常退出（如被 OOM 终止）导致进程池损坏时，丢弃并重建进程池后重试一次，仍失败则在当前线程计算
+- 登录成功后若已存哈希的参数与当前策略不一致，用新策略重新哈希保存（upgrade_password_hash）
+"""
+import collections
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+from app.extensions import db
+
+_lock = threading.Lock()
+_pool = None
+_pending = None
+_current_prefix = {}  # (method, salt_length) -> 按当前策略生成的哈希的 "method" 部分
+
+
+def _get_pool():
+    """按需创建进程池（每个 worker 进程一个）；PASSWORD_POOL_WORKERS 为 0 时返回 None，在当前线程计算"""
+    global _pool, _pending
+    workers = current_app.config['PASSWORD_POOL_WORKERS']
+    if workers == 0:
+        return None
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                # spawn 不复制当前进程的线程和数据库连接；不用 forkserver：子进程被杀死后，
+                # 损坏的进程池在清理时可能一直等不到 forkserver 回报的退出码，导致 worker 无法退出
+                context = multiprocessing.get_context('spawn')
+                # 名额在进程池重建后沿用：旧进程池上未结束的任务完成时仍会归还名额
+                if _pending is None:
+                    _pending = threading.BoundedSemaphore(
+                        current_app.config['PASSWORD_POOL_MAX_PENDING'])
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    return _pool
+
+
+def _discard_pool(pool):
+    """丢弃已损坏的进程池，下次 _get_pool 时重建（其他线程可能已经重建过）"""
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(pool, func, *args):
+    """
+    占用一个 PASSWORD_POOL_MAX_PENDING 名额提交任务，任务结束（包括失败）时释放
+    子进程刚退出、进程池尚未标记为损坏（或已被其他线程关闭）时提交会抛出 OSError / RuntimeError，
+    统一按 BrokenProcessPool 处理
+    """
+    _pending.acquire()
+    try:
+        future = pool.submit(func, *args)
+    except (OSError, RuntimeError) as e:
+        _pending.release()
+        raise BrokenProcessPool(str(e)) from e
+    except BaseException:
+        _pending.release()
+        raise
+    future.add_done_callback(lambda _: _pending.release())
+    return future
+
+
+def _run(func, *args):
+    for _ in range(2):
+        pool = _get_pool()
+        if pool is None:
+            break
+        try:
+            return _submit(pool, func, *args).result()
+        except BrokenProcessPool:
+            current_app.logger.warning("密码哈希进程池已损坏，重建后重试")
+            _discard_pool(pool)
+    return func(*args)
+
+
+def password_hasher():
+    """按当前策略哈希的函数（可 pickle，可直接交给进程池批量使用）"""
+    config = current_app.config
+    return functools.partial(
+        generate_password_hash,
+        method=config['PASSWORD_HASH_METHOD'],
+        salt_length=config['PASSWORD_SALT_LENGTH']
+    )
+
+
+def hash_password(password):
+    """按当前策略哈希密码"""
+    return _run(password_hasher(), password)
+
+
+def hash_passwords(passwords):
+    """
+    批量哈希（花名册导入等），在进程池中并行计算
+    与单个哈希共用有界队列，且同时在途的任务不超过进程数，登录等请求的任务可以插队执行
+    """
+    hasher = password_hasher()
+    pool = _get_pool()
+    if pool is None:
+        return [hasher(password) for password in passwords]
+
+    results = []
+    in_flight = collections.deque()  # (进程池, Future 或 None, 密码)
+
+    def collect():
+        pool, future, password = in_flight.popleft()
+        if future is not None:
+            try:
+                return future.result()
+            except BrokenProcessPool:
+                _discard_pool(pool)
+        return _run(hasher, password)
+
+    for password in passwords:
+        if len(in_flight) >= current_app.config['PASSWORD_POOL_WORKERS']:
+            results.append(collect())
+        pool = _get_pool()
+        try:
+            future = _submit(pool, hasher, password)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            future = None
+        in_flight.append((pool, future, password))
+    while in_flight:
+        results.append(collect())
+    return results
+
+
+def verify_password(pwhash, password):
+    """校验密码"""
+    return _run(check_password_hash, pwhash, password)
+
+
+def needs_rehash(pwhash):
+    """已存哈希的算法、强度或盐长度与当前策略不一致时返回 True"""
+    config = current_app.config
+    key = (config['PASSWORD_HASH_METHOD'], config['PASSWORD_SALT_LENGTH'])
+    if key not in _current_prefix:
+        # werkzeug 会把省略的参数补全（scrypt -> scrypt:32768:8:1），以实际生成的结果为准
+        _current_prefix[key] = generate_password_hash(
+            "", method=key[0], salt_length=key[1]).split("$", 1)[0]
+    parts = pwhash.split("$")
+    if len(parts) != 3:
+        return True
+    method, salt, _ = parts
+    return method != _current_prefix[key] or len(salt) != key[1]
+
+
+def upgrade_password_hash(user, password):
+    """登录成功后，若已存哈希不符合当前策略则用新策略重新哈希保存；失败只记录日志，不影响登录"""
+    if not needs_rehash(user.password):
+        return
+    try:
+        user.password = hash_password(password)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception("密码重新哈希失败")
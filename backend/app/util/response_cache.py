@@ -0,0 +1,196 @@
+"""
+列表查询结果缓存（课程作业列表、教师课程列表等读多写少的数据）：
+- 后端可选：进程内 LRU（默认，每个 worker 一份）或任意兼容 Redis 协议的服务（多 worker 共享）
+- 失效：订阅 app.util.events 中的领域事件，相关数据变化后删除对应的 key；TTL 兜底
+- 命中率与耗时通过 get_stats() 暴露（见 /api/admins/metrics/response-cache）
+"""
+import json
+import threading
+import time
+from flask import current_app
+from app.models import StaffCourseRelation
+from app.util.cache import TTLCache
+from app.util import events
+
+
+class LocalCacheBackend:
+    """进程内 LRU + TTL"""
+
+    def __init__(self, maxsize, ttl):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl):
+        self._cache.set(key, value, ttl=ttl)
+
+    def delete(self, *keys):
+        for key in keys:
+            self._cache.delete(key)
+
+
+class RedisCacheBackend:
+    """
+    兼容 Redis 协议的后端，client 只需提供 get / set(ex=) / delete
+    （redis.Redis 及其兼容实现，测试时可传入 fakeredis 之类的本地替身）
+    """
+
+    def __init__(self, client, prefix="taskly:cache:"):
+        self._client = client
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl):
+        self._client.set(self._prefix + key,
+                         json.dumps(value, ensure_ascii=False), ex=ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*[self._prefix + key for key in keys])
+
+
+class ResponseCache:
+    def __init__(self):
+        self.backend = None
+        self.ttl = 60
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "errors": 0,
+                       "hits_seconds": 0.0, "misses_seconds": 0.0}
+
+    def init_app(self, app):
+        self.ttl = app.config['RESPONSE_CACHE_TTL']
+        backend = app.config['RESPONSE_CACHE_BACKEND']
+        if backend == 'redis':
+            import redis  # 仅在启用 Redis 后端时需要安装
+            self.backend = RedisCacheBackend(
+                redis.Redis.from_url(app.config['RESPONSE_CACHE_REDIS_URL']))
+        elif backend == 'local':
+            self.backend = LocalCacheBackend(
+                maxsize=app.config['RESPONSE_CACHE_SIZE'], ttl=self.ttl)
+        else:
+            self.backend = None  # none：关闭缓存
+
+    def get_or_set(self, key, loader):
+        """
+        读缓存，未命中时调用 loader() 计算并写入
+        loader 返回服务层约定的 (success, data)，仅缓存成功的结果
+        """
+        if self.backend is None:
+            return loader()
+
+        start = time.perf_counter()
+        try:
+            data = self.backend.get(key)
+        except Exception:
+            # 缓存服务不可用时直接查库，不影响业务
+            current_app.logger.exception("读取缓存失败")
+            self._record("errors")
+            data = None
+        if data is not None:
+            self._record("hits", time.perf_counter() - start)
+            return True, data
+
+        success, data = loader()
+        if success:
+            try:
+                self.backend.set(key, data, self.ttl)
+            except Exception:
+                current_app.logger.exception("写入缓存失败")
+                self._record("errors")
+        self._record("misses", time.perf_counter() - start)
+        return success, data
+
+    def invalidate(self, *keys):
+        if self.backend is None:
+            return
+        try:
+            self.backend.delete(*keys)
+        except Exception:
+            current_app.logger.exception("删除缓存失败")
+            self._record("errors")
+
+    def _record(self, name, seconds=None):
+        with self._lock:
+            self._stats[name] += 1
+            if seconds is not None:
+                self._stats[f"{name}_seconds"] += seconds
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "errors": stats["errors"],
+            "hit_ratio": stats["hits"] / lookups if lookups else None,
+            "avg_hit_ms": stats["hits_seconds"] * 1000 / stats["hits"] if stats["hits"] else None,
+            "avg_miss_ms": stats["misses_seconds"] * 1000 / stats["misses"] if stats["misses"] else None,
+        }
+
+
+response_cache = ResponseCache()
+
+
+# 缓存 key
+
+
+def course_homeworks_key(course_id):
+    """教师端课程作业列表（含提交/批改计数）"""
+    return f"course_homeworks:{course_id}"
+
+
+def student_course_homeworks_key(course_id):
+    """学生端课程作业列表（同一课程所有学生共享，权限校验不缓存）"""
+    return f"student_course_homeworks:{course_id}"
+
+
+def teacher_courses_key(teacher_id):
+    """教师的课程列表"""
+    return f"teacher_courses:{teacher_id}"
+
+
+# 事件驱动的失效
+
+
+def _invalidate_course(sender, course_id, **payload):
+    response_cache.invalidate(
+        course_homeworks_key(course_id),
+        student_course_homeworks_key(course_id)
+    )
+
+
+def course_staff_query(course_id):
+    """课程的授课教师id"""
+    return StaffCourseRelation.query.with_entities(
+        StaffCourseRelation.staff_id).filter_by(course_id=course_id)
+
+
+def _invalidate_course_info(sender, course_id, **payload):
+    _invalidate_course(sender, course_id)
+    staff_ids = [row.staff_id for row in course_staff_query(course_id)]
+    if staff_ids:
+        response_cache.invalidate(*[teacher_courses_key(i) for i in staff_ids])
+
+
+def _invalidate_teacher(sender, teacher_id, **payload):
+    response_cache.invalidate(teacher_courses_key(teacher_id))
+
+
+def _invalidate_course_counters(sender, course_id, **payload):
+    # 提交/批改只影响教师端列表中的计数
+    response_cache.invalidate(course_homeworks_key(course_id))
+
+
+events.homework_created.connect(_invalidate_course)
+events.homework_updated.connect(_invalidate_course)
+events.homework_deleted.connect(_invalidate_course)
+events.course_updated.connect(_invalidate_course_info)
+events.course_created.connect(_invalidate_teacher)
+events.submission_created.connect(_invalidate_course_counters)
+events.grade_recorded.connect(_invalidate_course_counters)
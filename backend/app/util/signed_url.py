@@ -0,0 +1,54 @@
+import hashlib
+import hmac
+import time
+from urllib.parse import urlencode
+from flask import current_app
+
+UPLOAD_URL_PREFIX = "/uploads/"
+
+
+def _signature(filename, expires):
+    secret = current_app.config.get('UPLOAD_URL_SECRET') or \
+        current_app.config['JWT_SECRET_KEY']
+    message = f"{filename}|{expires}".encode()
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def signing_window():
+    """当前签名时间窗口编号；同一窗口内签出的URL相同，有效期至少还剩一个窗口"""
+    return int(time.time()) // current_app.config['UPLOAD_URL_EXPIRES']
+
+
+def sign_upload_url(url):
+    """
+    为 /uploads/ 下的图片URL附加过期时间与HMAC签名（?expires=...&sig=...）
+    只有已通过权限校验的序列化结果才会带上签名，图片路由据此直接放行，无需再查数据库
+    过期时间按 UPLOAD_URL_EXPIRES 取整到时间窗口，同一窗口内URL不变，便于浏览器缓存
+    """
+    if not isinstance(url, str) or not url.startswith(UPLOAD_URL_PREFIX):
+        return url
+
+    # 客户端可能把带签名的URL原样回传保存，重新签名前去掉旧的查询参数
+    url = url.split('?', 1)[0]
+    expires = (signing_window() + 2) * current_app.config['UPLOAD_URL_EXPIRES']
+    filename = url[len(UPLOAD_URL_PREFIX):]
+    query = urlencode({"expires": expires, "sig": _signature(filename, expires)})
+    return f"{url}?{query}"
+
+
+def sign_upload_urls(urls):
+    """批量签名图片URL列表"""
+    return [sign_upload_url(url) for url in urls or []]
+
+
+def verify_upload_signature(filename, expires, sig):
+    """校验图片URL签名（纯CPU计算，不访问数据库）"""
+    if not expires or not sig:
+        return False
+    try:
+        expires = int(expires)
+    except ValueError:
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(filename, expires), sig)
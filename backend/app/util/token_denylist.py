@@ -0,0 +1,181 @@
+"""
+令牌吊销（denylist），通过 Flask-JWT-Extended 的 token_in_blocklist_loader 在每次验证令牌时检查：
+- 单次登录：同一次登录签发的访问令牌与刷新令牌带相同的会话标识（sid 声明，换发的访问令牌沿用），
+  登出时按 sid 记录，保留一个刷新令牌有效期；不带 sid 的旧令牌按 jti 吊销单个令牌
+- 某个用户的全部令牌：修改密码、删除用户时记录"此时间之前签发的令牌作废"，保留一个刷新令牌有效期；
+  iat 只精确到秒，与吊销同一秒签发的令牌也作废（否则被盗的令牌可能在吊销后仍然有效），
+  代价是吊销后需等到下一秒才能重新登录
+- 每次检查最多三次 O(1) 查找，不访问数据库；条目按 TTL 自动过期
+- 存储也供其他需要多 worker 共享的短期状态使用：一次性凭证（use_once）、按用户的标记（mark）
+- 后端可选：local（进程内，仅限单 worker 部署，WEB_WORKERS > 1 时拒绝启动）
+  或兼容 Redis 协议的服务（多 worker 共享）
+"""
+import threading
+import time
+import uuid
+from flask import current_app, g, has_request_context
+from flask_jwt_extended import get_jwt
+from app.extensions import jwt
+
+SESSION_CLAIM = "sid"
+
+
+class LocalDenylistBackend:
+    """
+    进程内存储；吊销记录在 TTL 之前绝不淘汰（被淘汰的令牌会重新生效），
+    超过 maxsize 时先清理已过期的条目，仍超出则照常写入并记录错误日志
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = {}  # key -> (expire_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            return item[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._store(key, value, ttl, time.monotonic())
+
+    def add(self, key, value, ttl):
+        """key 不存在（或已过期）时写入并返回 True，否则返回 False"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > now:
+                return False
+            self._store(key, value, ttl, now)
+        return True
+
+    def _store(self, key, value, ttl, now):
+        # 调用方持有锁
+        if len(self._data) >= self.maxsize and key not in self._data:
+            for expired in [k for k, (expire_at, _) in self._data.items() if expire_at <= now]:
+                del self._data[expired]
+        self._data[key] = (now + ttl, value)
+        if len(self._data) > self.maxsize:
+            current_app.logger.error(
+                f"令牌吊销列表已有 {len(self._data)} 条未过期记录，超过 TOKEN_DENYLIST_SIZE={self.maxsize}；"
+                f"为保证吊销不失效仍继续写入，请调大 TOKEN_DENYLIST_SIZE 或改用 redis 后端")
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisDenylistBackend:
+    """client 只需提供 get / set(ex=)（redis.Redis 及其兼容实现）"""
+
+    def __init__(self, client, prefix="taskly:denylist:"):
+        self._client = client
+        self._prefix = prefix
+
+    def get(self, key):
+        value = self._client.get(self._prefix + key)
+        return None if value is None else float(value)
+
+    def set(self, key, value, ttl):
+        self._client.set(self._prefix + key, value, ex=ttl)
+
+    def add(self, key, value, ttl):
+        return bool(self._client.set(self._prefix + key, value, ex=ttl, nx=True))
+
+
+class TokenDenylist:
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        if app.config['TOKEN_DENYLIST_BACKEND'] == 'redis':
+            import redis  # 仅在启用 Redis 后端时需要安装
+            self.backend = RedisDenylistBackend(
+                redis.Redis.from_url(app.config['TOKEN_DENYLIST_REDIS_URL']))
+        else:
+            if app.config['WEB_WORKERS'] > 1:
+                # 吊销只写入处理该请求的 worker，其他 worker 仍会接受已吊销的令牌
+                raise RuntimeError(
+                    f"WEB_WORKERS={app.config['WEB_WORKERS']}：多 worker 部署必须设置 "
+                    f"TOKEN_DENYLIST_BACKEND=redis")
+            self.backend = LocalDenylistBackend(
+                maxsize=app.config['TOKEN_DENYLIST_SIZE'])
+
+    def revoke_token(self, jwt_payload):
+        """登出：吊销同一次登录签发的全部令牌（带 sid 时），以及本次携带的令牌"""
+        session_id = jwt_payload.get(SESSION_CLAIM)
+        if session_id:
+            self.backend.set(f"sid:{session_id}", 1, _max_token_lifetime())
+        ttl = int(jwt_payload["exp"] - time.time()) + 1
+        if ttl > 0:
+            self.backend.set(f"jti:{jwt_payload['jti']}", 1, ttl)
+
+    def revoke_identity(self, identity):
+        """吊销某个身份（如 "student:1"）此前签发的全部令牌（访问令牌与刷新令牌）"""
+        ttl = _max_token_lifetime()
+        self.backend.set(f"identity:{identity}", int(time.time()), ttl)
+
+    def use_once(self, key, ttl):
+        """一次性凭证（如 SSE 流令牌）：第一次使用返回 True，ttl 秒内再次使用返回 False"""
+        return self.backend.add(f"once:{key}", 1, ttl)
+
+    def mark(self, key, until):
+        """与吊销记录共用存储的短期标记（如读己之写窗口），在 until（时间戳）之前有效，多 worker 共享"""
+        ttl = int(until - time.time()) + 1
+        if ttl > 0:
+            self.backend.set(f"mark:{key}", until, ttl)
+
+    def marked_until(self, key):
+        """标记的截止时间戳；未标记或已过期时返回 0"""
+        return self.backend.get(f"mark:{key}") or 0
+
+    def is_revoked(self, jwt_payload):
+        if self.backend.get(f"jti:{jwt_payload['jti']}") is not None:
+            return True
+        session_id = jwt_payload.get(SESSION_CLAIM)
+        if session_id and self.backend.get(f"sid:{session_id}") is not None:
+            return True
+        identity = jwt_payload[current_app.config['JWT_IDENTITY_CLAIM']]
+        revoked_before = self.backend.get(f"identity:{identity}")
+        return revoked_before is not None and jwt_payload["iat"] <= revoked_before
+
+
+def _max_token_lifetime():
+    lifetimes = [current_app.config[key] for key in
+                 ('JWT_ACCESS_TOKEN_EXPIRES', 'JWT_REFRESH_TOKEN_EXPIRES')]
+    # 配置可以是秒数或 timedelta
+    return int(max(getattr(t, 'total_seconds', lambda: t)() for t in lifetimes)) + 1
+
+
+def current_session_id():
+    """
+    本次请求签发令牌使用的会话标识：携带令牌的请求（换发、成员关系变化后重新签发）沿用令牌中的 sid，
+    登录请求新建一个，同一请求内签发的访问令牌与刷新令牌共用
+    """
+    if not has_request_context():
+        return uuid.uuid4().hex
+    if "token_session_id" not in g:
+        try:
+            session_id = get_jwt().get(SESSION_CLAIM)
+        except RuntimeError:  # 当前请求未携带令牌（登录）
+            session_id = None
+        g.token_session_id = session_id or uuid.uuid4().hex
+    return g.token_session_id
+
+
+token_denylist = TokenDenylist()
+
+
+@jwt.additional_claims_loader
+def _session_claims(identity):
+    return {SESSION_CLAIM: current_session_id()}
+
+
+@jwt.token_in_blocklist_loader
+def _check_token_revoked(jwt_header, jwt_payload):
+    return token_denylist.is_revoked(jwt_payload)
@@ -0,0 +1,121 @@
+"""
+鉴权开销基准：用测试客户端对比 role_required 与原先的 jwt_required + get_jwt_identity + parse_identity 写法，
+两组路由的视图都只返回空响应，差值即鉴权本身的开销。分别测量仅校验角色、以及校验课程成员关系两种情况。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.auth_overhead --requests 2000
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from flask import jsonify  # noqa: E402
+from flask_jwt_extended import get_jwt_identity, jwt_required  # noqa: E402
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import Course, Student, StudentCourseRelation  # noqa: E402
+from app.util.auth import (  # noqa: E402
+    create_member_access_token,
+    is_student_in_course,
+    role_required
+)
+
+
+def parse_identity(identity_str, expected_role=None):
+    """原 app/util/parse_identity.py 的实现（已删除，保留在此用于对比）"""
+    try:
+        role, id_str = identity_str.split(':', 1)
+        user_id = int(id_str)
+        if expected_role and role != expected_role:
+            return None, (jsonify({"error": f"仅{expected_role}可访问"}), 403)
+        return user_id, None
+    except (ValueError, TypeError):
+        return None, (jsonify({"error": "无效的身份信息"}), 401)
+
+
+@jwt_required()
+def old_profile():
+    identity_str = get_jwt_identity()
+    student_id, error_response = parse_identity(
+        identity_str, expected_role="student")
+    if error_response:
+        return error_response
+    return "", 204
+
+
+@jwt_required()
+def old_course(course_id):
+    identity_str = get_jwt_identity()
+    student_id, error_response = parse_identity(
+        identity_str, expected_role="student")
+    if error_response:
+        return error_response
+    if not is_student_in_course(student_id, course_id):
+        return jsonify({"error": "无此课程权限"}), 403
+    return "", 204
+
+
+@role_required("student")
+def new_profile(student_id):
+    return "", 204
+
+
+@role_required("student", course_arg="course_id")
+def new_course(course_id, student_id):
+    return "", 204
+
+
+def setup_app():
+    app = create_app()
+    for rule, view in (
+        ('/bench/old/profile', old_profile),
+        ('/bench/old/courses/<int:course_id>', old_course),
+        ('/bench/new/profile', new_profile),
+        ('/bench/new/courses/<int:course_id>', new_course),
+    ):
+        app.add_url_rule(rule, endpoint=rule, view_func=view)
+
+    with app.app_context():
+        db.create_all()
+        student = Student(student_no="B001", name="基准", password="x")
+        course = Course(course_code="B001", course_name="基准课程", semester="bench")
+        db.session.add_all([student, course])
+        db.session.flush()
+        db.session.add(StudentCourseRelation(student_id=student.id, course_id=course.id))
+        db.session.commit()
+        token = create_member_access_token("student", student.id)
+        course_id = course.id
+    return app, {"Authorization": f"Bearer {token}"}, course_id
+
+
+def run(client, headers, path, requests):
+    # 预热：首个请求的路由匹配、缓存填充不计入结果
+    assert client.get(path, headers=headers).status_code == 204
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get(path, headers=headers)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help='每组请求次数')
+    args = parser.parse_args()
+
+    app, headers, course_id = setup_app()
+    client = app.test_client()
+    print(f"每组 {args.requests} 次请求")
+    for label, old_path, new_path in (
+        ("仅角色", '/bench/old/profile', '/bench/new/profile'),
+        ("课程成员", f'/bench/old/courses/{course_id}', f'/bench/new/courses/{course_id}'),
+    ):
+        for name, path in (("parse_identity", old_path), ("role_required", new_path)):
+            elapsed = run(client, headers, path, args.requests)
+            print(f"{label:<6} {name:<15} {elapsed:8.2f}s  "
+                  f"{elapsed / args.requests * 1e6:8.1f} µs/次")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+登录吞吐量基准：N 个线程并发调用 verify_password（模拟同时登录），
+分别在进程池关闭（PASSWORD_POOL_WORKERS=0，在请求线程中计算）和开启时测量每秒校验次数。
+
+用法（在 backend 目录下）：
+    python -m benchmarks.login_throughput --requests 200 --concurrency 16 --workers 4
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from app import create_app  # noqa: E402
+from app.util import password  # noqa: E402
+
+
+def run(app, requests, concurrency, workers):
+    app.config['PASSWORD_POOL_WORKERS'] = workers
+    with app.app_context():
+        pwhash = password.hash_password("benchmark-password")
+        # 预热：进程池启动时间不计入结果
+        password.verify_password(pwhash, "benchmark-password")
+
+    def login(_):
+        with app.app_context():
+            return password.verify_password(pwhash, "benchmark-password")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as threads:
+        assert all(threads.map(login, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    if password._pool is not None:
+        password._pool.shutdown()
+        password._pool = None
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='校验次数')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发线程数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='开启进程池时的进程数')
+    args = parser.parse_args()
+
+    app = create_app()
+    print(f"方法 {app.config['PASSWORD_HASH_METHOD']}，"
+          f"{args.requests} 次校验，{args.concurrency} 个并发线程")
+    for label, workers in (("进程池关闭", 0), (f"进程池 {args.workers} 进程", args.workers)):
+        elapsed = run(app, args.requests, args.concurrency, workers)
+        print(f"{label:<12} {elapsed:8.2f}s  {args.requests / elapsed:8.1f} 次/秒")
+
+
+if __name__ == '__main__':
+    main()
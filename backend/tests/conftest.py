@@ -0,0 +1,73 @@
+"""
+测试使用内存 SQLite（DATABASE_URL 需在导入 app 之前设置，Config 在导入时读取环境变量）
+"""
+import os
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('PASSWORD_POOL_WORKERS', '0')
+os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+
+import pytest  # noqa: E402
+from flask import g  # noqa: E402
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+
+
+def _reset_g():
+    for key in list(g):
+        g.pop(key)
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "mysql: 需要 MySQL 数据库（TEST_MYSQL_URL）")
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    # 用例期间一直保持应用上下文，测试客户端的请求会复用它和其中的 g；
+    # 生产环境每个请求有独立的 g，这里在每个请求开始时（先于其他 before_request）清空
+    app.before_request_funcs.setdefault(None, []).insert(0, _reset_g)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def course_data(app):
+    """一名教师、一名学生、一门课程（双方均已加入）和一份未截止的作业"""
+    from datetime import datetime, timedelta
+    from app.models import (
+        Course, Homework, Staff, StaffCourseRelation, StaffRole, Student,
+        StudentCourseRelation
+    )
+    teacher = Staff(staff_no="T001", name="教师", role=StaffRole.teacher, password="x")
+    student = Student(student_no="S001", name="学生", password="x")
+    course = Course(course_code="C001", course_name="课程", semester="2026-1")
+    db.session.add_all([teacher, student, course])
+    db.session.flush()
+    db.session.add_all([
+        StaffCourseRelation(staff_id=teacher.id, course_id=course.id, role="主讲教师"),
+        StudentCourseRelation(student_id=student.id, course_id=course.id)
+    ])
+    homework = Homework(
+        course_id=course.id, publisher_id=teacher.id, course_hw_no=1, title="作业1",
+        deadline=datetime.utcnow() + timedelta(days=1))
+    db.session.add(homework)
+    db.session.commit()
+    return {"teacher": teacher, "student": student, "course": course, "homework": homework}
+
+
+@pytest.fixture
+def student_headers(course_data):
+    from app.util.auth import create_member_access_token
+    token = create_member_access_token("student", course_data["student"].id)
+    return {"Authorization": f"Bearer {token}"}
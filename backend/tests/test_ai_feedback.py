@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from app.extensions import db
+from app.models import AIFeedbackJob, AIFeedbackJobStatus, HomeworkSubmission
+from app.util.ai_feedback import claim_jobs
+
+
+def _stale_job(app, course_data, attempts):
+    submission = HomeworkSubmission(
+        homework_id=course_data["homework"].id,
+        student_id=course_data["student"].id,
+        text_content="答案"
+    )
+    db.session.add(submission)
+    db.session.flush()
+    locked_at = datetime.utcnow() - timedelta(
+        seconds=app.config['AI_FEEDBACK_JOB_TIMEOUT'] + 1)
+    job = AIFeedbackJob(
+        submission_id=submission.id,
+        status=AIFeedbackJobStatus.running,
+        attempts=attempts,
+        locked_at=locked_at,
+        claim_token="stale"
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def test_stale_job_is_reclaimed_while_attempts_remain(app, course_data):
+    max_attempts = app.config['AI_FEEDBACK_MAX_ATTEMPTS']
+    job_id = _stale_job(app, course_data, attempts=max_attempts - 1)
+
+    _, job_ids = claim_jobs(10)
+
+    job = db.session.get(AIFeedbackJob, job_id)
+    assert job_ids == [job_id]
+    assert job.status == AIFeedbackJobStatus.running
+    assert job.attempts == max_attempts
+
+
+def test_stale_job_fails_after_max_attempts(app, course_data):
+    max_attempts = app.config['AI_FEEDBACK_MAX_ATTEMPTS']
+    job_id = _stale_job(app, course_data, attempts=max_attempts)
+
+    _, job_ids = claim_jobs(10)
+
+    job = db.session.get(AIFeedbackJob, job_id)
+    assert job_ids == []
+    assert job.status == AIFeedbackJobStatus.failed
+    assert job.attempts == max_attempts
+    assert job.locked_at is None
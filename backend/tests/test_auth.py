@@ -0,0 +1,71 @@
+"""
+令牌中的课程成员声明：版本号过期（其他 worker 修改了成员关系）时回退到数据库查询；
+教师成员关系缓存只缓存肯定结果，创建应用时清空
+"""
+from sqlalchemy import update
+from app import create_app
+from app.extensions import db
+from app.models import Course, StaffCourseRelation, Student, StudentCourseRelation
+from app.services.admin_service import delete_user
+from app.util import auth
+
+
+def _homeworks_url(course_data):
+    return f"/api/students/me/courses/{course_data['course'].id}/homeworks"
+
+
+def _bump_version_elsewhere(student_id):
+    """模拟另一个 worker 递增版本号：直接更新数据库，不经过本进程的任何缓存"""
+    db.session.execute(update(Student).where(Student.id == student_id).values(
+        membership_version=Student.membership_version + 1))
+    db.session.commit()
+
+
+def test_current_claims_grant_course(client, course_data, student_headers):
+    assert client.get(_homeworks_url(course_data), headers=student_headers).status_code == 200
+
+
+def test_stale_version_falls_back_to_database(client, course_data, student_headers):
+    # 先用令牌访问一次，之后版本号在别处递增
+    assert client.get(_homeworks_url(course_data), headers=student_headers).status_code == 200
+    student_id = course_data["student"].id
+    StudentCourseRelation.query.filter_by(student_id=student_id).delete()
+    _bump_version_elsewhere(student_id)
+
+    # 令牌仍声明该课程，但版本号已过期，按数据库中的成员关系拒绝
+    assert client.get(_homeworks_url(course_data), headers=student_headers).status_code == 403
+
+
+def test_stale_version_still_allows_current_member(client, course_data, student_headers):
+    _bump_version_elsewhere(course_data["student"].id)
+    assert client.get(_homeworks_url(course_data), headers=student_headers).status_code == 200
+
+
+def test_deleted_user_claims_are_not_trusted(client, course_data, student_headers):
+    assert client.get(_homeworks_url(course_data), headers=student_headers).status_code == 200
+    success, message = delete_user("student", course_data["student"].id)
+    assert success, message
+
+    assert client.get(_homeworks_url(course_data), headers=student_headers).status_code == 403
+
+
+def test_staff_non_membership_is_not_cached(course_data):
+    teacher_id = course_data["teacher"].id
+    course = Course(course_code="C002", course_name="新课程", semester="2026-1")
+    db.session.add(course)
+    db.session.commit()
+    assert not auth.is_staff_in_course(teacher_id, course.id)
+
+    # 另一个 worker 把教师加入课程（本进程未收到失效通知），下一次校验即可通过
+    db.session.add(StaffCourseRelation(staff_id=teacher_id, course_id=course.id, role="助教"))
+    db.session.commit()
+    assert auth.is_staff_in_course(teacher_id, course.id)
+
+
+def test_create_app_clears_membership_cache(course_data):
+    key = (course_data["teacher"].id, course_data["course"].id)
+    assert auth.is_staff_in_course(*key)
+    assert auth._membership_cache.get(key)
+
+    create_app()
+    assert auth._membership_cache.get(key) is None
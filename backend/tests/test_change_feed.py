@@ -0,0 +1,88 @@
+import pytest
+from app.util import change_feed as change_feed_module
+from app.util import events
+from app.util.change_feed import change_feed
+
+
+@pytest.fixture
+def feed_app(app):
+    app.config['CHANGE_FEED_BACKEND'] = 'local'
+    app.config['CHANGE_FEED_HEARTBEAT'] = 0.05
+    change_feed.init_app(app)
+    return app
+
+
+def _open_stream(client, headers):
+    resp = client.post("/api/students/me/events/token", headers=headers)
+    assert resp.status_code == 201
+    token = resp.get_json()["token"]
+    resp = client.get(f"/api/students/me/events?token={token}", buffered=False)
+    assert resp.status_code == 200
+    chunks = iter(resp.response)
+    assert next(chunks).startswith(b"retry:")  # 第一次读取时订阅
+    return token, chunks
+
+
+def _next_event(chunks):
+    for chunk in chunks:
+        if not chunk.startswith(b":"):  # 跳过心跳
+            return chunk
+    return None
+
+
+def test_published_event_arrives_on_stream(feed_app, client, course_data, student_headers):
+    _, chunks = _open_stream(client, student_headers)
+
+    events.publish(
+        events.grade_recorded,
+        course_id=course_data["course"].id,
+        homework_id=course_data["homework"].id,
+        submission_id=1,
+        student_id=course_data["student"].id,
+        grader_id=course_data["teacher"].id,
+        score=95
+    )
+
+    chunk = _next_event(chunks)
+    assert chunk.startswith(b"event: submission_graded\n")
+    assert b'"score": 95' in chunk
+
+
+def test_stream_token_is_single_use_and_role_bound(feed_app, client, course_data, student_headers):
+    token, _ = _open_stream(client, student_headers)
+    assert client.get(f"/api/students/me/events?token={token}").status_code == 401
+
+    resp = client.post("/api/students/me/events/token", headers=student_headers)
+    token = resp.get_json()["token"]
+    assert client.get(f"/api/teachers/me/events?token={token}").status_code == 401
+    # 访问令牌不能放在 URL 中直接使用
+    access_token = student_headers["Authorization"].split()[1]
+    assert client.get(f"/api/students/me/events?jwt={access_token}").status_code == 401
+
+
+def test_stream_closes_after_logout(feed_app, client, course_data, student_headers):
+    _, chunks = _open_stream(client, student_headers)
+
+    assert client.post("/api/auth/students/logout", headers=student_headers).status_code == 200
+
+    assert _next_event(chunks).startswith(b"event: unauthorized\n")
+    assert next(chunks, None) is None
+
+
+def test_stream_closes_when_access_token_expires(feed_app, client, course_data,
+                                                  student_headers, monkeypatch):
+    _, chunks = _open_stream(client, student_headers)
+
+    real_time = change_feed_module.time.time
+    monkeypatch.setattr(change_feed_module.time, "time",
+                        lambda: real_time() + feed_app.config['JWT_ACCESS_TOKEN_EXPIRES'] + 1)
+
+    assert _next_event(chunks).startswith(b"event: unauthorized\n")
+    assert next(chunks, None) is None
+
+
+def test_local_backend_warns_with_multiple_workers(app, caplog):
+    app.config['CHANGE_FEED_BACKEND'] = 'local'
+    app.config['WEB_WORKERS'] = 4
+    change_feed.init_app(app)
+    assert "redis" in caplog.text
@@ -0,0 +1,93 @@
+"""
+列表接口的条件请求：If-None-Match 命中时返回 304；批改、AI评语写入、签名窗口切换后 ETag 变化
+"""
+import time
+from types import SimpleNamespace
+import pytest
+from app.extensions import db
+from app.models import HomeworkGrading, HomeworkSubmission
+from app.services.teacher_service import grade_submission
+from app.util import signed_url
+from app.util.auth import create_member_access_token
+
+
+@pytest.fixture
+def teacher_headers(course_data):
+    token = create_member_access_token("teacher", course_data["teacher"].id)
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def submission(course_data):
+    submission = HomeworkSubmission(
+        homework_id=course_data["homework"].id,
+        student_id=course_data["student"].id,
+        text_content="答案",
+        image_urls='["/uploads/a.png"]'
+    )
+    db.session.add(submission)
+    db.session.commit()
+    return submission
+
+
+def _submissions_url(course_data):
+    return (f"/api/teachers/me/courses/{course_data['course'].id}"
+            f"/homeworks/{course_data['homework'].id}/submissions")
+
+
+def _etag(client, url, headers):
+    resp = client.get(url, headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["ETag"]
+    return resp.headers["ETag"]
+
+
+def test_matching_if_none_match_returns_304(client, course_data, teacher_headers,
+                                            student_headers, submission):
+    student_url = f"/api/students/me/courses/{course_data['course'].id}/homeworks"
+    for url, headers in ((_submissions_url(course_data), teacher_headers),
+                         (student_url, student_headers)):
+        etag = _etag(client, url, headers)
+        resp = client.get(url, headers=dict(headers, **{"If-None-Match": etag}))
+        assert resp.status_code == 304
+        assert resp.headers["ETag"] == etag
+        assert resp.data == b""
+
+
+def test_etag_changes_after_grade(client, course_data, teacher_headers, submission):
+    url = _submissions_url(course_data)
+    before = _etag(client, url, teacher_headers)
+
+    assert grade_submission(submission.id, course_data["teacher"].id, 80)[0]
+    graded = _etag(client, url, teacher_headers)
+    assert graded != before
+
+    resp = client.get(url, headers=dict(teacher_headers, **{"If-None-Match": before}))
+    assert resp.status_code == 200
+
+
+def test_etag_changes_after_ai_feedback(client, course_data, teacher_headers, submission):
+    url = _submissions_url(course_data)
+    assert grade_submission(submission.id, course_data["teacher"].id, 80)[0]
+    before = _etag(client, url, teacher_headers)
+
+    # 后台 worker 写入评语，批改时间不变
+    grading = HomeworkGrading.query.filter_by(submission_id=submission.id).one()
+    grading.ai_feedback = "评语"
+    db.session.commit()
+
+    assert _etag(client, url, teacher_headers) != before
+
+
+def test_etag_changes_with_signing_window(app, client, course_data, teacher_headers,
+                                          student_headers, submission, monkeypatch):
+    student_url = f"/api/students/me/courses/{course_data['course'].id}/homeworks"
+    urls = ((_submissions_url(course_data), teacher_headers), (student_url, student_headers))
+    before = [_etag(client, url, headers) for url, headers in urls]
+
+    # 进入下一个签名窗口：数据未变，但响应中的签名URL已不同
+    now = time.time() + app.config['UPLOAD_URL_EXPIRES']
+    monkeypatch.setattr(signed_url, "time", SimpleNamespace(time=lambda: now))
+
+    after = [_etag(client, url, headers) for url, headers in urls]
+    assert all(b != a for b, a in zip(before, after))
@@ -0,0 +1,66 @@
+"""
+读写分离的读己之写：只读副本是另一个空的内存 SQLite，读到副本时学生不存在（400），读到主库时返回 200
+"""
+import pytest
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.models import Course, CourseStatus
+from app.util.db_routing import READ_PRIMARY_COOKIE, REPLICA_BIND_KEY
+from tests.conftest import _reset_g
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_BINDS', {REPLICA_BIND_KEY: 'sqlite://'})
+    app = create_app()
+    app.config['TESTING'] = True
+    app.before_request_funcs.setdefault(None, []).insert(0, _reset_g)
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(db.engines[REPLICA_BIND_KEY])
+        yield app
+        db.session.remove()
+        db.drop_all()
+    # init_app 为每个 bind 在全局 db 上注册 MetaData，不移除的话后续未配置副本的应用 create_all 会失败
+    db.metadatas.pop(REPLICA_BIND_KEY, None)
+
+
+@pytest.fixture
+def new_course(course_data):
+    course = Course(course_code="C002", course_name="新课程", semester="2026-1",
+                    status=CourseStatus.approved)
+    db.session.add(course)
+    db.session.commit()
+    return course
+
+
+def _get_courses(client, headers):
+    # 清空会话的 identity map，保证查询真正发往数据库
+    db.session.remove()
+    return client.get("/api/students/me/courses", headers=headers)
+
+
+def test_read_without_write_uses_replica(client, student_headers):
+    assert _get_courses(client, student_headers).status_code == 400
+
+
+def test_read_after_write_uses_primary(client, student_headers, new_course):
+    resp = client.post("/api/students/me/courses", headers=student_headers,
+                       json={"course_code": new_course.course_code})
+    assert resp.status_code == 201, resp.get_json()
+
+    resp = _get_courses(client, student_headers)
+    assert resp.status_code == 200
+    assert {course["course_code"] for course in resp.get_json()["course_list"]} == {"C001", "C002"}
+
+
+def test_read_after_write_uses_primary_without_cookie(app, client, student_headers, new_course):
+    resp = client.post("/api/students/me/courses", headers=student_headers,
+                       json={"course_code": new_course.course_code})
+    assert resp.status_code == 201, resp.get_json()
+
+    # 另一台设备（或另一个 worker 上不带 cookie 的请求）：按登录身份记录的窗口仍然生效
+    other_client = app.test_client()
+    assert other_client.get_cookie(READ_PRIMARY_COOKIE) is None
+    assert _get_courses(other_client, student_headers).status_code == 200
@@ -0,0 +1,50 @@
+"""
+事务提交后发布事件：订阅者或事件数据求值抛出的异常只记录日志，服务仍返回成功
+"""
+import pytest
+from app.extensions import db
+from app.models import HomeworkGrading, HomeworkSubmission
+from app.services.teacher_service import grade_submission
+from app.util import events
+
+
+@pytest.fixture
+def submission(course_data):
+    submission = HomeworkSubmission(
+        homework_id=course_data["homework"].id,
+        student_id=course_data["student"].id,
+        text_content="答案"
+    )
+    db.session.add(submission)
+    db.session.commit()
+    return submission
+
+
+def test_failing_subscriber_does_not_fail_committed_grade(course_data, submission):
+    def on_grade_recorded(sender, **payload):
+        raise RuntimeError("订阅者出错")
+
+    events.grade_recorded.connect(on_grade_recorded)
+    try:
+        success, result = grade_submission(submission.id, course_data["teacher"].id, 80)
+    finally:
+        events.grade_recorded.disconnect(on_grade_recorded)
+
+    assert success, result
+    assert HomeworkGrading.query.filter_by(submission_id=submission.id).one().score == 80
+
+
+def test_failing_lazy_payload_is_logged(app, caplog):
+    received = []
+
+    def on_course_updated(sender, **payload):
+        received.append(payload)
+
+    events.course_updated.connect(on_course_updated)
+    try:
+        events.publish(events.course_updated, course_id=lambda: 1 / 0)
+    finally:
+        events.course_updated.disconnect(on_course_updated)
+
+    assert received == []
+    assert "数据求值失败" in caplog.text
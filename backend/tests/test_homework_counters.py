@@ -0,0 +1,134 @@
+"""
+作业的提交数、已批改数、迟交数计数：提交、重新提交、批改、重复批改时的增减，以及迁移 9e3b5d0c71a8 对已有数据的回填
+"""
+import os
+from datetime import datetime, timedelta
+from flask_migrate import upgrade
+from sqlalchemy import text
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.models import Homework, HomeworkSubmission
+from app.services.student_service import submit_homework
+from app.services.teacher_service import (
+    grade_submission,
+    grade_submissions_bulk,
+    update_homework_service
+)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'migrations')
+
+
+def _counters(homework_id):
+    db.session.expire_all()
+    homework = Homework.query.get(homework_id)
+    return homework.submission_count, homework.graded_count, homework.late_submission_count
+
+
+def _submit(course_data):
+    success, _ = submit_homework(
+        course_data["student"].id, course_data["homework"].id, "答案", None)
+    assert success
+    return HomeworkSubmission.query.filter_by(
+        student_id=course_data["student"].id,
+        homework_id=course_data["homework"].id
+    ).one()
+
+
+def test_submit_and_resubmit_count_once(course_data):
+    homework_id = course_data["homework"].id
+    _submit(course_data)
+    assert _counters(homework_id) == (1, 0, 0)
+
+    _submit(course_data)
+    assert _counters(homework_id) == (1, 0, 0)
+
+
+def test_grade_and_regrade_count_once(course_data):
+    homework_id = course_data["homework"].id
+    teacher_id = course_data["teacher"].id
+    submission = _submit(course_data)
+
+    assert grade_submission(submission.id, teacher_id, 80)[0]
+    assert _counters(homework_id) == (1, 1, 0)
+
+    assert grade_submission(submission.id, teacher_id, 90)[0]
+    assert _counters(homework_id) == (1, 1, 0)
+
+    # 批量接口重复批改同一提交也不再计数
+    success, _ = grade_submissions_bulk(
+        course_data["course"].id, teacher_id,
+        [{"submission_id": submission.id, "score": 95}])
+    assert success
+    assert _counters(homework_id) == (1, 1, 0)
+
+
+def test_resubmit_after_grading_resets_graded(course_data):
+    homework_id = course_data["homework"].id
+    submission = _submit(course_data)
+    assert grade_submission(submission.id, course_data["teacher"].id, 80)[0]
+
+    _submit(course_data)
+    assert _counters(homework_id) == (1, 0, 0)
+
+    # 重新提交后再次批改，重新计入已批改数
+    assert grade_submission(submission.id, course_data["teacher"].id, 85)[0]
+    assert _counters(homework_id) == (1, 1, 0)
+
+
+def test_deadline_change_and_resubmit_recount_late(course_data):
+    homework = course_data["homework"]
+    course_id = course_data["course"].id
+    submission = _submit(course_data)
+    assert _counters(homework.id) == (1, 0, 0)
+
+    # 截止时间提前到提交之前：按新截止时间重新统计为迟交
+    past = datetime.utcnow() - timedelta(hours=1)
+    assert update_homework_service(homework.id, course_id, {"deadline": past.isoformat()})[0]
+    assert _counters(homework.id) == (1, 0, 1)
+
+    # 截止后重新提交，仍是迟交，不重复计数
+    _submit(course_data)
+    assert _counters(homework.id) == (1, 0, 1)
+
+    # 原提交在截止前完成时，截止后重新提交由按时变为迟交
+    submission.submit_time = past - timedelta(hours=1)
+    db.session.commit()
+    assert update_homework_service(homework.id, course_id, {"deadline": past.isoformat()})[0]
+    assert _counters(homework.id) == (1, 0, 0)
+    _submit(course_data)
+    assert _counters(homework.id) == (1, 0, 1)
+
+    # 截止时间延后：迟交数归零
+    future = datetime.utcnow() + timedelta(days=1)
+    assert update_homework_service(homework.id, course_id, {"deadline": future.isoformat()})[0]
+    assert _counters(homework.id) == (1, 0, 0)
+
+
+def test_backfill_migration_counts_existing_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'backfill.db'}")
+    app = create_app()
+    deadline = datetime(2026, 1, 1)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS_DIR, revision='4c1f7a9e2d63')
+        with db.engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO homework (id, course_id, publisher_id, course_hw_no, title, deadline) "
+                "VALUES (1, 1, 1, 1, '作业1', :deadline), (2, 1, 1, 2, '作业2', :deadline)"
+            ), {"deadline": deadline})
+            conn.execute(text(
+                "INSERT INTO homework_submission (homework_id, student_id, submit_time, is_graded) "
+                "VALUES (1, 1, :on_time, 1), (1, 2, :late, 1), (1, 3, :late, 0)"
+            ), {"on_time": deadline - timedelta(hours=1), "late": deadline + timedelta(hours=1)})
+
+        upgrade(directory=MIGRATIONS_DIR, revision='9e3b5d0c71a8')
+        with db.engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT id, submission_count, graded_count, late_submission_count "
+                "FROM homework ORDER BY id"
+            )).all()
+        db.session.remove()
+        db.engine.dispose()
+
+    assert [tuple(row) for row in rows] == [(1, 3, 2, 2), (2, 0, 0, 0)]
@@ -0,0 +1,64 @@
+"""
+热点查询的执行计划（迁移 4c1f7a9e2d63 添加的索引）：用服务实际执行的 ORM 查询编译出 SQL 再 EXPLAIN
+- SQLite：在 db.create_all 建出的表上执行 EXPLAIN QUERY PLAN（模型中声明的索引与迁移一致）
+- MySQL：设置 TEST_MYSQL_URL 指向已执行 flask db upgrade 且有数据的库时运行，否则跳过
+  （空表上 MySQL 优化器可能直接判定无匹配行而不选择索引）
+"""
+import os
+import pytest
+from sqlalchemy import create_engine
+from app.extensions import db
+from app.models import HomeworkSubmission, StudentCourseRelation
+from app.services.teacher_service import (
+    course_students_query,
+    gradebook_query,
+    submissions_query
+)
+from app.util.pagination import DEFAULT_PAGE_LIMIT, keyset_query
+from app.util.response_cache import course_staff_query
+
+# (表, 期望使用的索引, 构造查询的函数)；分页查询按 keyset_paginate 的翻页形式（带游标）构造
+HOT_QUERIES = [
+    # 教师端作业提交列表
+    ("homework_submission", "ix_homework_submission_homework_id_id",
+     lambda: keyset_query(submissions_query(1), HomeworkSubmission.id, DEFAULT_PAGE_LIMIT, 10)),
+    # 课程选课学生
+    ("student_course_relation", "ix_student_course_relation_course_id_student_id",
+     lambda: keyset_query(course_students_query(1), StudentCourseRelation.student_id,
+                          DEFAULT_PAGE_LIMIT, 10)),
+    # 成绩册导出
+    ("student_course_relation", "ix_student_course_relation_course_id_student_id",
+     lambda: gradebook_query(1, [1, 2, 3])),
+    # 课程信息修改后失效授课教师的课程列表缓存
+    ("staff_course_relation", "ix_staff_course_relation_course_id",
+     lambda: course_staff_query(1)),
+]
+
+
+def _compile(query, dialect):
+    return str(query.statement.compile(
+        dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+
+@pytest.mark.parametrize("table, index_name, build", HOT_QUERIES)
+def test_hot_query_uses_index_sqlite(app, table, index_name, build):
+    with db.engine.connect() as conn:
+        sql = _compile(build(), conn.dialect)
+        plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    assert any(table in detail and f"INDEX {index_name}" in detail for detail in plan), plan
+    # 按索引顺序读取，不需要额外排序
+    assert not any("TEMP B-TREE" in detail for detail in plan), plan
+
+
+@pytest.mark.mysql
+@pytest.mark.skipif(not os.environ.get('TEST_MYSQL_URL'), reason="需要设置 TEST_MYSQL_URL")
+@pytest.mark.parametrize("table, index_name, build", HOT_QUERIES)
+def test_hot_query_uses_index_mysql(app, table, index_name, build):
+    engine = create_engine(os.environ['TEST_MYSQL_URL'])
+    try:
+        with engine.connect() as conn:
+            sql = _compile(build(), conn.dialect)
+            plan = conn.exec_driver_sql(f"EXPLAIN {sql}").mappings().all()
+    finally:
+        engine.dispose()
+    assert any(row["table"] == table and row["key"] == index_name for row in plan), plan
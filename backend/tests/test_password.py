@@ -0,0 +1,71 @@
+import os
+import signal
+import time
+import pytest
+from werkzeug.security import generate_password_hash
+from app.extensions import db
+from app.util import password
+from app.util.password import hash_password, hash_passwords, needs_rehash, verify_password
+
+
+@pytest.fixture
+def pool_app(app):
+    app.config['PASSWORD_POOL_WORKERS'] = 2
+    app.config['PASSWORD_POOL_MAX_PENDING'] = 4
+    yield app
+    if password._pool is not None:
+        password._pool.shutdown(wait=True, cancel_futures=True)
+        password._pool = None
+    password._pending = None
+
+
+def _kill_pool_children():
+    """杀死全部子进程，并等到进程池把自己标记为损坏（模拟子进程被 OOM 终止）"""
+    pool = password._pool
+    for pid in list(pool._processes):
+        os.kill(pid, signal.SIGKILL)
+    deadline = time.monotonic() + 10
+    while not pool._broken and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pool._broken
+
+
+def test_pool_recovers_after_child_is_killed(pool_app):
+    pwhash = hash_password("secret")
+    broken = password._pool
+    _kill_pool_children()
+
+    assert verify_password(pwhash, "secret")
+    assert password._pool is not broken
+    assert verify_password(hash_password("other"), "other")
+
+
+def test_hash_passwords_recovers_after_child_is_killed(pool_app):
+    hash_password("warm-up")
+    _kill_pool_children()
+
+    hashes = hash_passwords([f"pw{i}" for i in range(10)])
+    assert [verify_password(h, f"pw{i}") for i, h in enumerate(hashes)] == [True] * 10
+
+
+def test_hash_passwords_releases_pending_slots(pool_app):
+    hash_passwords([f"pw{i}" for i in range(10)])
+    # 全部名额已归还：能连续占满 PASSWORD_POOL_MAX_PENDING 次而不阻塞
+    for _ in range(pool_app.config['PASSWORD_POOL_MAX_PENDING']):
+        assert password._pending.acquire(blocking=False)
+
+
+def test_login_rehashes_outdated_password(app, client, course_data):
+    student = course_data["student"]
+    student.password = generate_password_hash("secret", method="pbkdf2:sha256:1000")
+    db.session.commit()
+    app.config['PASSWORD_HASH_METHOD'] = 'scrypt'
+
+    resp = client.post("/api/auth/students/login",
+                       json={"student_no": student.student_no, "password": "secret"})
+    assert resp.status_code == 200
+
+    db.session.refresh(student)
+    assert student.password.startswith("scrypt:")
+    assert not needs_rehash(student.password)
+    assert verify_password(student.password, "secret")
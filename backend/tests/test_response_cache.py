@@ -0,0 +1,58 @@
+import json
+from urllib.parse import parse_qs, urlsplit
+from app.extensions import db
+from app.models import HomeworkSubmission
+from app.services.admin_service import delete_user
+from app.services.student_service import get_student_course_homeworks
+from app.services.teacher_service import get_course_homeworks
+from app.util import signed_url
+from app.util.response_cache import response_cache
+
+
+def _expires(url):
+    return int(parse_qs(urlsplit(url).query)["expires"][0])
+
+
+def _shift_clock(monkeypatch, seconds):
+    real_time = signed_url.time.time
+    monkeypatch.setattr(signed_url.time, "time", lambda: real_time() + seconds)
+
+
+def test_cached_homework_lists_are_signed_per_request(app, course_data, monkeypatch):
+    course_data["homework"].image_urls = json.dumps(["/uploads/post/a.png"])
+    db.session.commit()
+    course_id = course_data["course"].id
+    student_id = course_data["student"].id
+
+    _, teacher_list = get_course_homeworks(course_id)
+    _, student_list = get_student_course_homeworks(student_id, course_id)
+    before = (_expires(teacher_list[0]["image_urls"][0]),
+              _expires(json.loads(student_list[0]["image_urls"])[0]))
+
+    # 两个签名窗口之后，旧签名已过期；缓存仍命中，但返回的URL重新签名
+    _shift_clock(monkeypatch, 2 * app.config['UPLOAD_URL_EXPIRES'])
+    hits = response_cache.get_stats()["hits"]
+    _, teacher_list = get_course_homeworks(course_id)
+    _, student_list = get_student_course_homeworks(student_id, course_id)
+    after = (_expires(teacher_list[0]["image_urls"][0]),
+             _expires(json.loads(student_list[0]["image_urls"])[0]))
+
+    assert response_cache.get_stats()["hits"] == hits + 2
+    assert all(new == old + 2 * app.config['UPLOAD_URL_EXPIRES']
+               for old, new in zip(before, after))
+
+
+def test_delete_user_invalidates_course_caches(app, course_data):
+    homework = course_data["homework"]
+    db.session.add(HomeworkSubmission(
+        homework_id=homework.id, student_id=course_data["student"].id, text_content="答案"))
+    homework.submission_count = 1
+    db.session.commit()
+    course_id = course_data["course"].id
+
+    _, homeworks = get_course_homeworks(course_id)
+    assert homeworks[0]["submission_count"] == 1
+
+    assert delete_user("student", course_data["student"].id)[0]
+    _, homeworks = get_course_homeworks(course_id)
+    assert homeworks[0]["submission_count"] == 0
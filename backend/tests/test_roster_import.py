@@ -0,0 +1,35 @@
+import io
+from flask_jwt_extended import create_access_token
+from app.models import Student, StudentCourseRelation
+
+
+def _import(client, rows):
+    csv_text = "student_no,name,password\n" + "".join(
+        f"S{i:04d},学生{i},pw{i}\n" for i in range(rows))
+    token = create_access_token(identity="admin:1")
+    return client.post(
+        "/api/admins/students/import",
+        data={"file": (io.BytesIO(csv_text.encode()), "roster.csv")},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+
+def test_import_within_row_limit(app, client):
+    app.config['ROSTER_IMPORT_MAX_ROWS'] = 5
+    app.config['ROSTER_IMPORT_CHUNK_SIZE'] = 2
+
+    resp = _import(client, 5)
+    assert resp.status_code == 200
+    assert resp.get_json()["created"] == 5
+    assert Student.query.count() == 5
+
+
+def test_import_over_row_limit_is_rejected_without_partial_import(app, client):
+    app.config['ROSTER_IMPORT_MAX_ROWS'] = 5
+    app.config['ROSTER_IMPORT_CHUNK_SIZE'] = 2
+
+    resp = _import(client, 6)
+    assert resp.status_code == 400
+    assert "5" in resp.get_json()["error"]
+    assert Student.query.count() == 0
+    assert StudentCourseRelation.query.count() == 0
@@ -0,0 +1,184 @@
+from contextlib import contextmanager
+from datetime import datetime
+import json
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.extensions import db
+from app.models import (
+    AIFeedbackJob,
+    AIFeedbackJobStatus,
+    Course,
+    Homework,
+    HomeworkGrading,
+    HomeworkSubmission,
+    Student
+)
+from app.services.teacher_service import get_student_submissions, grade_submissions_bulk
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _add_submissions(course_data, start, count):
+    """追加 count 份提交，其中一半已批改"""
+    for i in range(start, start + count):
+        student = Student(student_no=f"Q{i:04d}", name=f"学生{i}", password="x")
+        db.session.add(student)
+        db.session.flush()
+        submission = HomeworkSubmission(
+            homework_id=course_data["homework"].id,
+            student_id=student.id,
+            text_content="答案",
+            image_urls=json.dumps([f"/uploads/{i}.png"]),
+            is_graded=i % 2 == 0
+        )
+        db.session.add(submission)
+        db.session.flush()
+        if submission.is_graded:
+            db.session.add(HomeworkGrading(
+                submission_id=submission.id,
+                grader_id=course_data["teacher"].id,
+                score=90,
+                annotation_data=json.dumps({"marks": []}),
+                grade_time=datetime.utcnow()
+            ))
+    db.session.commit()
+
+
+def _list_submissions(course_data):
+    db.session.expire_all()
+    with count_queries() as statements:
+        success, (submissions, _) = get_student_submissions(
+            course_data["course"].id, course_data["homework"].id, limit=100)
+    assert success
+    return submissions, len(statements)
+
+
+def test_get_student_submissions_query_count_is_constant(course_data):
+    _add_submissions(course_data, 0, 2)
+    submissions, few = _list_submissions(course_data)
+    assert len(submissions) == 2
+
+    _add_submissions(course_data, 2, 30)
+    submissions, many = _list_submissions(course_data)
+    assert len(submissions) == 32
+    assert sum(sub["grading"] is not None for sub in submissions) == 16
+
+    assert many == few, f"{few} 条查询增长到 {many} 条"
+
+
+@contextmanager
+def count_commits():
+    commits = []
+
+    def after_commit(session):
+        commits.append(session)
+
+    event.listen(db.session, "after_commit", after_commit)
+    try:
+        yield commits
+    finally:
+        event.remove(db.session, "after_commit", after_commit)
+
+
+def _new_submissions(homework, count, prefix="B"):
+    submissions = []
+    for i in range(count):
+        student = Student(student_no=f"{prefix}{homework.id}{i:03d}", name=f"学生{i}", password="x")
+        db.session.add(student)
+        db.session.flush()
+        submission = HomeworkSubmission(
+            homework_id=homework.id, student_id=student.id, text_content="答案")
+        db.session.add(submission)
+        submissions.append(submission)
+    db.session.commit()
+    return [submission.id for submission in submissions]
+
+
+def _other_course_submission(course_data):
+    course = Course(course_code="C999", course_name="其他课程", semester="2026-1")
+    db.session.add(course)
+    db.session.flush()
+    homework = Homework(
+        course_id=course.id, publisher_id=course_data["teacher"].id, course_hw_no=1,
+        title="其他作业", deadline=datetime.utcnow())
+    db.session.add(homework)
+    db.session.commit()
+    return _new_submissions(homework, 1, prefix="X")[0]
+
+
+def test_grade_submissions_bulk_mixed_batch(course_data):
+    valid_ids = _new_submissions(course_data["homework"], 2)
+    other_course_id = _other_course_submission(course_data)
+    items = [
+        {"submission_id": valid_ids[0], "score": 90},
+        {"submission_id": "abc", "score": 90},
+        {"submission_id": valid_ids[1], "score": 101},
+        {"submission_id": other_course_id, "score": 80},
+        {"submission_id": 999999, "score": 80},
+        {"submission_id": valid_ids[0], "score": 70},
+    ]
+
+    with count_commits() as commits:
+        success, results = grade_submissions_bulk(
+            course_data["course"].id, course_data["teacher"].id, items)
+
+    assert success
+    assert len(commits) == 1
+    assert [result["success"] for result in results] == [True] + [False] * 5
+    assert results[1]["error"] == "提交ID必须为数字"
+    assert results[2]["error"] == "分数必须是0-100之间的整数"
+    # 其他课程的提交与不存在的提交一样处理，不泄露其存在
+    assert results[3]["error"] == results[4]["error"] == "提交记录不存在"
+    assert results[5]["error"] == "同一提交记录重复出现"
+
+    db.session.expire_all()
+    assert HomeworkGrading.query.filter_by(submission_id=valid_ids[0]).one().score == 90
+    assert HomeworkGrading.query.filter_by(submission_id=valid_ids[1]).first() is None
+    assert HomeworkGrading.query.filter_by(submission_id=other_course_id).first() is None
+    assert not db.session.get(HomeworkSubmission, other_course_id).is_graded
+
+
+def test_grade_submissions_bulk_counts_first_grades_and_resets_jobs(app, course_data):
+    app.config['AI_FEEDBACK_BACKEND'] = 'stub'
+    homework = course_data["homework"]
+    submission_ids = _new_submissions(homework, 3)
+    course_id, teacher_id = course_data["course"].id, course_data["teacher"].id
+
+    with count_commits() as commits:
+        success, _ = grade_submissions_bulk(course_id, teacher_id, [
+            {"submission_id": submission_id, "score": 80} for submission_id in submission_ids[:2]])
+    assert success
+    assert len(commits) == 1
+    db.session.expire_all()
+    assert db.session.get(Homework, homework.id).graded_count == 2
+    jobs = {job.submission_id: job for job in AIFeedbackJob.query}
+    assert set(jobs) == set(submission_ids[:2])
+    assert all(job.status == AIFeedbackJobStatus.pending for job in jobs.values())
+
+    # 评语已生成后重新批改：任务重置为待处理，不新建任务
+    for job in jobs.values():
+        job.status, job.attempts = AIFeedbackJobStatus.done, 1
+    db.session.commit()
+
+    # 两份重新批改加一份首次批改：已批改数只加首次批改的那一份
+    success, _ = grade_submissions_bulk(course_id, teacher_id, [
+        {"submission_id": submission_id, "score": 95} for submission_id in submission_ids])
+    assert success
+    db.session.expire_all()
+    assert db.session.get(Homework, homework.id).graded_count == 3
+    jobs = AIFeedbackJob.query.all()
+    assert sorted(job.submission_id for job in jobs) == sorted(submission_ids)
+    assert all(job.status == AIFeedbackJobStatus.pending and job.attempts == 0 for job in jobs)
+    assert {grading.score for grading in HomeworkGrading.query} == {95}
@@ -0,0 +1,86 @@
+from flask_jwt_extended import create_access_token, decode_token
+from app.util.token_denylist import token_denylist
+
+
+def test_revoke_identity_covers_token_issued_in_same_second(app):
+    payload = decode_token(create_access_token(identity="student:1"))
+    token_denylist.revoke_identity("student:1")
+    revoked_before = token_denylist.backend.get("identity:student:1")
+
+    assert token_denylist.is_revoked(payload)
+    assert token_denylist.is_revoked(dict(payload, iat=revoked_before))
+    # 下一秒重新登录签发的令牌不受影响
+    assert not token_denylist.is_revoked(dict(payload, iat=revoked_before + 1))
+
+
+def test_revoke_identity_does_not_affect_other_identities(app):
+    payload = decode_token(create_access_token(identity="student:2"))
+    token_denylist.revoke_identity("student:1")
+
+    assert not token_denylist.is_revoked(payload)
+
+
+def test_revoked_token_is_rejected(client, course_data, student_headers):
+    assert client.get("/api/students/me", headers=student_headers).status_code == 200
+    token_denylist.revoke_identity(f"student:{course_data['student'].id}")
+    assert client.get("/api/students/me", headers=student_headers).status_code == 401
+
+
+def _login(client, course_data):
+    from app.util.password import hash_password
+    from app.extensions import db
+    course_data["student"].password = hash_password("pw")
+    db.session.commit()
+    resp = client.post("/api/auth/students/login",
+                       json={"student_no": course_data["student"].student_no, "password": "pw"})
+    assert resp.status_code == 200
+    body = resp.get_json()
+    return ({"Authorization": f"Bearer {body['access_token']}"},
+            {"Authorization": f"Bearer {body['refresh_token']}"})
+
+
+def test_logout_with_access_token_revokes_refresh_token(client, course_data):
+    access, refresh = _login(client, course_data)
+    other_access, other_refresh = _login(client, course_data)
+    # 换发的访问令牌属于同一次登录
+    refreshed = client.post("/api/auth/students/refresh", headers=refresh)
+    refreshed = {"Authorization": f"Bearer {refreshed.get_json()['access_token']}"}
+
+    assert client.post("/api/auth/students/logout", headers=access).status_code == 200
+
+    assert client.get("/api/students/me", headers=access).status_code == 401
+    assert client.get("/api/students/me", headers=refreshed).status_code == 401
+    assert client.post("/api/auth/students/refresh", headers=refresh).status_code == 401
+    # 另一次登录（其他设备）不受影响
+    assert client.get("/api/students/me", headers=other_access).status_code == 200
+    assert client.post("/api/auth/students/refresh", headers=other_refresh).status_code == 200
+
+
+def test_logout_with_refresh_token_revokes_access_token(client, course_data):
+    access, refresh = _login(client, course_data)
+
+    assert client.post("/api/auth/students/logout", headers=refresh).status_code == 200
+
+    assert client.get("/api/students/me", headers=access).status_code == 401
+
+
+def test_local_backend_never_evicts_unexpired_entries(app):
+    from app.util.token_denylist import LocalDenylistBackend
+    backend = LocalDenylistBackend(maxsize=2)
+    backend.set("expired", 1, ttl=-1)
+    for i in range(4):
+        backend.set(f"jti:{i}", 1, ttl=60)
+
+    assert all(backend.get(f"jti:{i}") == 1 for i in range(4))
+    assert backend.get("expired") is None
+    assert len(backend) == 4
+
+
+def test_local_backend_refuses_multiple_workers(monkeypatch):
+    import pytest
+    from app import create_app
+    from app.config import Config
+    monkeypatch.setattr(Config, "WEB_WORKERS", 2)
+    monkeypatch.setattr(Config, "TOKEN_DENYLIST_BACKEND", "local")
+    with pytest.raises(RuntimeError, match="TOKEN_DENYLIST_BACKEND=redis"):
+        create_app()
@@ -0,0 +1,106 @@
+import io
+import os
+import pytest
+from app.util import file_upload
+from app.util.file_upload import get_upload_dir
+
+
+@pytest.fixture
+def upload_app(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    return app
+
+
+def _submit_dir(course_data):
+    homework = course_data["homework"]
+    return get_upload_dir(
+        course_id=homework.course_id,
+        course_hw_no=homework.course_hw_no,
+        resource_type="submit",
+        student_id=course_data["student"].id
+    )
+
+
+def _chunked_upload(client, headers, homework_id, content):
+    resp = client.post(f"/api/students/me/homeworks/{homework_id}/uploads",
+                       json={"filename": "page.png", "size": len(content)}, headers=headers)
+    assert resp.status_code == 201
+    upload_id = resp.get_json()["upload_id"]
+    resp = client.put(f"/api/students/me/uploads/{upload_id}?offset=0",
+                      data=content, headers=headers)
+    assert resp.status_code == 200
+    return upload_id
+
+
+def test_multipart_upload_keeps_chunked_upload_files(upload_app, client, course_data, student_headers):
+    homework_id = course_data["homework"].id
+    upload_id = _chunked_upload(client, student_headers, homework_id, b"chunked")
+    resp = client.post(f"/api/students/me/uploads/{upload_id}/complete", headers=student_headers)
+    assert resp.status_code == 201
+    chunked_url = resp.get_json()["image_url"]
+
+    resp = client.post(f"/api/students/me/homeworks/{homework_id}/upload-image",
+                       data={"file": (io.BytesIO(b"multipart"), "page2.png")},
+                       headers=student_headers)
+    assert resp.status_code == 201
+    multipart_url = resp.get_json()["image_urls"][0]
+
+    storage_dir = _submit_dir(course_data)
+    assert len(os.listdir(storage_dir)) == 2
+
+    resp = client.post(f"/api/students/me/homeworks/{homework_id}/submission",
+                       json={"image_urls": [chunked_url, multipart_url]}, headers=student_headers)
+    assert resp.status_code == 201
+    assert sorted(os.listdir(storage_dir)) == sorted(
+        os.path.basename(url) for url in (chunked_url, multipart_url))
+
+    # 重新提交只保留本次引用的图片
+    resp = client.post(f"/api/students/me/homeworks/{homework_id}/submission",
+                       json={"image_urls": [multipart_url]}, headers=student_headers)
+    assert resp.status_code == 201
+    assert os.listdir(storage_dir) == [os.path.basename(multipart_url)]
+
+
+def test_finished_upload_session_returns_404(upload_app, client, course_data, student_headers):
+    upload_id = _chunked_upload(client, student_headers, course_data["homework"].id, b"data")
+    assert client.post(f"/api/students/me/uploads/{upload_id}/complete",
+                       headers=student_headers).status_code == 201
+
+    assert client.get(f"/api/students/me/uploads/{upload_id}",
+                      headers=student_headers).status_code == 404
+    assert client.put(f"/api/students/me/uploads/{upload_id}?offset=4",
+                      data=b"more", headers=student_headers).status_code == 404
+    assert client.post(f"/api/students/me/uploads/{upload_id}/complete",
+                       headers=student_headers).status_code == 404
+
+
+def test_upload_session_removed_after_meta_was_read_returns_404(
+        upload_app, client, course_data, student_headers):
+    """会话在读取 meta 之后、读写分片之前被删除（并发完成或过期清理）"""
+    upload_id = _chunked_upload(client, student_headers, course_data["homework"].id, b"data")
+    os.remove(os.path.join(upload_app.config['UPLOAD_FOLDER'], "tmp", upload_id, "data.part"))
+
+    assert client.get(f"/api/students/me/uploads/{upload_id}",
+                      headers=student_headers).status_code == 404
+    assert client.put(f"/api/students/me/uploads/{upload_id}?offset=4",
+                      data=b"more", headers=student_headers).status_code == 404
+    assert client.post(f"/api/students/me/uploads/{upload_id}/complete",
+                       headers=student_headers).status_code == 404
+
+
+def test_multi_file_upload_uses_shared_executor(upload_app, client, course_data, student_headers,
+                                                monkeypatch):
+    def no_new_executor(*args, **kwargs):
+        raise AssertionError("请求中不应创建线程池")
+
+    monkeypatch.setattr(file_upload, "ThreadPoolExecutor", no_new_executor)
+    homework_id = course_data["homework"].id
+    for round_no in range(2):
+        resp = client.post(
+            f"/api/students/me/homeworks/{homework_id}/upload-image",
+            data={"file": [(io.BytesIO(f"page{round_no}-{i}".encode()), f"page{i}.png")
+                           for i in range(3)]},
+            headers=student_headers)
+        assert resp.status_code == 201, resp.get_json()
+        assert len(resp.get_json()["image_urls"]) == 3
+    assert len(os.listdir(_submit_dir(course_data))) == 6